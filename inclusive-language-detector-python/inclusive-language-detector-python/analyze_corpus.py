@@ -0,0 +1,53 @@
+# analyze_corpus.py - Auditoría offline de corpus grandes usando todos los núcleos
+#
+# Uso: python analyze_corpus.py entrada.ndjson [salida.ndjson] [--processes N]
+# Cada línea de entrada es texto plano, una cadena JSON o {"text": ...};
+# la salida es un resultado JSON por línea, en el mismo orden.
+
+import argparse
+import json
+import sys
+import time
+
+from services.parallel_analyzer import ParallelAnalyzer
+
+
+def read_texts(handle):
+    """Lee un texto por línea (texto plano o JSON)"""
+    for line in handle:
+        line = line.rstrip('\n')
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            yield line
+            continue
+        if isinstance(item, dict):
+            yield item.get('text', '')
+        elif isinstance(item, str):
+            yield item
+        else:
+            yield line
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Analiza un corpus en paralelo con BasicAnalyzer')
+    parser.add_argument('input')
+    parser.add_argument('output', nargs='?')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=64)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = 0
+
+    with open(args.input, encoding='utf-8') as source, \
+            (open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout) as target, \
+            ParallelAnalyzer(processes=args.processes, batch_size=args.batch_size) as analyzer:
+        for result in analyzer.analyze_many(read_texts(source)):
+            target.write(json.dumps(result, ensure_ascii=False) + '\n')
+            count += 1
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ {count} textos analizados en {elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f} textos/s)", file=sys.stderr)
@@ -1,8 +1,20 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
 from flask_cors import CORS
 from services.basic_analyzer import BasicAnalyzer
 from services.pro_analyzer import ProAnalyzer
+from services.result_cache import ResultCache
+from services.async_runner import BackgroundLoop
+from services.micro_batcher import MicroBatcher
+from services.hybrid_analyzer import HybridAnalyzer
+from services.incremental_analyzer import IncrementalAnalyzer
+from services.metrics import METRICS
+from services.segmentation import split_sentences
+from services.streaming import assemble_result, format_ndjson, format_sse, result_events
+from services.tenant_lexicons import TenantLexicons
 import os
+import json
+import time
+import codecs
 from dotenv import load_dotenv  # ← AÑADIR ESTO
 
 # ← CARGAR VARIABLES DE ENTORNO ANTES DE TODO
@@ -13,7 +25,114 @@ CORS(app)
 
 # Inicializar analizadores
 basic_analyzer = BasicAnalyzer()
-pro_analyzer = ProAnalyzer()
+pro_analyzer = ProAnalyzer(candidate_finder=basic_analyzer.candidate_spans, fallback=basic_analyzer.analyze)
+
+# Caché de resultados (textos repetidos, reintentos, clics duplicados)
+result_cache = ResultCache.from_env()
+
+# Bucle asyncio compartido: las llamadas pro esperan a OpenAI sin bloquear un worker
+llm_loop = BackgroundLoop()
+
+# Peticiones pro simultáneas comparten una sola llamada al LLM
+pro_batcher = MicroBatcher(pro_analyzer)
+
+# Modo híbrido: el básico responde al instante y solo escala a la IA con señal
+hybrid_analyzer = HybridAnalyzer(
+    basic_analyzer, lambda excerpt: llm_loop.run(pro_batcher.analyze(excerpt))
+)
+
+# Editor en vivo: resultados por oración, solo se reanaliza lo que cambia
+incremental_analyzer = IncrementalAnalyzer(
+    basic_analyzer,
+    max_sentences=int(os.environ.get('INCREMENTAL_MAX_SENTENCES', 20000)),
+    max_documents=int(os.environ.get('INCREMENTAL_MAX_DOCUMENTS', 1000))
+)
+
+# Léxicos por cliente: capas sobre el léxico base (LEXICON_OVERLAY_DIR o
+# LEXICON_OVERLAY_DB), en caché LRU y recargadas en segundo plano
+tenant_lexicons = TenantLexicons.from_env(basic_analyzer)
+
+# Límites de entrada
+MAX_TEXT_LENGTH = 5000
+MAX_DOCUMENT_LENGTH = int(os.environ.get('MAX_DOCUMENT_LENGTH', 200000))
+MAX_BATCH_ITEMS = int(os.environ.get('MAX_BATCH_ITEMS', 5000))
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+STREAM_READ_SIZE = 64 * 1024
+
+def _flatten_stats(stats, prefix=''):
+    """Valores numéricos de un dict de stats (anidado) como pares (nombre, valor)"""
+    for key, value in stats.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            yield from _flatten_stats(value, f'{name}_')
+        elif isinstance(value, (bool, int, float)):
+            yield name, float(value)
+
+def _service_metrics():
+    """Estado de cachés y servicios, calculado al exportar /api/metrics"""
+    services = {
+        'result_cache': result_cache.stats(),
+        'pro_batching': pro_batcher.stats(),
+        'hybrid': hybrid_analyzer.stats(),
+        'incremental': incremental_analyzer.stats(),
+        'tenant_lexicons': tenant_lexicons.stats(),
+    }
+    if pro_analyzer.gateway:
+        services['llm_gateway'] = pro_analyzer.gateway.stats()
+        yield 'llm_circuit_open', 'gauge', 'Circuit breaker del LLM: 0 cerrado, 0.5 semiabierto, 1 abierto', [
+            ({}, {'closed': 0.0, 'half_open': 0.5, 'open': 1.0}[services['llm_gateway']['breaker']['state']])
+        ]
+    yield 'service_stat', 'gauge', 'Estadísticas de cachés y servicios (las mismas que /api/health)', [
+        ({'service': service, 'stat': name}, value)
+        for service, stats in services.items()
+        for name, value in _flatten_stats(stats)
+    ]
+    
+    usage = pro_analyzer.usage.summary()
+    yield 'llm_usage_calls', 'counter', 'Llamadas al LLM desde el arranque por tipo de prompt', [
+        ({'kind': kind}, totals['calls']) for kind, totals in usage.items()
+    ]
+    yield 'llm_usage_errors', 'counter', 'Llamadas al LLM fallidas desde el arranque', [
+        ({'kind': kind}, totals['errors']) for kind, totals in usage.items()
+    ]
+    yield 'llm_usage_tokens', 'counter', 'Tokens del LLM desde el arranque', [
+        ({'kind': kind, 'type': kind_type}, totals[f'{kind_type}_tokens'])
+        for kind, totals in usage.items()
+        for kind_type in ('prompt', 'completion')
+    ]
+
+METRICS.add_collector(_service_metrics)
+
+@app.before_request
+def _start_timer():
+    if METRICS.enabled:
+        request.environ['metrics.started'] = time.perf_counter()
+
+@app.after_request
+def _observe_request(response):
+    started = request.environ.get('metrics.started')
+    if started is not None:
+        # Las respuestas en streaming solo miden hasta el primer byte
+        METRICS.observe(
+            'http_request_seconds', time.perf_counter() - started,
+            endpoint=request.endpoint or 'unknown', status=str(response.status_code)
+        )
+    return response
+
+def _cache_key(text, mode, analyzer=None):
+    """Clave de caché: texto + modo + versión del léxico (la del tenant, si tiene capa) + modelo"""
+    model = pro_analyzer.model if mode in ('pro', 'hybrid') else ''
+    return ResultCache.key(text, mode, (analyzer or basic_analyzer).lexicon_version, model)
+
+def _tenant_analyzer(data=None):
+    """Analizador básico del tenant de la petición (cabecera X-Tenant-ID, ?tenant= o campo tenant).
+    
+    ValueError si el identificador no es válido.
+    """
+    tenant = request.headers.get('X-Tenant-ID') or request.args.get('tenant')
+    if not tenant and isinstance(data, dict):
+        tenant = data.get('tenant')
+    return tenant_lexicons.get(tenant)
 
 @app.route('/')
 def index():
@@ -26,23 +145,40 @@ def analyze():
     try:
         data = request.get_json()
         text = data.get('text', '')
-        mode = data.get('mode', 'basic')  # 'basic' o 'pro'
+        mode = data.get('mode', request.args.get('mode', 'basic'))  # 'basic', 'pro' o 'hybrid'
         
         if not text or not text.strip():
             return jsonify({
                 'error': 'El texto no puede estar vacío'
             }), 400
         
-        if len(text) > 5000:
+        if len(text) > MAX_TEXT_LENGTH:
             return jsonify({
-                'error': 'El texto es demasiado largo (máximo 5000 caracteres)'
+                'error': f'El texto es demasiado largo (máximo {MAX_TEXT_LENGTH} caracteres)'
             }), 400
         
-        # Realizar análisis según el modo
+        try:
+            analyzer = _tenant_analyzer(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Realizar análisis según el modo (los errores no se cachean)
         if mode == 'pro':
-            result = pro_analyzer.analyze(text)
+            result = result_cache.get_or_compute(
+                _cache_key(text, 'pro'), lambda: llm_loop.run(pro_batcher.analyze(text))
+            )
+        elif mode == 'hybrid':
+            key = _cache_key(text, 'hybrid')
+            result = result_cache.get(key)
+            if result is None:
+                result = hybrid_analyzer.analyze(text)
+                # Si la IA falló se respondió con el nivel básico: no cachear ese resultado
+                if 'error' not in result.get('escalation', {}):
+                    result_cache.set(key, result)
         else:
-            result = basic_analyzer.analyze(text)
+            result = result_cache.get_or_compute(
+                _cache_key(text, 'basic', analyzer), lambda: analyzer.analyze(text)
+            )
         
         return jsonify(result)
     
@@ -51,6 +187,265 @@ def analyze():
             'error': f'Error al procesar el texto: {str(e)}'
         }), 500
 
+def _read_batch_items():
+    """Lee los textos del lote: JSON ({"texts": [...]} o lista) o NDJSON (una línea por texto)"""
+    if request.mimetype in NDJSON_MIMETYPES:
+        items = []
+        for line in request.get_data(as_text=True).splitlines():
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError:
+                items.append(ValueError('Línea NDJSON inválida'))
+                continue
+            items.append(item.get('text') if isinstance(item, dict) else item)
+        return items, request.args.get('mode', 'basic')
+    
+    data = request.get_json(silent=True)
+    if isinstance(data, list):
+        return data, request.args.get('mode', 'basic')
+    if isinstance(data, dict) and isinstance(data.get('texts'), list):
+        return data['texts'], data.get('mode', request.args.get('mode', 'basic'))
+    return None, None
+
+@app.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Endpoint para análisis por lotes; los errores se informan por elemento"""
+    try:
+        items, mode = _read_batch_items()
+        
+        if items is None:
+            return jsonify({
+                'error': 'Envía {"texts": [...]} en JSON o un texto por línea en NDJSON'
+            }), 400
+        
+        if mode != 'basic':
+            return jsonify({
+                'error': 'El análisis por lotes solo está disponible en modo básico'
+            }), 400
+        
+        if len(items) > MAX_BATCH_ITEMS:
+            return jsonify({
+                'error': f'Demasiados textos en el lote (máximo {MAX_BATCH_ITEMS})'
+            }), 400
+        
+        try:
+            analyzer = _tenant_analyzer(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Validar cada elemento; solo los válidos se analizan (en un único lote)
+        results = [None] * len(items)
+        valid_indexes = []
+        for index, item in enumerate(items):
+            if isinstance(item, Exception):
+                results[index] = {'error': str(item)}
+            elif not isinstance(item, str):
+                results[index] = {'error': 'Elemento inválido: se esperaba un texto'}
+            elif not item.strip():
+                results[index] = {'error': 'El texto no puede estar vacío'}
+            elif len(item) > MAX_TEXT_LENGTH:
+                results[index] = {'error': f'El texto es demasiado largo (máximo {MAX_TEXT_LENGTH} caracteres)'}
+            else:
+                results[index] = result_cache.get(_cache_key(item, 'basic', analyzer))
+                if results[index] is None:
+                    valid_indexes.append(index)
+        
+        # Solo los textos que no estaban en caché se analizan (en un único lote)
+        analyzed = analyzer.analyze_batch([items[index] for index in valid_indexes])
+        for index, result in zip(valid_indexes, analyzed):
+            results[index] = result
+            result_cache.set(_cache_key(items[index], 'basic', analyzer), result)
+        
+        if request.mimetype in NDJSON_MIMETYPES:
+            body = ''.join(json.dumps(result, ensure_ascii=False) + '\n' for result in results)
+            return Response(body, mimetype='application/x-ndjson')
+        
+        return jsonify({
+            'count': len(results),
+            'results': results
+        })
+    
+    except Exception as e:
+        return jsonify({
+            'error': f'Error al procesar el lote: {str(e)}'
+        }), 500
+
+def _read_body_incrementally():
+    """Lee el cuerpo de la petición (puede venir en chunked) como texto, por fragmentos"""
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    while True:
+        data = request.stream.read(STREAM_READ_SIZE)
+        if not data:
+            break
+        yield decoder.decode(data)
+    yield decoder.decode(b'', final=True)
+
+@app.route('/api/analyze/stream', methods=['POST'])
+def analyze_stream():
+    """Análisis en streaming de documentos sin límite de tamaño (respuesta NDJSON)"""
+    if request.args.get('mode', 'basic') != 'basic':
+        return jsonify({
+            'error': 'El análisis en streaming solo está disponible en modo básico'
+        }), 400
+    
+    try:
+        analyzer = _tenant_analyzer()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def generate():
+        try:
+            for event in analyzer.analyze_stream(_read_body_incrementally()):
+                yield json.dumps(event, ensure_ascii=False) + '\n'
+        except Exception as e:
+            yield json.dumps({
+                'event': 'error',
+                'error': f'Error al procesar el texto: {str(e)}'
+            }, ensure_ascii=False) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/analyze/events', methods=['POST'])
+def analyze_events():
+    """Análisis progresivo: cada issue se envía en cuanto se detecta (SSE o NDJSON)
+    
+    Mismo cuerpo que /api/analyze. Con Accept: text/event-stream responde en
+    Server-Sent Events; si no, un evento JSON por línea. El modo básico emite
+    los issues oración a oración y el pro según el LLM los va escribiendo; el
+    evento 'summary' final trae stats, overall_feedback y los tiempos del
+    servidor (timing.first_issue_ms es la métrica a vigilar).
+    """
+    data = request.get_json(silent=True) or {}
+    text = data.get('text', '')
+    mode = data.get('mode', request.args.get('mode', 'basic'))
+    
+    if not isinstance(text, str) or not text.strip():
+        return jsonify({
+            'error': 'El texto no puede estar vacío'
+        }), 400
+    
+    if len(text) > MAX_TEXT_LENGTH:
+        return jsonify({
+            'error': f'El texto es demasiado largo (máximo {MAX_TEXT_LENGTH} caracteres)'
+        }), 400
+    
+    try:
+        analyzer = _tenant_analyzer(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    mode = mode if mode in ('pro', 'hybrid') else 'basic'
+    key = _cache_key(text, mode, analyzer if mode == 'basic' else None)
+    # El resultado ensamblado del streaming básico tiene su propia entrada:
+    # la de /api/analyze solo la llena analyze()
+    stream_key = _cache_key(text, 'basic-stream', analyzer) if mode == 'basic' else key
+    sse = 'text/event-stream' in request.headers.get('Accept', '')
+    encode = format_sse if sse else format_ndjson
+    
+    def generate():
+        started = time.perf_counter()
+        first_issue = None
+        issues = []
+        try:
+            # Resultados ya calculados (caché o híbrido, que responde de una vez) se reenvían como eventos
+            result = result_cache.get(key)
+            if result is None and stream_key != key:
+                result = result_cache.get(stream_key)
+            if result is None and mode == 'hybrid':
+                result = hybrid_analyzer.analyze(text)
+                if 'error' not in result.get('escalation', {}):
+                    result_cache.set(key, result)
+            if result is not None:
+                events, cache = result_events(result), False
+            elif mode == 'pro':
+                events, cache = llm_loop.iterate(pro_analyzer.analyze_stream_async(text)), True
+            else:
+                events = analyzer.analyze_stream(text[start:end] for start, end in split_sentences(text))
+                cache = True
+            
+            for event in events:
+                if event['event'] == 'issue':
+                    issues.append(event['issue'])
+                    if first_issue is None:
+                        first_issue = time.perf_counter() - started
+                        if METRICS.enabled:
+                            METRICS.observe('stream_first_issue_seconds', first_issue, mode=mode)
+                elif event['event'] == 'summary':
+                    if cache:
+                        result_cache.set(stream_key, assemble_result(text, issues, event))
+                    total = time.perf_counter() - started
+                    if METRICS.enabled:
+                        METRICS.observe('stream_summary_seconds', total, mode=mode)
+                    event = dict(event, timing={
+                        'first_issue_ms': round(first_issue * 1000, 1) if first_issue is not None else None,
+                        'total_ms': round(total * 1000, 1),
+                    })
+                yield encode(event)
+        except Exception as e:
+            yield encode({
+                'event': 'error',
+                'error': f'Error al procesar el texto: {str(e)}'
+            })
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream' if sse else 'application/x-ndjson',
+        # Sin caché ni buffering en proxies (nginx): cada evento sale en cuanto se genera
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/analyze/incremental', methods=['POST'])
+def analyze_incremental():
+    """Análisis incremental por oración para el editor en vivo (solo modo básico)"""
+    try:
+        data = request.get_json(silent=True) or {}
+        document_id = data.get('document_id')
+        
+        if not isinstance(document_id, str) or not document_id:
+            return jsonify({
+                'error': 'Falta document_id'
+            }), 400
+        
+        if data.get('mode', 'basic') != 'basic':
+            return jsonify({
+                'error': 'El análisis incremental solo está disponible en modo básico'
+            }), 400
+        
+        text = data.get('text')
+        sentences = data.get('sentences')
+        diff = data.get('diff')
+        
+        if text is not None and not isinstance(text, str):
+            return jsonify({'error': 'El campo text debe ser un texto'}), 400
+        if sentences is not None and not isinstance(sentences, list):
+            return jsonify({'error': 'El campo sentences debe ser una lista'}), 400
+        if diff is not None and not isinstance(diff, dict):
+            return jsonify({'error': 'El campo diff debe ser un objeto'}), 400
+        
+        new_text = text if text is not None else ''.join(
+            item.get('text', '') for item in (sentences or (diff or {}).get('insert') or [])
+            if isinstance(item, dict) and isinstance(item.get('text'), str)
+        )
+        if len(new_text) > MAX_DOCUMENT_LENGTH:
+            return jsonify({
+                'error': f'El documento es demasiado largo (máximo {MAX_DOCUMENT_LENGTH} caracteres)'
+            }), 400
+        
+        result = incremental_analyzer.analyze(document_id, text=text, sentences=sentences, diff=diff)
+        
+        if 'missing' in result or 'missing_document' in result:
+            return jsonify(result), 409
+        if 'error' in result:
+            return jsonify(result), 400
+        return jsonify(result)
+    
+    except Exception as e:
+        return jsonify({
+            'error': f'Error al procesar el texto: {str(e)}'
+        }), 500
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Endpoint de salud"""
@@ -58,9 +453,22 @@ def health():
         'status': 'ok',
         'service': 'Inclusive Language Detector',
         'version': '1.0.0',
-        'openai_configured': bool(os.environ.get('OPENAI_API_KEY'))
+        'openai_configured': bool(os.environ.get('OPENAI_API_KEY')),
+        'pro_backend': pro_analyzer.backend.name if pro_analyzer.backend else None,
+        'result_cache': result_cache.stats(),
+        'pro_batching': pro_batcher.stats(),
+        'hybrid': hybrid_analyzer.stats(),
+        'incremental': incremental_analyzer.stats(),
+        'tenant_lexicons': tenant_lexicons.stats(),
+        'llm_gateway': pro_analyzer.gateway.stats() if pro_analyzer.gateway else None,
+        'llm_usage': pro_analyzer.usage.summary()
     })
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Métricas en formato de texto de Prometheus (METRICS_ENABLED=1 activa las de etapas)"""
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     
@@ -71,4 +479,7 @@ if __name__ == '__main__':
     else:
         print("⚠️  OpenAI API Key NO configurada - Modo Pro no disponible")
     
+    lexicon = basic_analyzer.matcher.memory_report()
+    print(f"📚 Léxico: {lexicon['entries']} entradas en {lexicon['total_bytes'] / (1024 * 1024):.1f} MB")
+    
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+# Mediciones de rendimiento de los analizadores (python -m benchmarks.<módulo>)
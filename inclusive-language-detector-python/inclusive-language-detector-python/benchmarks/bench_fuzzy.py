@@ -0,0 +1,115 @@
+# benchmarks/bench_fuzzy.py - Latencia de la búsqueda de erratas (índice de borrados vs fuerza bruta)
+#
+# Uso: python -m benchmarks.bench_fuzzy [--synthetic 50000] [--queries 2000]
+#
+# Mide p50/p99/máx por consulta con el léxico real y con un léxico sintético
+# grande, y comprueba que el índice devuelve lo mismo que recorrer todas las
+# entradas calculando la distancia.
+
+import argparse
+import gc
+import random
+import string
+import time
+from typing import Callable, List, Sequence
+
+from services.basic_analyzer import BasicAnalyzer
+from services.fuzzy_index import FuzzyIndex
+
+
+def typo(word: str, rng: random.Random) -> str:
+    """Una errata al azar: borrado, inserción, sustitución o transposición"""
+    if len(word) < 2:
+        return word
+    index = rng.randrange(len(word) - 1)
+    kind = rng.choice(('delete', 'insert', 'replace', 'swap'))
+    letter = rng.choice(string.ascii_lowercase)
+    if kind == 'delete':
+        return word[:index] + word[index + 1:]
+    if kind == 'insert':
+        return word[:index] + letter + word[index:]
+    if kind == 'replace':
+        return word[:index] + letter + word[index + 1:]
+    return word[:index] + word[index + 1] + word[index] + word[index + 2:]
+
+
+def queries(words: Sequence[str], count: int, rng: random.Random) -> List[str]:
+    """Mitad erratas de entradas (con una o dos ediciones), mitad palabras al azar"""
+    result = []
+    for index in range(count):
+        if index % 2:
+            result.append(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 14))))
+        else:
+            word = typo(rng.choice(words), rng)
+            result.append(typo(word, rng) if rng.random() < 0.3 else word)
+    return result
+
+
+def synthetic_lexicon(size: int, rng: random.Random) -> List[str]:
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 16))))
+    return sorted(words)
+
+
+def latencies_us(lookup: Callable[[str], object], words: Sequence[str]) -> List[float]:
+    """Latencia de cada consulta, ordenada (sin pausas del recolector, como timeit)"""
+    samples = []
+    gc.disable()
+    try:
+        for word in words:
+            started = time.perf_counter()
+            lookup(word)
+            samples.append((time.perf_counter() - started) * 1e6)
+    finally:
+        gc.enable()
+    samples.sort()
+    return samples
+
+
+def percentile(samples: Sequence[float], fraction: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def report(name: str, words: Sequence[str], sample: Sequence[str], brute_sample: int):
+    started = time.perf_counter()
+    index = FuzzyIndex(words)
+    build = time.perf_counter() - started
+
+    checked = sample[:brute_sample]
+    for word in checked:
+        assert index.lookup(word) == index.brute_force(word), word
+
+    fast = latencies_us(index.lookup, sample)
+    slow = latencies_us(index.brute_force, checked)
+    print(f"{name:>12} {len(words):>8} {len(index):>9} {index.memory_bytes() / 1024 / 1024:>7.1f} "
+          f"{build:>8.2f} {percentile(fast, 0.5):>8.1f} {percentile(fast, 0.99):>8.1f} {fast[-1]:>8.1f} "
+          f"{percentile(slow, 0.5):>10.1f} {percentile(slow, 0.5) / percentile(fast, 0.5):>7.0f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latencia de FuzzyIndex.lookup')
+    parser.add_argument('--synthetic', type=int, default=50000, help='entradas del léxico sintético')
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--brute', type=int, default=200, help='consultas verificadas por fuerza bruta')
+    args = parser.parse_args()
+    rng = random.Random(19)
+
+    analyzer = BasicAnalyzer()
+    lexicon = [analyzer.matcher.entry(entry_id) for entry_id in range(len(analyzer.matcher))]
+    synthetic = synthetic_lexicon(args.synthetic, rng)
+
+    print(f"{'lexicon':>12} {'entries':>8} {'variants':>9} {'MB':>7} {'build s':>8} "
+          f"{'p50 us':>8} {'p99 us':>8} {'max us':>8} {'brute p50':>10} {'speedup':>8}")
+    report('real', lexicon, queries(lexicon, args.queries, rng), args.brute)
+    report('synthetic', synthetic, queries(synthetic, args.queries, rng), args.brute // 4)
+
+    # Camino completo del analizador: autómata + erratas, palabra a palabra
+    sample = [analyzer.normalize(word) for word in queries(lexicon, args.queries, rng)]
+    full = latencies_us(lambda word: analyzer._lookup(word), sample)
+    print(f"\nBasicAnalyzer._lookup: p50 {percentile(full, 0.5):.1f} us, "
+          f"p99 {percentile(full, 0.99):.1f} us, max {full[-1]:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
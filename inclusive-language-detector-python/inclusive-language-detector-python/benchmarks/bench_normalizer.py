@@ -0,0 +1,73 @@
+# benchmarks/bench_normalizer.py - Costo por carácter de la normalización
+#
+# Uso: python -m benchmarks.bench_normalizer
+
+import random
+import re
+import timeit
+import unicodedata
+
+from services.basic_analyzer import BasicAnalyzer
+from services.normalizer import BASIC_SEPARATORS, TextNormalizer
+
+SAMPLE_WORDS = [
+    'Hola', 'mundo', 'p3nd3j0', 'n€gr0', 'm4r1c0n', 'pequeño', 'ÁRBOL',
+    'canción', 'l@s', 'amig@s', 'niñ@', '¿qué?', '¡vale!', 'ĉiuj', 'Σοφία',
+]
+
+
+def legacy_normalize(text: str, char_map: dict) -> str:
+    """Implementación anterior: un str.replace por cada entrada de char_map"""
+    if not text:
+        return ""
+    normalized = text.lower()
+    normalized = unicodedata.normalize('NFD', normalized)
+    normalized = ''.join(c for c in normalized if unicodedata.category(c) != 'Mn')
+    normalized = re.sub(r'[\s\-_\.\,\;\:\'\"\`\´\~\!\¡\¿\?\(\)\[\]\{\}\/\\\*\+\=\#\&\%\^\<\>\|]', '', normalized)
+    for char, replacement in char_map.items():
+        normalized = normalized.replace(char, replacement)
+    return normalized
+
+
+def build_text(length: int, seed: int = 42) -> str:
+    """Texto sintético reproducible de aproximadamente `length` caracteres"""
+    rng = random.Random(seed)
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(SAMPLE_WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)[:length]
+
+
+def per_char_ns(func, text: str, repeat: int = 5) -> float:
+    """Mejor tiempo por carácter (ns) de `func(text)`"""
+    number = max(1, 20000 // max(1, len(text)))
+    best = min(timeit.repeat(lambda: func(text), number=number, repeat=repeat))
+    return best / number / max(1, len(text)) * 1e9
+
+
+def main():
+    char_map = BasicAnalyzer().char_map
+    normalizer = TextNormalizer(char_map, BASIC_SEPARATORS)
+
+    print(f"{'chars':>8} {'legacy ns/char':>16} {'translate ns/char':>18} {'offsets ns/char':>16} {'speedup':>8}")
+    for length in (8, 64, 512, 5000, 50000):
+        text = build_text(length)
+        assert legacy_normalize(text, char_map) == normalizer.normalize(text)
+
+        legacy = per_char_ns(lambda t: legacy_normalize(t, char_map), text)
+        current = per_char_ns(normalizer.normalize, text)
+        offsets = per_char_ns(normalizer.normalize_with_offsets, text)
+        print(f"{length:>8} {legacy:>16.1f} {current:>18.1f} {offsets:>16.1f} {legacy / current:>7.1f}x")
+
+    # Texto solo ASCII: ruta rápida de str.translate
+    text = build_text(5000).encode('ascii', 'ignore').decode('ascii')
+    legacy = per_char_ns(lambda t: legacy_normalize(t, char_map), text)
+    current = per_char_ns(normalizer.normalize, text)
+    print(f"{'ascii':>8} {legacy:>16.1f} {current:>18.1f} {'-':>16} {legacy / current:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/bench_prompts.py - Tamaño del prompt completo frente al compacto
+#
+# Uso: python -m benchmarks.bench_prompts [--usage-log uso.jsonl]
+#
+# Sin llamar a la API: compara caracteres y tokens estimados de entrada por
+# texto. Con --usage-log resume un registro PRO_USAGE_LOG real (tokens y
+# latencia medidos por llamada).
+
+import argparse
+import json
+from collections import defaultdict
+
+from services.basic_analyzer import BasicAnalyzer
+from services.pro_analyzer import COMPACT_SYSTEM_PROMPT, SYSTEM_PROMPT, ProAnalyzer
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+FILLER = (
+    'Ayer fuimos al mercado del barrio y compramos fruta para toda la semana. '
+    'Por la tarde el equipo revisó el informe trimestral con calma. '
+)
+
+SAMPLES = [
+    'Mi amiga negra es médica y trabaja en el hospital central.',
+    'Eres un pendejo, no sirves para nada.',
+    FILLER * 3 + 'El jefe dijo que la nueva compañera es una loca histérica. ' + FILLER * 3,
+    FILLER * 8,
+    'Ese tipo es un m4r1c0n y un n3gr0 de mierda.',
+    FILLER * 2 + 'Qué retrasado eres, no entiendes nada. ' + FILLER * 5 + 'Mi amigo es gay y es un gran tipo.',
+]
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Tokens con tiktoken si está instalado; si no, estimación de ~4 caracteres por token"""
+    if tiktoken is not None:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding('cl100k_base')
+        return len(encoding.encode(text))
+    return max(1, len(text) // 4)
+
+
+def prompt_tokens(analyzer: ProAnalyzer, text: str, mode: str) -> int:
+    analyzer.prompt_mode = mode
+    kwargs = analyzer.completion_kwargs(text)
+    system = COMPACT_SYSTEM_PROMPT if mode == 'compact' else SYSTEM_PROMPT
+    return count_tokens(system + kwargs['messages'][1]['content'], analyzer.model)
+
+
+def summarize_usage_log(path: str):
+    """Medias por tipo de prompt de un registro JSONL de UsageRecorder"""
+    totals = defaultdict(lambda: defaultdict(float))
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            kind = totals[entry['kind']]
+            kind['calls'] += 1
+            kind['items'] += entry.get('items', 1)
+            kind['prompt_tokens'] += entry.get('prompt_tokens', 0)
+            kind['completion_tokens'] += entry.get('completion_tokens', 0)
+            kind['latency_ms'] += entry.get('latency_ms', 0)
+
+    print(f"\n{'kind':>8} {'calls':>6} {'prompt/item':>12} {'completion/item':>16} {'latency ms':>11}")
+    for name, kind in sorted(totals.items()):
+        items = max(1, kind['items'])
+        print(f"{name:>8} {int(kind['calls']):>6} {kind['prompt_tokens'] / items:>12.1f} "
+              f"{kind['completion_tokens'] / items:>16.1f} {kind['latency_ms'] / max(1, kind['calls']):>11.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara el tamaño de los prompts completo y compacto')
+    parser.add_argument('--usage-log', help='registro JSONL de uso real (PRO_USAGE_LOG) a resumir')
+    args = parser.parse_args()
+
+    basic = BasicAnalyzer()
+    analyzer = ProAnalyzer(candidate_finder=basic.candidate_spans)
+    source = 'tiktoken' if tiktoken is not None else 'chars/4'
+
+    print(f"tokens de entrada ({source}); max_tokens full=3000 compact={analyzer.compact_max_tokens}")
+    print(f"{'chars':>7} {'full':>7} {'compact':>8} {'ahorro':>7}")
+    full_total = compact_total = 0
+    for text in SAMPLES:
+        full = prompt_tokens(analyzer, text, 'full')
+        compact = prompt_tokens(analyzer, text, 'compact')
+        full_total += full
+        compact_total += compact
+        print(f"{len(text):>7} {full:>7} {compact:>8} {1 - compact / full:>6.0%}")
+    print(f"{'total':>7} {full_total:>7} {compact_total:>8} {1 - compact_total / full_total:>6.0%}")
+
+    if args.usage_log:
+        summarize_usage_log(args.usage_log)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+# benchmarks/bench_responses.py - Rendimiento del post-procesado de respuestas del LLM
+#
+# Uso: python -m benchmarks.bench_responses [--issues 8] [--batch 8]
+#
+# Sin llamar a la API: mide respuestas/s del decodificador validado
+# (services/llm_schema.py + ProAnalyzer.build_result) con respuestas limpias,
+# con bloques markdown, compactas, cortadas por max_tokens y de micro-lote,
+# y lo compara con el post-procesado anterior (regex + json.loads + parches a mano).
+
+import argparse
+import json
+import re
+from typing import Callable, Dict, List
+
+from services.llm_schema import SchemaError, decode_analysis, decode_batch
+from services.pro_analyzer import ProAnalyzer
+
+from .run import best_time
+
+TERMS = ['loca', 'retrasado', 'n3gr0', 'pendejo', 'histérica', 'subnormal', 'gitano', 'maricón']
+TYPES = ['sexist', 'ableist', 'ethnic', 'offensive']
+
+
+def sample_text(issues: int) -> str:
+    words = ' '.join(TERMS[index % len(TERMS)] for index in range(issues))
+    return f'El informe del equipo dice que {words} y poco más. ' * 3
+
+
+def full_issue(index: int) -> Dict:
+    return {
+        'type': TYPES[index % len(TYPES)],
+        'original_text': TERMS[index % len(TERMS)],
+        'suggestion': 'alternativa inclusiva',
+        'severity': ('high', 'medium', 'low')[index % 3],
+        'explanation': 'Se usa como insulto en este contexto y puede resultar ofensivo para muchas personas.',
+        'confidence': 0.9,
+    }
+
+
+def full_response(issues: int) -> str:
+    body = [full_issue(index) for index in range(issues)]
+    categories = dict.fromkeys(TYPES, 0)
+    for issue in body:
+        categories[issue['type']] += 1
+    return json.dumps({
+        'issues': body,
+        'stats': {'total_words': 40, 'issues_found': issues, 'inclusive_score': 100, 'categories': categories},
+        'overall_feedback': 'Análisis contextual del texto.',
+    }, ensure_ascii=False)
+
+
+def compact_response(issues: int) -> str:
+    return json.dumps({'issues': [
+        {'type': issue['type'], 'text': issue['original_text'], 'fix': issue['suggestion'],
+         'sev': issue['severity'][0], 'why': issue['explanation']}
+        for issue in map(full_issue, range(issues))
+    ]}, ensure_ascii=False)
+
+
+def batch_response(items: int, issues: int) -> str:
+    return json.dumps({'results': {
+        str(item): {'issues': [full_issue(index) for index in range(issues)], 'overall_feedback': 'ok'}
+        for item in range(items)
+    }}, ensure_ascii=False)
+
+
+def legacy_process(text: str, ai_response: str) -> Dict:
+    """Post-procesado anterior: regex para los bloques markdown, json.loads y parches a mano"""
+    clean = ai_response.strip()
+    clean = re.sub(r'```json\n?', '', clean)
+    clean = re.sub(r'```\n?', '', clean).strip()
+    analysis = json.loads(clean)
+    analysis.setdefault('issues', [])
+    if 'stats' not in analysis:
+        analysis['stats'] = {'total_words': len(text.split()), 'issues_found': 0, 'inclusive_score': 100,
+                             'categories': dict.fromkeys(TYPES, 0)}
+    for issue in analysis['issues']:
+        if issue.get('type', 'offensive') in analysis['stats']['categories']:
+            analysis['stats']['categories'][issue['type']] += 1
+    analysis['stats']['issues_found'] = len(analysis['issues'])
+    return {
+        'original_text': text,
+        'issues': analysis['issues'],
+        'suggestions': [
+            {'original': issue.get('original_text', ''), 'replacement': issue.get('suggestion', ''),
+             'reason': issue.get('explanation', 'Sin explicación')}
+            for issue in analysis['issues']
+        ],
+        'stats': analysis['stats'],
+        'overall_feedback': analysis.get('overall_feedback', ''),
+    }
+
+
+def rate(func: Callable[[], object], responses: int = 1) -> float:
+    """Respuestas por segundo"""
+    return responses / best_time(func)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Post-procesado de respuestas del LLM')
+    parser.add_argument('--issues', type=int, default=8, help='issues por respuesta')
+    parser.add_argument('--batch', type=int, default=8, help='elementos por micro-lote')
+    args = parser.parse_args()
+
+    analyzer = ProAnalyzer(backend=None)
+    text = sample_text(args.issues)
+    full = full_response(args.issues)
+    fenced = f'```json\n{full}\n```'
+    truncated = full[:int(len(full) * 0.7)]
+    compact = compact_response(args.issues)
+    batch = batch_response(args.batch, args.issues)
+
+    def batch_results(raw: str) -> List[Dict]:
+        analyses, _ = decode_batch(raw)
+        return [analyzer.build_result(text, analysis) for analysis in analyses.values()]
+
+    # El decodificador no puede perder issues válidos ni contar categorías dos veces
+    result = analyzer.build_result(text, decode_analysis(full))
+    assert len(result['issues']) == args.issues
+    assert sum(result['stats']['categories'].values()) == args.issues
+    assert len(batch_results(batch)) == args.batch
+
+    cases = [
+        ('full', lambda: analyzer.build_result(text, decode_analysis(full)), lambda: legacy_process(text, full), 1),
+        ('fenced', lambda: analyzer.build_result(text, decode_analysis(fenced)), lambda: legacy_process(text, fenced), 1),
+        ('compact', lambda: analyzer.build_result(text, decode_analysis(compact)), None, 1),
+        ('truncated', lambda: analyzer.build_result(text, decode_analysis(truncated)), None, 1),
+        (f'batch x{args.batch}', lambda: batch_results(batch), None, args.batch),
+    ]
+
+    print(f"{'respuesta':>12} {'bytes':>7} {'resp/s':>10} {'us/resp':>8} {'antes resp/s':>13}")
+    for name, new, old, items in cases:
+        raw_size = len({'full': full, 'fenced': fenced, 'compact': compact, 'truncated': truncated}.get(name, batch))
+        per_second = rate(new, items)
+        if old is not None:
+            before = f'{rate(old):>13.0f}'
+        else:
+            try:
+                legacy_process(text, truncated if name == 'truncated' else compact)
+                before = f"{'-':>13}"
+            except (ValueError, KeyError):
+                before = f"{'error':>13}"
+        print(f'{name:>12} {raw_size:>7} {per_second:>10.0f} {1e6 / per_second:>8.1f} {before}')
+
+    try:
+        decode_analysis('Lo siento, no puedo ayudar con eso.')
+    except SchemaError as e:
+        print(f'\nrespuesta irrecuperable -> SchemaError ({e}): re-pregunta de reparación')
+
+
+if __name__ == '__main__':
+    main()
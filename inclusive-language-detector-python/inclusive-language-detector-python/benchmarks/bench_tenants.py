@@ -0,0 +1,148 @@
+# benchmarks/bench_tenants.py - Léxicos por tenant: compilación de capas y recarga en caliente bajo carga
+#
+# Uso: python -m benchmarks.bench_tenants [--terms 200] [--exclude 20] [--tenants 8] [--seconds 3]
+#
+# Compara compilar solo la capa de un tenant con recompilar el léxico base
+# completo, mide el coste de consultar base + capa frente al base solo y
+# lanza análisis concurrentes mientras las capas se reescriben y se recargan
+# en segundo plano: la latencia máxima no debe dispararse durante las recargas.
+
+import argparse
+import json
+import os
+import random
+import string
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from services.basic_analyzer import BasicAnalyzer
+from services.tenant_lexicons import FileOverlaySource, TenantLexicons, compile_overlay, overlay_fingerprint
+
+from .corpus import generate_many
+from .run import best_time
+from .load_test import percentile
+
+CATEGORIES = ('sexist', 'ableist', 'ethnic', 'offensive')
+
+
+def synthetic_overlay(analyzer: BasicAnalyzer, terms: int, exclude: int, rng: random.Random) -> Dict:
+    """Capa con `terms` términos inventados repartidos por categoría y `exclude` términos base excluidos"""
+    add = {category: {'terms': [], 'phrases': []} for category in CATEGORIES}
+    for index in range(terms):
+        word = ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(6, 10)))
+        add[CATEGORIES[index % len(CATEGORIES)]]['terms'].append(word)
+    base_terms = [analyzer.matcher.entry(entry_id) for entry_id in range(len(analyzer.matcher))]
+    return {
+        'add': add,
+        'exclude': rng.sample(base_terms, min(exclude, len(base_terms))),
+        'suggestions': {add['offensive']['terms'][0]: 'alternativa del tenant'} if terms >= 4 else {},
+    }
+
+
+def write_overlay(directory: str, tenant: str, overlay: Dict):
+    """Escritura atómica (como haría un despliegue): nunca se lee un archivo a medias"""
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+        json.dump(overlay, handle, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(directory, f'{tenant}.json'))
+
+
+def under_load(registry: TenantLexicons, tenants: List[str], texts: List[str], seconds: float,
+               rewrite=None, threads: int = 4) -> Dict:
+    """Análisis concurrentes durante `seconds`; `rewrite()` se llama cada 0.2 s si se pasa"""
+    latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def worker(number: int):
+        rng = random.Random(number)
+        local = []
+        while time.monotonic() < stop:
+            tenant = rng.choice(tenants)
+            text = rng.choice(texts)
+            started = time.perf_counter()
+            try:
+                registry.get(tenant).analyze(text)
+            except Exception as e:
+                errors.append(str(e))
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(number,)) for number in range(threads)]
+    for thread in pool:
+        thread.start()
+    while rewrite is not None and time.monotonic() < stop:
+        rewrite()
+        time.sleep(0.2)
+    for thread in pool:
+        thread.join()
+
+    return {
+        'calls': len(latencies),
+        'errors': len(errors),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(max(latencies, default=0.0) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Léxicos por tenant')
+    parser.add_argument('--terms', type=int, default=200, help='términos añadidos por tenant')
+    parser.add_argument('--exclude', type=int, default=20, help='términos base excluidos por tenant')
+    parser.add_argument('--tenants', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=3.0, help='duración de cada prueba bajo carga')
+    parser.add_argument('--length', type=int, default=1000, help='caracteres por texto')
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    analyzer = BasicAnalyzer()
+    overlay = synthetic_overlay(analyzer, args.terms, args.exclude, rng)
+    texts = list(generate_many('mixed', args.length, 20))
+
+    base_db = analyzer._build_base_database()
+    full_ms = best_time(lambda: analyzer._compile_lexicon(base_db), min_seconds=0.0, repeat=2) * 1000
+    fingerprint = overlay_fingerprint(overlay)
+    layer_ms = best_time(lambda: compile_overlay(analyzer, overlay, fingerprint), repeat=3) * 1000
+    tenant_analyzer, _ = compile_overlay(analyzer, overlay, fingerprint)
+    print(f'compilar léxico base completo: {full_ms:8.1f} ms')
+    print(f'compilar capa del tenant:      {layer_ms:8.1f} ms  '
+          f'({args.terms} términos, {args.exclude} exclusiones)')
+
+    base_ms = best_time(lambda: [analyzer.analyze(text) for text in texts], repeat=3) / len(texts) * 1000
+    layered_ms = best_time(lambda: [tenant_analyzer.analyze(text) for text in texts], repeat=3) / len(texts) * 1000
+    print(f'analizar {args.length} caracteres: base {base_ms:.2f} ms, base + capa {layered_ms:.2f} ms '
+          f'({layered_ms / base_ms:.2f}x)')
+
+    with tempfile.TemporaryDirectory() as directory:
+        tenants = [f'tenant{index}' for index in range(args.tenants)]
+        for tenant in tenants:
+            write_overlay(directory, tenant, synthetic_overlay(analyzer, args.terms, args.exclude, rng))
+        registry = TenantLexicons(analyzer, FileOverlaySource(directory), max_tenants=args.tenants,
+                                  reload_interval=0.1)
+        for tenant in tenants:
+            registry.get(tenant)
+
+        steady = under_load(registry, tenants, texts, args.seconds)
+
+        def rewrite():
+            tenant = rng.choice(tenants)
+            write_overlay(directory, tenant, synthetic_overlay(analyzer, args.terms, args.exclude, rng))
+
+        reloading = under_load(registry, tenants, texts, args.seconds, rewrite)
+        stats = registry.stats()
+
+    print(f"\n{'carga':>16} {'llamadas':>9} {'errores':>8} {'p50 ms':>8} {'p99 ms':>8} {'máx ms':>8}")
+    for name, result in (('sin recargas', steady), ('con recargas', reloading)):
+        print(f"{name:>16} {result['calls']:>9} {result['errors']:>8} {result['p50_ms']:>8} "
+              f"{result['p99_ms']:>8} {result['max_ms']:>8}")
+    print(f"recargas: {stats['reloads']}, compilaciones: {stats['builds']} "
+          f"({stats['build_ms'] / max(1, stats['builds']):.1f} ms de media)")
+
+
+if __name__ == '__main__':
+    main()
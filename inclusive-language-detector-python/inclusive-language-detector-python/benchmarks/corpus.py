@@ -0,0 +1,137 @@
+# benchmarks/corpus.py - Generador reproducible de corpus sintéticos en español
+#
+# Uso: python -m benchmarks.corpus --kind evasion --length 2000 --count 3
+#
+# Tipos de texto:
+#   clean   - prosa neutral sin términos del léxico
+#   dense   - prosa con insultos y estereotipos frecuentes
+#   evasion - como dense, pero los términos van ofuscados ("p 3 n d 3 j 0", "n€gr0")
+#   mixed   - mezcla de los anteriores, con usos descriptivos y defensivos
+#
+# Las listas son fijas (no se leen del léxico) para que el corpus no cambie
+# cuando cambie el léxico y los resultados sigan siendo comparables.
+
+import argparse
+import json
+import random
+from typing import Iterator, List
+
+KINDS = ('clean', 'dense', 'evasion', 'mixed')
+
+SUBJECTS = [
+    'La profesora', 'El equipo', 'Mi vecino', 'La directora', 'El grupo de trabajo',
+    'Mi hermana', 'El médico', 'La comunidad', 'El nuevo compañero', 'La alcaldesa',
+]
+VERBS = [
+    'presentó', 'revisó', 'explicó', 'organizó', 'preparó', 'comentó', 'terminó', 'propuso',
+]
+OBJECTS = [
+    'el informe trimestral', 'un plan para el barrio', 'la reunión del lunes',
+    'los resultados del proyecto', 'una receta de cocina', 'el calendario de entregas',
+    'la visita al museo', 'un taller de lectura', 'las cuentas del mes',
+]
+ENDINGS = [
+    'con mucha calma', 'antes de la comida', 'durante la tarde', 'en la biblioteca',
+    'sin ningún problema', 'junto a sus colegas', 'en pocos minutos',
+]
+
+SLURS = [
+    'pendejo', 'idiota', 'imbécil', 'retrasado', 'subnormal', 'mongólico', 'maricón',
+    'puta', 'zorra', 'perra', 'loca', 'histérica', 'tarado', 'negro', 'sudaca', 'indio',
+    'gitano', 'gordo', 'estúpido', 'inútil',
+]
+INSULT_TEMPLATES = [
+    'Eres un {term}, no sirves para nada.',
+    'Ese {term} de mierda siempre llega tarde.',
+    'Qué {term} eres, maldito.',
+    'Mi jefe dijo que la nueva es una {term}.',
+    'No seas {term}, pinche inútil.',
+    'Trabaja como {term} y nadie lo respeta.',
+]
+NEUTRAL_TEMPLATES = [
+    'Mi amigo {term} es médico y respeta a todas las personas.',
+    'En clase de historia hablamos del término {term} y su uso ofensivo.',
+    'La comunidad defiende la dignidad de cada persona.',
+    'Tengo 25 años y llegué al nivel 3 del curso.',
+]
+
+LEET = {'a': '4', 'e': '3', 'i': '1', 'o': '0', 's': '5', 't': '7'}
+SYMBOLS = {'a': '@', 'e': '€', 'i': '!', 'o': '0', 's': '$'}
+
+
+def obfuscate(term: str, rng: random.Random) -> str:
+    """Ofusca un término como lo haría alguien que intenta evadir el filtro"""
+    style = rng.choice(('leet', 'symbols', 'spaced', 'spaced_leet', 'dotted'))
+    if style == 'leet':
+        return ''.join(LEET.get(ch, ch) for ch in term)
+    if style == 'symbols':
+        return ''.join(SYMBOLS.get(ch, ch) for ch in term)
+    if style == 'spaced':
+        return ' '.join(term)
+    if style == 'spaced_leet':
+        return ' '.join(LEET.get(ch, ch) for ch in term)
+    return '.'.join(term)
+
+
+def neutral_sentence(rng: random.Random) -> str:
+    return f'{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(ENDINGS)}.'
+
+
+def sentence(kind: str, rng: random.Random) -> str:
+    """Una oración del tipo pedido"""
+    if kind == 'mixed':
+        kind = rng.choice(('clean', 'clean', 'dense', 'evasion', 'neutral'))
+
+    if kind == 'clean':
+        return neutral_sentence(rng)
+    if kind == 'neutral':
+        return rng.choice(NEUTRAL_TEMPLATES).format(term=rng.choice(SLURS))
+
+    # dense / evasion: dos de cada tres oraciones llevan un término
+    if rng.random() < 0.33:
+        return neutral_sentence(rng)
+    term = rng.choice(SLURS)
+    if kind == 'evasion':
+        term = obfuscate(term, rng)
+    return rng.choice(INSULT_TEMPLATES).format(term=term)
+
+
+def generate(kind: str, length: int, seed: int = 0) -> str:
+    """Texto reproducible de aproximadamente `length` caracteres"""
+    if kind not in KINDS:
+        raise ValueError(f'Tipo de corpus desconocido: {kind} (usa {", ".join(KINDS)})')
+
+    rng = random.Random(f'{kind}-{length}-{seed}')
+    sentences: List[str] = []
+    size = 0
+    while size < length:
+        text = sentence(kind, rng)
+        sentences.append(text)
+        size += len(text) + 1
+        # Párrafos de 4 a 8 oraciones
+        if rng.random() < 0.18:
+            sentences[-1] += '\n'
+
+    return ' '.join(sentences)[:max(length, 1)].rstrip()
+
+
+def generate_many(kind: str, length: int, count: int, seed: int = 0) -> Iterator[str]:
+    """`count` textos distintos del mismo tipo y longitud"""
+    for index in range(count):
+        yield generate(kind, length, seed + index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera un corpus sintético (un JSON por línea)')
+    parser.add_argument('--kind', choices=KINDS, default='mixed')
+    parser.add_argument('--length', type=int, default=500)
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for text in generate_many(args.kind, args.length, args.count, args.seed):
+        print(json.dumps({'text': text}, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
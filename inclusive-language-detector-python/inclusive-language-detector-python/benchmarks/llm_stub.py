@@ -0,0 +1,295 @@
+# benchmarks/llm_stub.py - Servidor local compatible con OpenAI para pruebas de carga sin red
+#
+# Uso:
+#   python -m benchmarks.llm_stub --port 8089 --latency-ms 400 --jitter-ms 150 \
+#       --error-rate 0.02 --rate-limit-rate 0.05 --fixtures grabaciones.jsonl
+#
+#   OPENAI_BASE_URL=http://127.0.0.1:8089/v1 python app.py
+#
+# Atiende POST /v1/chat/completions con las respuestas grabadas en --fixtures
+# (PRO_RECORD_FIXTURES las graba desde una sesión real) o, si la petición no
+# está grabada, con una respuesta válida sin issues. Inyecta latencia, errores
+# 500, 429 con Retry-After y respuestas lentas (cola larga) según las
+# probabilidades indicadas. Con --rpm aplica un límite por minuto como el de
+# OpenAI y envía las cabeceras x-ratelimit-* en cada respuesta. Con
+# "stream": true responde en SSE (chat.completion.chunk): el primer fragmento
+# llega tras ~30% de la latencia y el resto se reparte en el tiempo restante.
+# --issues N añade N issues sintéticos por texto a las respuestas no grabadas.
+# GET /stats devuelve los contadores del servidor.
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from services.llm_backends import ReplayBackend, content_chunks, load_fixtures
+
+# Parte de la latencia que pasa antes del primer fragmento en streaming
+FIRST_CHUNK_SHARE = 0.3
+
+
+def stream_chunks(body: Dict, include_usage: bool = False) -> list:
+    """Respuesta completa de chat.completions -> fragmentos chat.completion.chunk"""
+    base = {'id': body['id'], 'object': 'chat.completion.chunk', 'created': body['created'], 'model': body['model']}
+    content = body['choices'][0]['message']['content'] or ''
+    chunks = [
+        dict(base, choices=[{'index': 0, 'delta': dict({'role': 'assistant'} if index == 0 else {}, content=piece),
+                             'finish_reason': None}])
+        for index, piece in enumerate(content_chunks(content))
+    ]
+    chunks.append(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))
+    if include_usage:
+        chunks.append(dict(base, choices=[], usage=body['usage']))
+    return chunks
+
+
+class StubConfig:
+    """Comportamiento del servidor (modificable en caliente desde las pruebas)"""
+
+    def __init__(self, latency: float = 0.3, jitter: float = 0.1, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, retry_after: float = 1.0, seed: Optional[int] = None,
+                 slow_rate: float = 0.0, slow_latency: float = 5.0, rpm: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.rpm = rpm
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window_started = time.monotonic()
+        self.window_count = 0
+        self.counters = {'requests': 0, 'ok': 0, 'errors': 0, 'rate_limited': 0, 'slow': 0,
+                         'in_flight': 0, 'peak_in_flight': 0}
+
+    def admit(self):
+        """Ventana fija de un minuto con --rpm: (admitida, cabeceras x-ratelimit-*)"""
+        if not self.rpm:
+            return True, {}
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_started >= 60:
+                self.window_started, self.window_count = now, 0
+            admitted = self.window_count < self.rpm
+            if admitted:
+                self.window_count += 1
+            reset = max(0.0, 60 - (now - self.window_started))
+            remaining = self.rpm - self.window_count
+        return admitted, {
+            'x-ratelimit-limit-requests': str(self.rpm),
+            'x-ratelimit-remaining-requests': str(remaining),
+            'x-ratelimit-reset-requests': f'{reset:.3f}s',
+        }
+
+    def draw(self):
+        """(latencia en segundos, resultado inyectado: None, 'error', 'rate_limit' o 'slow')"""
+        with self.lock:
+            latency = max(0.0, self.rng.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+            roll = self.rng.random()
+            slow = self.rng.random() < self.slow_rate
+        if slow:
+            return self.slow_latency, 'slow'
+        if roll < self.rate_limit_rate:
+            return 0.0, 'rate_limit'
+        if roll < self.rate_limit_rate + self.error_rate:
+            return latency, 'error'
+        return latency, None
+
+    def count(self, **changes):
+        with self.lock:
+            for name, delta in changes.items():
+                self.counters[name] += delta
+            self.counters['peak_in_flight'] = max(self.counters['peak_in_flight'], self.counters['in_flight'])
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return dict(self.counters)
+
+
+def make_handler(config: StubConfig, replay: ReplayBackend):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None):
+            payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            try:
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+            except (BrokenPipeError, ConnectionResetError):
+                # El cliente canceló la petición (p. ej. ganó su hedge)
+                self.close_connection = True
+
+        def send_stream(self, chunks: list, latency: float, headers: Optional[Dict[str, str]] = None):
+            """Respuesta SSE por trozos (Transfer-Encoding: chunked) terminada en 'data: [DONE]'"""
+            time.sleep(latency * FIRST_CHUNK_SHARE)
+            pause = latency * (1 - FIRST_CHUNK_SHARE) / max(1, len(chunks))
+            try:
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                events = [f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n' for chunk in chunks]
+                for index, event in enumerate(events + ['data: [DONE]\n\n']):
+                    if index and index < len(events):
+                        time.sleep(pause)
+                    data = event.encode('utf-8')
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                    self.wfile.flush()
+                self.wfile.write(b'0\r\n\r\n')
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+
+        def do_GET(self):
+            if self.path.rstrip('/') in ('/stats', '/v1/stats'):
+                stats = config.stats()
+                stats.update({'replay_hits': replay.hits, 'replay_misses': replay.misses})
+                return self.send_json(200, stats)
+            if self.path.rstrip('/') == '/v1/models':
+                return self.send_json(200, {'object': 'list', 'data': [{'id': 'local-stub', 'object': 'model'}]})
+            return self.send_json(404, {'error': {'message': 'No encontrado', 'type': 'not_found'}})
+
+        def do_POST(self):
+            if self.path.rstrip('/') not in ('/v1/chat/completions', '/chat/completions'):
+                return self.send_json(404, {'error': {'message': 'No encontrado', 'type': 'not_found'}})
+
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                kwargs = json.loads(self.rfile.read(length) or b'{}')
+                valid = isinstance(kwargs['messages'][-1]['content'], str)
+            except (ValueError, KeyError, IndexError, TypeError):
+                valid = False
+            if not valid:
+                return self.send_json(400, {'error': {'message': 'Petición inválida', 'type': 'invalid_request_error'}})
+
+            config.count(requests=1, in_flight=1)
+            try:
+                admitted, limits = config.admit()
+                latency, outcome = config.draw()
+                if not admitted or outcome == 'rate_limit':
+                    config.count(rate_limited=1)
+                    retry_after = float(limits['x-ratelimit-reset-requests'][:-1]) if not admitted else config.retry_after
+                    headers = {'x-ratelimit-remaining-requests': '0',
+                               'x-ratelimit-reset-requests': f'{retry_after:g}s'}
+                    headers.update({key: value for key, value in limits.items() if key not in headers})
+                    headers['Retry-After'] = f'{retry_after:g}'
+                    return self.send_json(
+                        429,
+                        {'error': {'message': 'Rate limit reached (stub)', 'type': 'requests', 'code': 'rate_limit_exceeded'}},
+                        headers,
+                    )
+
+                streaming = bool(kwargs.get('stream'))
+                if not streaming:
+                    time.sleep(latency)
+                if outcome == 'slow':
+                    config.count(slow=1)
+                if outcome == 'error':
+                    config.count(errors=1)
+                    if streaming:
+                        time.sleep(latency * FIRST_CHUNK_SHARE)
+                    return self.send_json(500, {'error': {'message': 'Error interno (stub)', 'type': 'server_error'}}, limits)
+
+                try:
+                    body = replay.payload(kwargs)
+                except LookupError as e:
+                    config.count(errors=1)
+                    return self.send_json(404, {'error': {'message': str(e), 'type': 'not_found'}}, limits)
+                config.count(ok=1)
+                if streaming:
+                    include_usage = bool((kwargs.get('stream_options') or {}).get('include_usage'))
+                    return self.send_stream(stream_chunks(body, include_usage), latency, limits)
+                return self.send_json(200, body, limits)
+            finally:
+                config.count(in_flight=-1)
+
+    return Handler
+
+
+class StubServer:
+    """Servidor HTTP en un hilo de fondo (también usable desde otros scripts)"""
+
+    def __init__(self, config: StubConfig, replay: Optional[ReplayBackend] = None,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.config = config
+        self.replay = replay or ReplayBackend()
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(config, self.replay))
+        self.httpd.daemon_threads = True
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self) -> 'StubServer':
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='llm-stub', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--latency-ms', type=float, default=300, help='latencia media por respuesta')
+    parser.add_argument('--jitter-ms', type=float, default=100, help='desviación típica de la latencia')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='probabilidad de un 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='probabilidad de un 429')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='Retry-After de los 429 (s)')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='probabilidad de una respuesta lenta')
+    parser.add_argument('--slow-ms', type=float, default=5000, help='latencia de las respuestas lentas')
+    parser.add_argument('--rpm', type=int, default=0, help='límite de peticiones por minuto (0: sin límite)')
+    parser.add_argument('--issues', type=int, default=0, help='issues sintéticos por texto (respuestas no grabadas)')
+    parser.add_argument('--fixtures', help='JSONL de respuestas grabadas (PRO_RECORD_FIXTURES)')
+    parser.add_argument('--strict', action='store_true', help='404 para peticiones no grabadas')
+    parser.add_argument('--seed', type=int, default=None)
+
+
+def stub_from_args(args, host: str = '127.0.0.1', port: int = 0) -> StubServer:
+    config = StubConfig(
+        latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after, seed=args.seed,
+        slow_rate=args.slow_rate, slow_latency=args.slow_ms / 1000, rpm=args.rpm,
+    )
+    replay = ReplayBackend(load_fixtures(args.fixtures) if args.fixtures else {}, strict=args.strict,
+                           issues=args.issues)
+    return StubServer(config, replay, host, port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor local compatible con la API de OpenAI')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = stub_from_args(args, args.host, args.port)
+    print(f"🧪 Stub del LLM en {server.base_url} ({len(server.replay.fixtures)} respuestas grabadas)")
+    print(f"   OPENAI_BASE_URL={server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
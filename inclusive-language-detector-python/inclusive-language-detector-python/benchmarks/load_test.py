@@ -0,0 +1,284 @@
+# benchmarks/load_test.py - Prueba de carga de /api/analyze (modo pro) con latencia p50/p99
+#
+# Uso:
+#   # contra una app ya levantada
+#   python -m benchmarks.load_test --url http://127.0.0.1:5000 --concurrency 32 --requests 500
+#
+#   # todo en local y sin red: levanta el stub del LLM y la app (gunicorn) y los apunta entre sí
+#   python -m benchmarks.load_test --spawn --concurrency 32 --requests 500 \
+#       --latency-ms 400 --rate-limit-rate 0.05 --error-rate 0.01
+#
+#   # incidente: la mitad de las llamadas fallan y un 5% tarda 8 s; el circuit
+#   # breaker debe abrir y las respuestas llegar del modo básico sin esperar
+#   python -m benchmarks.load_test --spawn --error-rate 0.5 --slow-rate 0.05 --slow-ms 8000
+#
+#   # análisis progresivo (/api/analyze/events): tiempo hasta el primer issue
+#   # frente al tiempo total; compárese con la misma carga sin --stream
+#   python -m benchmarks.load_test --spawn --stream --issues 3 --latency-ms 1500
+#
+# Cada petición lleva un texto distinto del corpus sintético (con un sufijo
+# único) para que la caché de resultados no responda por el LLM.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from .corpus import KINDS, generate_many
+from .llm_stub import add_stub_arguments, stub_from_args
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples: Sequence[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def post(url: str, payload: Dict, timeout: float) -> Dict:
+    """{'status': código HTTP (0 si no hubo respuesta), 'body': JSON de la respuesta}"""
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json'}, method='POST'
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return {'status': response.status, 'body': json.loads(response.read() or b'null')}
+    except urllib.error.HTTPError as e:
+        try:
+            body = json.loads(e.read() or b'null')
+        except ValueError:
+            body = None
+        return {'status': e.code, 'body': body}
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        return {'status': 0, 'body': {'error': str(e)}}
+
+
+def post_stream(url: str, payload: Dict, timeout: float) -> Dict:
+    """Como post, pero lee los eventos NDJSON de /api/analyze/events según llegan.
+
+    'body' es el evento final (summary o error) y 'first_issue' los segundos
+    hasta el primer issue (None si no hubo ninguno).
+    """
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode('utf-8'),
+        headers={'Content-Type': 'application/json', 'Accept': 'application/x-ndjson'}, method='POST'
+    )
+    started = time.perf_counter()
+    first_issue = None
+    body = None
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            for line in response:
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event.get('event') == 'issue':
+                    if first_issue is None:
+                        first_issue = time.perf_counter() - started
+                else:
+                    body = event
+            return {'status': response.status, 'body': body, 'first_issue': first_issue}
+    except urllib.error.HTTPError as e:
+        try:
+            body = json.loads(e.read() or b'null')
+        except ValueError:
+            body = None
+        return {'status': e.code, 'body': body}
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        return {'status': 0, 'body': {'error': str(e)}}
+
+
+def run_load(url: str, texts: List[str], mode: str, concurrency: int, timeout: float,
+             stream: bool = False) -> Dict:
+    """Lanza todas las peticiones con `concurrency` en vuelo y resume latencias y errores"""
+    endpoint = f"{url.rstrip('/')}/api/analyze{'/events' if stream else ''}?mode={mode}"
+    latencies: List[float] = []
+    first_issues: List[float] = []
+    errors: Dict[str, int] = {}
+    fallbacks: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def one(text: str):
+        started = time.perf_counter()
+        response = (post_stream if stream else post)(endpoint, {'text': text, 'mode': mode}, timeout)
+        elapsed = time.perf_counter() - started
+
+        body = response['body'] if isinstance(response['body'], dict) else {}
+        if response['status'] != 200:
+            reason = f"http_{response['status']}"
+        elif 'error' in body:
+            reason = 'result_error'
+        else:
+            reason = None
+
+        fallback = body.get('fallback') or body.get('escalation', {}).get('error') and {'reason': 'hybrid'}
+        with lock:
+            latencies.append(elapsed)
+            if response.get('first_issue') is not None:
+                first_issues.append(response['first_issue'])
+            if reason:
+                errors[reason] = errors.get(reason, 0) + 1
+            elif fallback:
+                fallbacks[fallback['reason']] = fallbacks.get(fallback['reason'], 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, texts))
+    wall = time.perf_counter() - started
+
+    ok = len(texts) - sum(errors.values())
+    summary = {
+        'mode': mode,
+        'stream': stream,
+        'requests': len(texts),
+        'concurrency': concurrency,
+        'ok': ok,
+        'errors': errors,
+        'fallbacks': fallbacks,
+        'wall_s': round(wall, 3),
+        'throughput_rps': round(len(texts) / wall, 2) if wall else 0.0,
+        'ok_throughput_rps': round(ok / wall, 2) if wall else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 1),
+            'p90': round(percentile(latencies, 0.90) * 1000, 1),
+            'p99': round(percentile(latencies, 0.99) * 1000, 1),
+            'max': round(max(latencies, default=0.0) * 1000, 1),
+        },
+    }
+    if stream:
+        # Sin streaming el primer issue llega con la respuesta completa (latency_ms)
+        summary['first_issue_ms'] = {
+            'count': len(first_issues),
+            'p50': round(percentile(first_issues, 0.50) * 1000, 1),
+            'p90': round(percentile(first_issues, 0.90) * 1000, 1),
+            'p99': round(percentile(first_issues, 0.99) * 1000, 1),
+        }
+    return summary
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'La app terminó al arrancar (código {process.returncode})')
+        try:
+            with urllib.request.urlopen(f"{url.rstrip('/')}/api/health", timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'La app no respondió en {timeout:g}s')
+
+
+def spawn_app(port: int, base_url: str, workers: int, threads: int) -> subprocess.Popen:
+    """Levanta la app con gunicorn (o el servidor de Flask si no está) apuntando al stub"""
+    env = dict(os.environ)
+    env.update({
+        'PORT': str(port),
+        'OPENAI_BASE_URL': base_url,
+        'OPENAI_API_KEY': env.get('OPENAI_API_KEY') or 'sk-local',
+        'PRO_BACKEND': 'openai',
+        'WEB_CONCURRENCY': str(workers),
+        'GUNICORN_THREADS': str(threads),
+    })
+    try:
+        import gunicorn  # noqa: F401
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app']
+    except ImportError:
+        command = [sys.executable, 'app.py']
+    return subprocess.Popen(command, cwd=PROJECT_ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+
+
+def fetch_json(url: str) -> Optional[Dict]:
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return json.loads(response.read())
+    except (OSError, ValueError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Prueba de carga de /api/analyze')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--mode', default='pro', choices=('basic', 'pro', 'hybrid'))
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--length', type=int, default=400, help='caracteres por texto')
+    parser.add_argument('--kind', choices=KINDS, default='mixed')
+    parser.add_argument('--timeout', type=float, default=60.0, help='timeout por petición (s)')
+    parser.add_argument('--output', help='guarda el resumen en JSON')
+    parser.add_argument('--stream', action='store_true',
+                        help='usa /api/analyze/events y mide el tiempo hasta el primer issue')
+    parser.add_argument('--spawn', action='store_true', help='levanta el stub del LLM y la app en local')
+    parser.add_argument('--app-port', type=int, default=5055)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=16)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    texts = [
+        f'{text} [{index}]'
+        for index, text in enumerate(generate_many(args.kind, args.length, args.requests))
+    ]
+
+    stub = app = None
+    url = args.url
+    try:
+        if args.spawn:
+            stub = stub_from_args(args).start()
+            app = spawn_app(args.app_port, stub.base_url, args.workers, args.threads)
+            url = f'http://127.0.0.1:{args.app_port}'
+            wait_until_ready(url, app)
+            print(f"🧪 Stub en {stub.base_url}, app en {url}")
+
+        summary = run_load(url, texts, args.mode, args.concurrency, args.timeout, args.stream)
+        if stub is not None:
+            summary['stub'] = stub.config.stats()
+        health = fetch_json(f"{url.rstrip('/')}/api/health")
+        if health:
+            summary['llm_usage'] = health.get('llm_usage')
+            summary['pro_batching'] = health.get('pro_batching')
+            summary['llm_gateway'] = health.get('llm_gateway')
+    finally:
+        if app is not None:
+            app.terminate()
+            try:
+                app.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                app.kill()
+        if stub is not None:
+            stub.stop()
+
+    latency = summary['latency_ms']
+    print(f"{summary['requests']} peticiones ({summary['mode']}), concurrencia {summary['concurrency']}: "
+          f"{summary['ok']} ok (respaldo básico: {summary['fallbacks'] or 0}), errores {summary['errors'] or 0}")
+    print(f"throughput {summary['throughput_rps']} req/s ({summary['ok_throughput_rps']} ok/s) | "
+          f"p50 {latency['p50']} ms  p90 {latency['p90']} ms  p99 {latency['p99']} ms  max {latency['max']} ms")
+    if 'first_issue_ms' in summary:
+        first = summary['first_issue_ms']
+        print(f"primer issue ({first['count']} respuestas con issues): "
+              f"p50 {first['p50']} ms  p90 {first['p90']} ms  p99 {first['p99']} ms")
+    if 'stub' in summary:
+        print(f"stub: {summary['stub']}")
+    if summary.get('llm_gateway'):
+        print(f"gateway: {summary['llm_gateway']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(summary, handle, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
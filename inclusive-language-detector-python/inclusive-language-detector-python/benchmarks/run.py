@@ -0,0 +1,289 @@
+# benchmarks/run.py - Suite de rendimiento de BasicAnalyzer con comparación contra una línea base
+#
+# Uso:
+#   python -m benchmarks.run                      # suite completa, imprime la tabla
+#   python -m benchmarks.run --quick              # tamaños pequeños (CI)
+#   python -m benchmarks.run --output res.json    # guarda los resultados en JSON
+#   python -m benchmarks.run --save-baseline      # guarda benchmarks/baseline.json
+#   python -m benchmarks.run --compare            # compara con la línea base (exit 1 si empeora)
+#
+# Todas las métricas son "menos es mejor" (tiempos y memoria); la comparación
+# marca como regresión cualquier métrica que supere la base en más de --threshold.
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from services.basic_analyzer import WORD_PATTERN, BasicAnalyzer
+from services.segmentation import SentenceIndex
+
+from .corpus import KINDS, generate, generate_many
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FULL_LENGTHS = (100, 1000, 10000, 100000, 500000)
+QUICK_LENGTHS = (100, 1000, 10000)
+
+STARTUP_SCRIPT = """
+import json, time
+started = time.perf_counter()
+from services.basic_analyzer import BasicAnalyzer
+BasicAnalyzer()
+elapsed = time.perf_counter() - started
+try:
+    import resource
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+except ImportError:
+    peak_kb = 0
+print(json.dumps({'seconds': elapsed, 'peak_kb': peak_kb}))
+"""
+
+
+def best_time(func: Callable[[], object], min_seconds: float = 0.3, repeat: int = 5) -> float:
+    """Mejor tiempo por llamada (s): repite hasta acumular `min_seconds` en cada ronda"""
+    started = time.perf_counter()
+    func()
+    single = time.perf_counter() - started
+    number = max(1, int(min_seconds / max(single, 1e-9)))
+
+    best = single
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+def measure_startup(cache_dir: str) -> Dict:
+    """Arranque de BasicAnalyzer() en un proceso nuevo (segundos y memoria máxima)"""
+    env = dict(os.environ, LEXICON_CACHE_DIR=cache_dir)
+    output = subprocess.run(
+        [sys.executable, '-c', STARTUP_SCRIPT],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_startup(metrics: Dict[str, float]):
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # Frío: sin artefacto compilado; caliente: el artefacto ya existe
+        cold = measure_startup(cache_dir)
+        warm = min((measure_startup(cache_dir) for _ in range(3)), key=lambda r: r['seconds'])
+
+    metrics['startup.cold_s'] = cold['seconds']
+    metrics['startup.warm_s'] = warm['seconds']
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    if warm['peak_kb']:
+        metrics['startup.peak_rss_mb'] = warm['peak_kb'] / divisor
+
+
+def bench_lexicon_memory(metrics: Dict[str, float]) -> BasicAnalyzer:
+    """Memoria retenida por el léxico compilado de un BasicAnalyzer recién creado"""
+    tracemalloc.start()
+    analyzer = BasicAnalyzer()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    metrics['memory.lexicon_mb'] = retained / (1024 * 1024)
+    return analyzer
+
+
+def bench_analyze(analyzer: BasicAnalyzer, lengths: List[int], metrics: Dict[str, float]):
+    for kind in KINDS:
+        for length in lengths:
+            # Varios textos distintos: las cachés por análisis no se reutilizan entre ellos
+            texts = list(generate_many(kind, length, 3 if length < 100000 else 1))
+            seconds = best_time(lambda: [analyzer.analyze(text) for text in texts],
+                                repeat=3 if length < 100000 else 1) / len(texts)
+            metrics[f'analyze.{kind}.{length}.ms'] = seconds * 1000
+
+
+def bench_normalize(analyzer: BasicAnalyzer, metrics: Dict[str, float]):
+    for kind in ('clean', 'evasion'):
+        words = WORD_PATTERN.findall(generate(kind, 20000))
+        seconds = best_time(lambda: [analyzer.normalize(word) for word in words])
+        metrics[f'normalize.{kind}.ns_per_char'] = seconds / sum(map(len, words)) * 1e9
+
+
+def bench_detect_term(analyzer: BasicAnalyzer, metrics: Dict[str, float]):
+    """detect_term sobre las palabras con coincidencia (contexto ya extraído, sin memo)"""
+    text = generate('mixed', 20000)
+    index = SentenceIndex(text)
+    calls = []
+    for word_match in WORD_PATTERN.finditer(text):
+        word = word_match.group()
+        normalized = analyzer.normalize(word)
+        if len(normalized) >= 3 and analyzer.matcher.match(normalized) is not None:
+            sentence, surrounding = analyzer.extract_context(text, word_match.start(), len(word), index)
+            calls.append((normalized, word, sentence, surrounding))
+
+    seconds = best_time(lambda: [analyzer.detect_term(*call) for call in calls])
+    metrics['detect_term.us_per_call'] = seconds / max(1, len(calls)) * 1e6
+
+
+def bench_fuzzy(analyzer: BasicAnalyzer, metrics: Dict[str, float]):
+    """Búsqueda de erratas sobre las palabras del corpus evasivo sin coincidencia exacta"""
+    words = {analyzer.normalize(word) for word in WORD_PATTERN.findall(generate('evasion', 20000))}
+    misses = [word for word in words if len(word) >= 3 and analyzer.matcher.match(word) is None]
+
+    seconds = best_time(lambda: [analyzer.matcher.match_fuzzy(word) for word in misses])
+    metrics['fuzzy.us_per_lookup'] = seconds / max(1, len(misses)) * 1e6
+
+
+def bench_spaced(analyzer: BasicAnalyzer, lengths: List[int], metrics: Dict[str, float]):
+    """Peor caso de las letras sueltas: todo el texto es una sola secuencia (debe ser lineal)"""
+    for length in lengths[-2:]:
+        letters = ''.join(ch for ch in generate('evasion', length) if ch.isalpha())
+        text = ' '.join(letters)[:length]
+        seconds = best_time(lambda: analyzer.analyze(text), repeat=3)
+        metrics[f'spaced.{length}.ns_per_char'] = seconds / len(text) * 1e9
+
+
+def bench_extract_context(analyzer: BasicAnalyzer, metrics: Dict[str, float]):
+    """extract_context para cada palabra de un documento largo (índice construido una vez)"""
+    text = generate('mixed', 100000)
+    positions = [(m.start(), len(m.group())) for m in WORD_PATTERN.finditer(text)]
+
+    def run():
+        index = SentenceIndex(text)
+        for position, length in positions:
+            analyzer.extract_context(text, position, length, index)
+
+    seconds = best_time(run, repeat=2)
+    metrics['extract_context.us_per_call'] = seconds / len(positions) * 1e6
+
+
+def bench_pro_responses(metrics: Dict[str, float]):
+    """Post-procesado de respuestas del LLM (decodificación validada + resultado), sin red"""
+    from services.llm_schema import decode_analysis, decode_batch
+    from services.pro_analyzer import ProAnalyzer
+
+    from .bench_responses import batch_response, full_response, sample_text
+
+    analyzer = ProAnalyzer(backend=None)
+    text, full, batch = sample_text(8), full_response(8), batch_response(8, 8)
+    seconds = best_time(lambda: analyzer.build_result(text, decode_analysis(full)))
+    metrics['pro_parse.full.us_per_response'] = seconds * 1e6
+    seconds = best_time(lambda: [analyzer.build_result(text, analysis) for analysis in decode_batch(batch)[0].values()])
+    metrics['pro_parse.batch.us_per_item'] = seconds / 8 * 1e6
+
+
+def bench_memory(analyzer: BasicAnalyzer, length: int, metrics: Dict[str, float]):
+    """Memoria máxima asignada durante el análisis de un documento largo"""
+    text = generate('mixed', length)
+    tracemalloc.start()
+    analyzer.analyze(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    metrics[f'memory.analyze.{length}.peak_mb'] = peak / (1024 * 1024)
+
+
+def run_suite(quick: bool = False, skip_startup: bool = False) -> Dict:
+    lengths = QUICK_LENGTHS if quick else FULL_LENGTHS
+    metrics: Dict[str, float] = {}
+
+    if not skip_startup:
+        bench_startup(metrics)
+
+    analyzer = bench_lexicon_memory(metrics)
+    bench_normalize(analyzer, metrics)
+    bench_detect_term(analyzer, metrics)
+    bench_fuzzy(analyzer, metrics)
+    bench_extract_context(analyzer, metrics)
+    bench_analyze(analyzer, lengths, metrics)
+    bench_spaced(analyzer, lengths, metrics)
+    bench_pro_responses(metrics)
+    bench_memory(analyzer, lengths[-1], metrics)
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpu_count': os.cpu_count(),
+            'quick': quick,
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'metrics': {name: round(value, 4) for name, value in sorted(metrics.items())},
+    }
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Métricas que empeoran más de `threshold` respecto a la línea base"""
+    regressions = []
+    for name, value in results['metrics'].items():
+        base = baseline.get('metrics', {}).get(name)
+        if not base:
+            continue
+        ratio = value / base
+        if ratio > 1 + threshold:
+            regressions.append(f'{name}: {base:.4g} -> {value:.4g} ({ratio:.2f}x)')
+    return regressions
+
+
+def print_table(results: Dict, baseline: Dict = None):
+    base_metrics = (baseline or {}).get('metrics', {})
+    print(f"{'métrica':<40} {'valor':>12} {'base':>12} {'ratio':>7}")
+    for name, value in results['metrics'].items():
+        base = base_metrics.get(name)
+        ratio = f'{value / base:.2f}x' if base else '-'
+        print(f"{name:<40} {value:>12.4g} {base if base is not None else '-':>12} {ratio:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks de BasicAnalyzer')
+    parser.add_argument('--quick', action='store_true', help='solo tamaños pequeños')
+    parser.add_argument('--skip-startup', action='store_true', help='no medir el arranque en frío')
+    parser.add_argument('--output', help='archivo JSON donde guardar los resultados')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='línea base para --compare/--save-baseline')
+    parser.add_argument('--save-baseline', action='store_true', help='guarda los resultados como línea base')
+    parser.add_argument('--compare', action='store_true', help='falla si alguna métrica empeora')
+    parser.add_argument('--threshold', type=float, default=0.3, help='tolerancia de regresión (0.3 = +30%%)')
+    args = parser.parse_args()
+
+    results = run_suite(quick=args.quick, skip_startup=args.skip_startup)
+
+    baseline = None
+    if args.compare or os.path.exists(args.baseline):
+        try:
+            with open(args.baseline, encoding='utf-8') as handle:
+                baseline = json.load(handle)
+        except (OSError, ValueError) as e:
+            if args.compare:
+                print(f"❌ No se pudo leer la línea base {args.baseline}: {str(e)}")
+                sys.exit(2)
+
+    print_table(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=2)
+            handle.write('\n')
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=2)
+            handle.write('\n')
+        print(f"💾 Línea base guardada en {args.baseline}")
+
+    if args.compare and baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n🚨 {len(regressions)} regresión(es) respecto a la línea base:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("\n✅ Sin regresiones respecto a la línea base")
+
+
+if __name__ == '__main__':
+    main()
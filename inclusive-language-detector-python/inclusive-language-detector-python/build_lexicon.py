@@ -0,0 +1,23 @@
+# build_lexicon.py - Precompila el léxico antes de desplegar
+#
+# Uso: python build_lexicon.py [directorio]
+# Sin argumento usa LEXICON_CACHE_DIR o .lexicon_cache/ junto a app.py.
+
+import sys
+
+from services.basic_analyzer import BasicAnalyzer
+from services.lexicon_cache import LexiconCache
+
+if __name__ == '__main__':
+    cache = LexiconCache(sys.argv[1] if len(sys.argv) > 1 else None)
+    analyzer = BasicAnalyzer(use_lexicon_cache=False)
+    written = cache.save(analyzer.lexicon_version, analyzer.offensive_base_terms, analyzer.matcher)
+
+    if written:
+        report = analyzer.matcher.memory_report()
+        print(f"✅ Léxico {analyzer.lexicon_version[:16]} compilado en {written}")
+        print(f"   {report['entries']} entradas, {report['container_states']} estados, "
+              f"{report['total_bytes'] / (1024 * 1024):.1f} MB en memoria")
+    else:
+        print("❌ No se pudo escribir el artefacto del léxico")
+        sys.exit(1)
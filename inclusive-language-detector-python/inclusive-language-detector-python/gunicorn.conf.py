@@ -0,0 +1,21 @@
+# gunicorn.conf.py - Configuración de producción (gunicorn app:app)
+#
+# preload_app carga app.py (y el léxico compilado) una sola vez en el proceso
+# maestro; los workers lo heredan con fork y comparten sus páginas
+# copy-on-write. El léxico compacto no crea objetos por entrada, así que las
+# búsquedas no modifican esas páginas; gc.freeze() evita además que el
+# recolector de los workers las toque al recorrer los objetos heredados.
+
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # Objetos cargados en el maestro: fuera de las generaciones del GC
+    gc.freeze()
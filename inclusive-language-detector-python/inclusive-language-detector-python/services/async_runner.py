@@ -0,0 +1,73 @@
+# services/async_runner.py - BUCLE ASYNCIO COMPARTIDO PARA LAS LLAMADAS AL LLM
+
+import asyncio
+import concurrent.futures
+import os
+import threading
+from typing import Any, AsyncIterator, Coroutine, Iterator, Optional
+
+
+class BackgroundLoop:
+    """Un único bucle asyncio en un hilo de fondo, compartido por todo el proceso.
+
+    Las vistas de Flask envían corrutinas a este bucle y esperan su resultado:
+    el semáforo de concurrencia y el pool de conexiones del cliente asíncrono
+    son comunes a todas las peticiones, y cada petición en espera solo ocupa
+    un hilo ligero (gunicorn --worker-class gthread --threads N) en lugar de
+    un worker síncrono completo.
+
+    El hilo se arranca perezosamente y se vuelve a crear tras un fork, de modo
+    que funciona con el preload de gunicorn.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._pid != os.getpid():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name='llm-event-loop', daemon=True
+                )
+                self._thread.start()
+                self._pid = os.getpid()
+            return self._loop
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Ejecuta la corrutina en el bucle compartido y espera su resultado"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def iterate(self, agen: AsyncIterator, timeout: Optional[float] = None) -> Iterator[Any]:
+        """Recorre un generador asíncrono del bucle compartido desde un hilo síncrono.
+
+        Cada elemento se pide y se espera por separado (como mucho `timeout`
+        segundos), así que la vista puede ir enviándolos según llegan. Si el
+        consumidor deja de iterar (p. ej. el cliente cerró la conexión), el
+        generador se cierra en el bucle y libera lo que tenga tomado.
+        """
+        try:
+            while True:
+                future = asyncio.run_coroutine_threadsafe(agen.__anext__(), self.loop)
+                try:
+                    yield future.result(timeout)
+                except StopAsyncIteration:
+                    return
+                except concurrent.futures.TimeoutError:
+                    future.cancel()
+                    raise
+        finally:
+            try:
+                asyncio.run_coroutine_threadsafe(agen.aclose(), self.loop).result(timeout)
+            except (RuntimeError, concurrent.futures.TimeoutError):
+                # Sigue ocupado con el elemento cancelado: el bucle lo cerrará al recolectarlo
+                pass
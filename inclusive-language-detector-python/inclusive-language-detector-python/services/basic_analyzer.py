@@ -1,13 +1,46 @@
 # services/basic_analyzer.py - SISTEMA ULTRA INTELIGENTE 2,000,000+ VARIACIONES
 
+import copy
+import os
 import re
-import unicodedata
-from typing import Dict, List, Set, Optional, Tuple
+import time
+from typing import Dict, Iterable, Iterator, List, Set, Optional, Tuple
+
+from .lexicon_cache import LexiconCache
+from .metrics import METRICS
+from .normalizer import BASIC_SEPARATORS, TextNormalizer
+from .segmentation import CONTEXT_WINDOW, SentenceIndex, split_complete, tail_context
+from .term_matcher import KeywordMatcher, TermMatcher
+
+# Palabras: secuencias sin espacios, con su posición real en el texto
+WORD_PATTERN = re.compile(r'\S+')
+NUMERIC_WORD = re.compile(r'^\d+$')
+
+# Letras sueltas seguidas ("p e n d e j o", "l.o.c.a") que se analizan unidas
+MIN_SPACED_LETTERS = 3
+
+# Etapas medidas por _scan cuando METRICS está activo
+SCAN_STAGES = ('tokenize_normalize', 'match', 'context', 'detect', 'spaced')
+
+
+class AnalysisMemo:
+    """Cachés compartidas durante un análisis o un lote de análisis"""
+
+    def __init__(self):
+        # palabra original -> palabra normalizada
+        self.normalized: Dict[str, str] = {}
+        # palabra normalizada -> (categoría, término, es_frase, por_errata) o None;
+        # por_errata indica que vino del índice de erratas y no del autómata
+        self.matches: Dict[str, Optional[Tuple[str, str, bool, bool]]] = {}
+        # oración -> veredicto de analyze_context / contexto numérico
+        self.contexts: Dict[str, Dict] = {}
+        self.numeric: Dict[str, bool] = {}
+
 
 class BasicAnalyzer:
-    """Analizador con 2+ millones de variaciones y análisis contextual profundo"""
+    """Analizador con variaciones morfológicas por reglas y análisis contextual profundo"""
     
-    def __init__(self):
+    def __init__(self, use_lexicon_cache: bool = True, fuzzy_distance: Optional[int] = None):
         # MAPEO MASIVO DE CARACTERES (300+ variaciones)
         self.char_map = {
             # Vocales - TODAS las variaciones
@@ -52,9 +85,54 @@ class BasicAnalyzer:
             'Ñ': 'n', 'Ç': 'c',
         }
         
-        # BASE DE DATOS CON GENERACIÓN AUTOMÁTICA DE VARIACIONES
-        self.offensive_base_terms = self._build_massive_database()
-        
+        # Tabla de traducción precalculada a partir de char_map
+        self.normalizer = TextNormalizer(self.char_map, BASIC_SEPARATORS)
+
+        # Afijos de las reglas morfológicas (prefijo* + base + sufijo*): el
+        # TermMatcher los aplica al buscar, sin generar cada combinación
+        self.affixes = {
+            # Sufijos diminutivos
+            'diminutives': ['ito', 'ita', 'illo', 'illa', 'ico', 'ica', 'in', 'ina',
+                            'ete', 'eta', 'uelo', 'uela', 'cito', 'cita'],
+            # Sufijos aumentativos
+            'augmentatives': ['ón', 'ona', 'azo', 'aza', 'ote', 'ota', 'arro', 'arra',
+                              'orro', 'orra', 'ucho', 'ucha', 'ejo', 'eja', 'aco', 'aca'],
+            # Prefijos intensificadores
+            'prefixes': ['super', 'hiper', 'mega', 'ultra', 'archi', 'requete',
+                         're', 'contra', 'extra'],
+            # Plurales
+            'plurals': ['s', 'es'],
+            # Superlativos (sobre la base sin vocal final: gord-ísimo)
+            'superlatives': ['ísimo', 'ísima'],
+        }
+
+        # BASE DE DATOS: TÉRMINOS BASE + REGLAS MORFOLÓGICAS
+        # Léxico normalizado una sola vez y compilado en autómatas; se carga del
+        # artefacto en disco mientras el hash de las listas base no cambie
+        base_db = self._build_base_database()
+        self.lexicon_version = LexiconCache.fingerprint(base_db, self.affixes, self.char_map)
+
+        if use_lexicon_cache:
+            self.offensive_base_terms, self.matcher = LexiconCache().load_or_build(
+                self.lexicon_version, lambda: self._compile_lexicon(base_db)
+            )
+        else:
+            self.offensive_base_terms, self.matcher = self._compile_lexicon(base_db)
+
+        # Sugerencias propias (término normalizado -> sugerencia) de una capa
+        # de léxico por tenant (ver with_lexicon); tienen prioridad
+        self.custom_suggestions: Dict[str, str] = {}
+
+        # Erratas deliberadas ("pendjo", "retrazado"): distancia de edición
+        # máxima para las palabras sin coincidencia exacta (0 desactiva)
+        self.fuzzy_distance = (fuzzy_distance if fuzzy_distance is not None
+                               else int(os.environ.get('BASIC_FUZZY_DISTANCE', 2)))
+        self.fuzzy_penalty = 0.85
+        # Las palabras sin coincidencia se repiten entre documentos: la
+        # búsqueda de erratas se recuerda a nivel de proceso, no solo por análisis
+        self._fuzzy_cache: Dict[str, Optional[Tuple[str, str, bool]]] = {}
+        self.fuzzy_cache_size = 50000
+
         # Patrones de contexto defensivo
         self.defensive_patterns = [
             r'\btiene[ns]?\s+\d+\s+años?',
@@ -90,50 +168,45 @@ class BasicAnalyzer:
             r'\bmaldito\s+\w+',
             r'\bputo\s+\w+',
         ]
-    
-    def _generate_variations(self, base: str) -> List[str]:
-        """Genera automáticamente 50+ variaciones de un término base"""
-        variations = [base]
-        
-        # Sufijos diminutivos
-        diminutives = ['ito', 'ita', 'illo', 'illa', 'ico', 'ica', 'in', 'ina',
-                       'ete', 'eta', 'uelo', 'uela', 'cito', 'cita']
-        
-        # Sufijos aumentativos
-        augmentatives = ['ón', 'ona', 'azo', 'aza', 'ote', 'ota', 'arro', 'arra',
-                        'orro', 'orra', 'ucho', 'ucha', 'ejo', 'eja', 'aco', 'aca']
-        
-        # Prefijos intensificadores
-        prefixes = ['super', 'hiper', 'mega', 'ultra', 'archi', 'requete',
-                   're', 'contra', 'extra']
-        
-        # Generar con sufijos
-        for suf in diminutives + augmentatives:
-            variations.append(base + suf)
-        
-        # Generar con prefijos
-        for pre in prefixes:
-            variations.append(pre + base)
-            # Combinar prefijo + sufijo
-            for suf in diminutives[:5] + augmentatives[:5]:
-                variations.append(pre + base + suf)
-        
-        # Duplicaciones
-        variations.append(base + base)
-        variations.append(base + 's')
-        
-        # Formas superlativas
-        if base.endswith('o') or base.endswith('a'):
-            variations.append(base[:-1] + 'ísimo')
-            variations.append(base[:-1] + 'ísima')
-        
-        return variations
-    
-    def _build_massive_database(self) -> Dict[str, Dict]:
-        """Construye base de datos masiva con generación automática"""
         
-        # TÉRMINOS BASE (expandidos)
-        base_db = {
+        # Palabras clave de contexto
+        self.defensive_keywords = [
+            'respeto', 'dignidad', 'igualdad', 'derechos', 'justicia',
+            'diversidad', 'inclusión', 'comunidad', 'cultura', 'historia',
+            'persona', 'mi amigo', 'mi amiga', 'describe'
+        ]
+        self.offensive_keywords = [
+            'estúpido', 'idiota', 'tonto', 'mierda', 'odio',
+            'inferior', 'no sirve', 'inútil', 'basura',
+            'pinche', 'maldito', 'puto', 'cabrón'
+        ]
+        
+        # Contextos numéricos
+        self.numeric_patterns = [
+            r'\b\d+\s*(años|meses|días|horas)',
+            r'\bcapítulo\s+\d+',
+            r'\bnivel\s+\d+',
+            r'\bpágina\s+\d+',
+        ]
+        
+        # Precompilar: los patrones defensivos y numéricos solo necesitan
+        # saber si alguno coincide, así que van en una sola alternancia
+        self._defensive_regex = re.compile(
+            '|'.join(f'(?:{p})' for p in self.defensive_patterns), re.IGNORECASE
+        )
+        self._numeric_regex = re.compile(
+            '|'.join(f'(?:{p})' for p in self.numeric_patterns), re.IGNORECASE
+        )
+        # Cada patrón ofensivo suma por separado: se compilan individualmente
+        self._offensive_regexes = [re.compile(p, re.IGNORECASE) for p in self.offensive_patterns]
+        self._defensive_keywords = KeywordMatcher(self.defensive_keywords)
+        self._offensive_keywords = KeywordMatcher(self.offensive_keywords)
+    
+    def _build_base_database(self) -> Dict[str, Dict]:
+        """Listas base de términos y frases por categoría"""
+
+        # TÉRMINOS BASE (las variaciones salen de self.affixes al buscar)
+        return {
             'sexist': {
                 'core_terms': [
                     # Insultos sexuales (100 base)
@@ -271,91 +344,90 @@ class BasicAnalyzer:
                 ]
             }
         }
-        
-        # GENERAR VARIACIONES AUTOMÁTICAS
-        expanded_db = {}
-        for category, data in base_db.items():
-            expanded_terms = set()
-            
-            # Expandir términos core
-            for term in data['core_terms']:
-                variations = self._generate_variations(term)
-                expanded_terms.update(variations)
-            
-            # Expandir frases
-            expanded_phrases = set(data['phrases'])
-            for phrase in data['phrases']:
-                variations = self._generate_variations(phrase)
-                expanded_phrases.update(variations)
-            
-            expanded_db[category] = {
-                'terms': list(expanded_terms),
-                'phrases': list(expanded_phrases),
-                'context_required': category in ['sexist', 'ableist', 'ethnic']
+
+    def _compile_lexicon(self, base_db: Dict[str, Dict]) -> Tuple[Dict[str, Dict], TermMatcher]:
+        """Normaliza y compila los términos base con las reglas de afijos.
+        
+        Las variaciones (diminutivos, aumentativos, prefijos, plurales y
+        superlativos) no se generan: el TermMatcher las reconoce al buscar.
+        """
+        database = {
+            category: {'terms': data['core_terms'], 'phrases': data['phrases']}
+            for category, data in base_db.items()
+        }
+        categories = {
+            category: {
+                'context_required': category in ['sexist', 'ableist', 'ethnic'],
+                'term_count': len(data['core_terms']),
+                'phrase_count': len(data['phrases']),
             }
-        
-        return expanded_db
+            for category, data in base_db.items()
+        }
+        return categories, TermMatcher(database, self.normalize, self.affixes)
+
+    def with_lexicon(self, matcher, lexicon_version: str,
+                     suggestions: Optional[Dict[str, str]] = None) -> 'BasicAnalyzer':
+        """Copia ligera con otro léxico (p. ej. base + capa de un tenant, ver tenant_lexicons).
+        
+        Comparte normalizador, patrones y reglas con este analizador; solo
+        cambian el matcher, la versión del léxico (claves de caché), las
+        sugerencias propias y la caché de erratas, que depende del léxico.
+        """
+        view = copy.copy(self)
+        view.matcher = matcher
+        view.lexicon_version = lexicon_version
+        view.custom_suggestions = {**self.custom_suggestions, **(suggestions or {})}
+        view._fuzzy_cache = {}
+        return view
     
     def normalize(self, text: str) -> str:
         """Normalización ultra potente"""
         if not text:
             return ""
         
-        normalized = text.lower()
-        
-        # Normalizar unicode
-        normalized = unicodedata.normalize('NFD', normalized)
-        normalized = ''.join(c for c in normalized if unicodedata.category(c) != 'Mn')
-        
-        # Remover TODOS los separadores
-        normalized = re.sub(r'[\s\-_\.\,\;\:\'\"\`\´\~\!\¡\¿\?\(\)\[\]\{\}\/\\\*\+\=\#\&\%\^\<\>\|]', '', normalized)
-        
-        # Aplicar mapeo de caracteres
-        for char, replacement in self.char_map.items():
-            normalized = normalized.replace(char, replacement)
-        
-        return normalized
+        # Minúsculas + NFD + marcas, separadores y char_map en una sola traducción
+        return self.normalizer.normalize(text)
     
-    def is_numeric_context(self, word: str, sentence: str) -> bool:
+    def is_numeric_context(self, word: str, sentence: str,
+                           memo: Optional[AnalysisMemo] = None) -> bool:
         """Detecta contextos numéricos"""
-        numeric_patterns = [
-            r'\b\d+\s*(años|meses|días|horas)',
-            r'\bcapítulo\s+\d+',
-            r'\bnivel\s+\d+',
-            r'\bpágina\s+\d+',
-        ]
-        
-        if re.match(r'^\d+$', word):
+        if NUMERIC_WORD.match(word):
             return True
         
-        for pattern in numeric_patterns:
-            if re.search(pattern, sentence, re.IGNORECASE):
-                return True
+        # La parte de la oración se calcula una sola vez por oración
+        if memo is None:
+            return bool(self._numeric_regex.search(sentence))
         
-        return False
+        numeric = memo.numeric.get(sentence)
+        if numeric is None:
+            numeric = memo.numeric[sentence] = bool(self._numeric_regex.search(sentence))
+        return numeric
+    
+    def _context_verdict(self, word: str, sentence: str, surrounding: str,
+                         memo: Optional[AnalysisMemo]) -> Dict:
+        """analyze_context memorizado por oración durante el análisis"""
+        if memo is None:
+            return self.analyze_context(word, sentence, surrounding)
+        
+        context = memo.contexts.get(sentence)
+        if context is None:
+            context = memo.contexts[sentence] = self.analyze_context(word, sentence, surrounding)
+        return context
     
     def analyze_context(self, word: str, sentence: str, surrounding: str) -> Dict:
-        """Análisis contextual profundo"""
+        """Análisis contextual profundo (el veredicto depende solo de la oración)"""
         lower_sentence = sentence.lower()
-        lower_surrounding = surrounding.lower()
-        
-        # Verificar patrones defensivos
-        for pattern in self.defensive_patterns:
-            if re.search(pattern, lower_sentence, re.IGNORECASE):
-                return {
-                    'is_offensive': False,
-                    'confidence': 0.95,
-                    'reason': 'Uso descriptivo o neutral detectado'
-                }
         
-        # Palabras defensivas
-        defensive_keywords = [
-            'respeto', 'dignidad', 'igualdad', 'derechos', 'justicia',
-            'diversidad', 'inclusión', 'comunidad', 'cultura', 'historia',
-            'persona', 'mi amigo', 'mi amiga', 'describe'
-        ]
+        # Verificar patrones defensivos (una sola alternancia compilada)
+        if self._defensive_regex.search(lower_sentence):
+            return {
+                'is_offensive': False,
+                'confidence': 0.95,
+                'reason': 'Uso descriptivo o neutral detectado'
+            }
         
-        if any(kw in lower_sentence for kw in defensive_keywords):
+        # Palabras defensivas
+        if self._defensive_keywords.contains_any(lower_sentence):
             return {
                 'is_offensive': False,
                 'confidence': 0.85,
@@ -365,18 +437,12 @@ class BasicAnalyzer:
         # Verificar patrones ofensivos
         offensive_score = 0.0
         
-        for pattern in self.offensive_patterns:
-            if re.search(pattern, lower_sentence, re.IGNORECASE):
+        for regex in self._offensive_regexes:
+            if regex.search(lower_sentence):
                 offensive_score += 0.35
         
-        # Palabras ofensivas cercanas
-        offensive_keywords = [
-            'estúpido', 'idiota', 'tonto', 'mierda', 'odio',
-            'inferior', 'no sirve', 'inútil', 'basura',
-            'pinche', 'maldito', 'puto', 'cabrón'
-        ]
-        
-        offensive_count = sum(1 for kw in offensive_keywords if kw in lower_sentence)
+        # Palabras ofensivas cercanas (distintas, en una sola pasada)
+        offensive_count = len(self._offensive_keywords.find_all(lower_sentence))
         offensive_score += offensive_count * 0.25
         
         if offensive_score >= 0.6:
@@ -398,90 +464,105 @@ class BasicAnalyzer:
                 'reason': 'Contexto ambiguo'
             }
     
-    def extract_context(self, text: str, word_pos: int, word_len: int) -> Tuple[str, str]:
-        """Extrae contexto alrededor de una palabra"""
-        before = text[:word_pos]
-        after = text[word_pos + word_len:]
-        
-        # Buscar inicio de oración
-        sentence_start = max(before.rfind('.'), before.rfind('!'), before.rfind('?'))
-        sentence_start = 0 if sentence_start == -1 else sentence_start + 1
-        
-        # Buscar fin de oración
-        sentence_end_match = re.search(r'[.!?\n]', after)
-        sentence_end = word_pos + word_len + sentence_end_match.start() + 1 if sentence_end_match else len(text)
-        
-        sentence = text[sentence_start:sentence_end].strip()
-        
-        # Contexto amplio (±150 caracteres)
-        surrounding_start = max(0, word_pos - 150)
-        surrounding_end = min(len(text), word_pos + word_len + 150)
-        surrounding = text[surrounding_start:surrounding_end]
-        
-        return sentence, surrounding
+    def extract_context(self, text: str, word_pos: int, word_len: int,
+                        index: Optional[SentenceIndex] = None) -> Tuple[str, str]:
+        """Extrae contexto alrededor de una palabra (O(log n) con un índice de oraciones)"""
+        if index is None:
+            index = SentenceIndex(text)
+        
+        # Oración completa y contexto amplio (±150 caracteres)
+        return index.sentence(word_pos, word_len), index.surrounding(word_pos, word_len)
+    
+    def _normalize_word(self, word: str, memo: AnalysisMemo) -> str:
+        """Normaliza una palabra reutilizando la caché del análisis"""
+        normalized = memo.normalized.get(word)
+        if normalized is None:
+            normalized = memo.normalized[word] = self.normalize(word)
+        return normalized
+    
+    def _match(self, normalized_word: str, memo: Optional[AnalysisMemo]) -> Optional[Tuple[str, str, bool, bool]]:
+        """(categoría, término, es_frase, aproximada) reutilizando la caché del análisis"""
+        if memo is None:
+            return self._lookup(normalized_word)
+        if normalized_word not in memo.matches:
+            memo.matches[normalized_word] = self._lookup(normalized_word)
+        return memo.matches[normalized_word]
+    
+    def _lookup(self, normalized_word: str) -> Optional[Tuple[str, str, bool, bool]]:
+        """Autómata primero; si no hay coincidencia, índice de erratas"""
+        match = self.matcher.match(normalized_word)
+        if match is not None:
+            return match + (False,)
+        if self.fuzzy_distance:
+            match = self._match_fuzzy(normalized_word)
+            if match is not None:
+                return match + (True,)
+        return None
+    
+    def _match_fuzzy(self, normalized_word: str) -> Optional[Tuple[str, str, bool]]:
+        """Índice de erratas con caché de proceso (se vacía al llenarse)"""
+        try:
+            return self._fuzzy_cache[normalized_word]
+        except KeyError:
+            pass
+        match = self.matcher.match_fuzzy(normalized_word, self.fuzzy_distance)
+        if len(self._fuzzy_cache) >= self.fuzzy_cache_size:
+            self._fuzzy_cache.clear()
+        self._fuzzy_cache[normalized_word] = match
+        return match
     
     def detect_term(self, normalized_word: str, original_word: str, 
-                   sentence: str, surrounding: str) -> Optional[Dict]:
+                   sentence: str, surrounding: str,
+                   memo: Optional[AnalysisMemo] = None) -> Optional[Dict]:
         """Detección inteligente de términos ofensivos"""
         
         # Filtros preliminares
         if len(normalized_word) < 3:
             return None
         
-        if self.is_numeric_context(original_word, sentence):
+        if self.is_numeric_context(original_word, sentence, memo):
             return None
         
-        # Buscar en cada categoría
-        for category, data in self.offensive_base_terms.items():
-            terms = data['terms']
-            phrases = data['phrases']
-            context_required = data['context_required']
+        # Buscar en el autómata compilado (una sola pasada por palabra)
+        match = self._match(normalized_word, memo)
+        if match is None:
+            return None
+        
+        category, term, is_phrase, is_fuzzy = match
+        # Una errata es menos segura que una coincidencia exacta
+        factor = self.fuzzy_penalty if is_fuzzy else 1.0
+        
+        if is_phrase:
+            return {
+                'category': category,
+                'term': term,
+                'original': original_word,
+                'confidence': 0.90 * factor,
+                'context_analysis': None
+            }
+        
+        # Analizar contexto si es requerido
+        if self.offensive_base_terms[category]['context_required']:
+            context = self._context_verdict(original_word, sentence, surrounding, memo)
             
-            # Buscar en términos
-            for term in terms:
-                normalized_term = self.normalize(term)
-                
-                # Coincidencia exacta o contenida
-                if (normalized_word == normalized_term or 
-                    normalized_term in normalized_word or 
-                    normalized_word in normalized_term):
-                    
-                    # Analizar contexto si es requerido
-                    if context_required:
-                        context = self.analyze_context(original_word, sentence, surrounding)
-                        
-                        if not context['is_offensive'] and context['confidence'] >= 0.80:
-                            return None  # No es ofensivo en este contexto
-                        
-                        return {
-                            'category': category,
-                            'term': term,
-                            'original': original_word,
-                            'confidence': context['confidence'],
-                            'context_analysis': context
-                        }
-                    
-                    return {
-                        'category': category,
-                        'term': term,
-                        'original': original_word,
-                        'confidence': 0.95,
-                        'context_analysis': None
-                    }
+            if not context['is_offensive'] and context['confidence'] >= 0.80:
+                return None  # No es ofensivo en este contexto
             
-            # Buscar en frases
-            for phrase in phrases:
-                normalized_phrase = self.normalize(phrase)
-                if normalized_phrase in normalized_word or normalized_word in normalized_phrase:
-                    return {
-                        'category': category,
-                        'term': phrase,
-                        'original': original_word,
-                        'confidence': 0.90,
-                        'context_analysis': None
-                    }
+            return {
+                'category': category,
+                'term': term,
+                'original': original_word,
+                'confidence': context['confidence'] * factor,
+                'context_analysis': context
+            }
         
-        return None
+        return {
+            'category': category,
+            'term': term,
+            'original': original_word,
+            'confidence': 0.95 * factor,
+            'context_analysis': None
+        }
     
     def get_suggestion(self, term: str, category: str) -> str:
         """Obtiene sugerencia contextual"""
@@ -502,6 +583,10 @@ class BasicAnalyzer:
         
         normalized = self.normalize(term)
         
+        custom = self.custom_suggestions.get(normalized)
+        if custom:
+            return custom
+        
         for key, value in suggestions_map.items():
             if normalized == self.normalize(key):
                 return value
@@ -549,82 +634,324 @@ class BasicAnalyzer:
         else:
             return 'low'
     
-    def analyze(self, text: str) -> Dict:
+    def candidate_spans(self, text: str, memo: Optional[AnalysisMemo] = None) -> List[Tuple[int, int]]:
+        """Posiciones (inicio, fin) de las palabras que contienen un término del léxico.
+        
+        A diferencia de analyze, no cuenta las palabras que solo aparecen dentro
+        de un término más largo ("con" en "maricón"): es una señal más estricta
+        para decidir qué fragmentos merecen revisión.
+        """
+        if memo is None:
+            memo = AnalysisMemo()
+        
+        spans = []
+        for word_match in WORD_PATTERN.finditer(text):
+            if self.is_strict_candidate(self._normalize_word(word_match.group(), memo)):
+                spans.append(word_match.span())
+        return spans
+    
+    def is_strict_candidate(self, normalized: str) -> bool:
+        """¿Contiene la palabra normalizada un término completo del léxico (o una errata suya)?"""
+        return len(normalized) >= 3 and (
+            self.matcher.contains_entry(normalized)
+            or bool(self.fuzzy_distance and self._match_fuzzy(normalized))
+        )
+    
+    def analyze_batch(self, texts: List[str]) -> List[Dict]:
+        """Analiza varios textos compartiendo las cachés de normalización y coincidencias"""
+        memo = AnalysisMemo()
+        results = []
+        
+        for text in texts:
+            try:
+                results.append(self.analyze(text, memo))
+            except Exception as e:
+                results.append({'error': f'Error al procesar el texto: {str(e)}'})
+        
+        return results
+    
+    def analyze(self, text: str, memo: Optional[AnalysisMemo] = None) -> Dict:
         """Analiza el texto completo con inteligencia contextual"""
         if not text or not text.strip():
             return {'error': 'El texto no puede estar vacío'}
         
-        issues = []
-        words = re.findall(r'\S+', text)
-        position = 0
+        if memo is None:
+            memo = AnalysisMemo()
         
-        # Analizar palabra por palabra
-        for word in words:
-            if not word.strip():
-                position += len(word)
-                continue
+        issues, total_words = self._scan(text, memo)
+        return self.build_result(text, issues, total_words)
+    
+    def _scan(self, text: str, memo: AnalysisMemo, start: int = 0,
+              offset: int = 0, signals: Optional[List[Dict]] = None) -> Tuple[List[Dict], int]:
+        """Recorre las palabras que empiezan en `start` o después; el texto previo solo aporta contexto.
+        
+        Las posiciones `start`/`end` de cada issue se desplazan `offset` caracteres.
+        Si se pasa `signals`, se añade una entrada por cada candidato del léxico
+        con los límites de su oración, los de la palabra ('word_start', 'word_end'),
+        si es una secuencia de letras espaciadas ('spaced') y el motivo
+        ('candidate', 'ambiguous' o 'dismissed' si el contexto lo descartó).
+        """
+        issues = []
+        total_words = 0
+        index = SentenceIndex(text)
+        
+        # Instrumentación: con METRICS desactivado solo cuesta comprobar `timed`
+        timed = METRICS.enabled
+        if timed:
+            clock = time.perf_counter
+            stages = dict.fromkeys(SCAN_STAGES, 0.0)
+            known_words = len(memo.normalized)
+            candidates = 0
+            mark = clock()
+        
+        # Letras sueltas pendientes: (inicio, fin, letra normalizada) de cada token
+        letters: List[Tuple[int, int, str]] = []
+        
+        # Analizar palabra por palabra (una sola tokenización con posiciones reales)
+        for word_match in WORD_PATTERN.finditer(text, start):
+            word = word_match.group()
+            position = word_match.start()
             
-            normalized = self.normalize(word)
+            total_words += 1
+            normalized = self._normalize_word(word, memo)
+            if timed:
+                now = clock()
+                stages['tokenize_normalize'] += now - mark
+                mark = now
             
-            if len(normalized) < 3:
-                position += len(word)
+            # Una letra suelta alarga la secuencia; un token que se normaliza
+            # a nada ("-", "...") no la corta; cualquier otra palabra la cierra
+            if len(normalized) == 1:
+                letters.append((position, word_match.end(), normalized))
+                continue
+            if normalized and letters:
+                if len(letters) >= MIN_SPACED_LETTERS:
+                    self._scan_letters(text, letters, index, memo, offset, signals, issues)
+                    if timed:
+                        now = clock()
+                        stages['spaced'] += now - mark
+                        mark = now
+                letters = []
+            
+            # Sin coincidencia en el léxico no hace falta extraer contexto
+            matched = len(normalized) >= 3 and self._match(normalized, memo) is not None
+            if timed:
+                now = clock()
+                stages['match'] += now - mark
+                mark = now
+            if not matched:
                 continue
             
             # Extraer contexto
-            sentence, surrounding = self.extract_context(text, position, len(word))
+            sentence, surrounding = self.extract_context(text, position, len(word), index)
             
-            if self.is_numeric_context(word, sentence):
-                position += len(word)
+            numeric = self.is_numeric_context(word, sentence, memo)
+            if timed:
+                now = clock()
+                stages['context'] += now - mark
+                mark = now
+                candidates += 1
+            if numeric:
                 continue
             
             # Detectar término ofensivo
-            detected = self.detect_term(normalized, word, sentence, surrounding)
+            detected = self.detect_term(normalized, word, sentence, surrounding, memo)
+            self._report(detected, word, position, word_match.end(), index, offset, signals, issues)
             
-            if detected:
-                suggestion = self.get_suggestion(detected['term'], detected['category'])
-                explanation = self.get_explanation(detected['category'], detected.get('context_analysis'))
-                severity = self.calculate_severity(detected['confidence'], detected['category'])
-                
-                issues.append({
-                    'type': detected['category'],
-                    'original_text': word,
-                    'suggestion': suggestion,
-                    'severity': severity,
-                    'explanation': explanation,
-                    'confidence': round(detected['confidence'], 2)
-                })
+            if timed:
+                now = clock()
+                stages['detect'] += now - mark
+                mark = now
+        
+        if len(letters) >= MIN_SPACED_LETTERS:
+            self._scan_letters(text, letters, index, memo, offset, signals, issues)
+            if timed:
+                stages['spaced'] += clock() - mark
+        
+        if timed:
+            self._record_scan(stages, total_words, candidates, len(issues),
+                              total_words - (len(memo.normalized) - known_words))
+        
+        return issues, total_words
+    
+    def _scan_letters(self, text: str, letters: List[Tuple[int, int, str]], index: SentenceIndex,
+                      memo: AnalysisMemo, offset: int, signals: Optional[List[Dict]],
+                      issues: List[Dict]):
+        """Analiza una secuencia de letras sueltas como palabras unidas.
+        
+        Las letras normalizadas se unen en un flujo que se recorre una vez con
+        el autómata del léxico. Cada carácter del flujo es un token, así que
+        cada tramo del flujo se traduce directamente a su tramo en el texto.
+        Con un solo término (o ninguno literal) la secuencia entera pasa por la
+        búsqueda completa: morfología y erratas ("p e n d j o").
+        """
+        # "1 2 3" no es una evasión: hace falta al menos una letra de verdad
+        if not any(text[start].isalpha() for start, _, _ in letters):
+            return
+        
+        stream = ''.join(letter for _, _, letter in letters)
+        spans = self.matcher.find_spans(stream)
+        
+        if len(spans) <= 1:
+            match = self._match(stream, memo)
+            if match is None:
+                return
+            # Acotar el tramo al término cuando aparece tal cual en el flujo
+            # ("y p e n d e j o" no incluye la "y")
+            term = self.normalize(match[1])
+            found = stream.find(term) if term else -1
+            spans = [(found, found + len(term))] if found != -1 else [(0, len(stream))]
+        
+        for number, (first, last) in enumerate(spans):
+            # Un plural que sigue al término es parte de él ("p e n d e j o s")
+            limit = spans[number + 1][0] if number + 1 < len(spans) else len(stream)
+            plurals = [p for p in self.affixes['plurals']
+                       if last + len(p) <= limit and stream.startswith(p, last)]
+            if plurals:
+                last += max(map(len, plurals))
             
-            position += len(word)
+            start, end = letters[first][0], letters[last - 1][1]
+            spaced = text[start:end]
+            sentence, surrounding = self.extract_context(text, start, end - start, index)
+            detected = self.detect_term(stream[first:last], spaced, sentence, surrounding, memo)
+            self._report(detected, spaced, start, end, index, offset, signals, issues, spaced=True)
+    
+    def _report(self, detected: Optional[Dict], word: str, start: int, end: int,
+                index: SentenceIndex, offset: int, signals: Optional[List[Dict]],
+                issues: List[Dict], spaced: bool = False):
+        """Añade la señal del candidato y, si se confirmó, su issue"""
+        if signals is not None:
+            if detected is None:
+                reason = 'dismissed'
+            elif (detected['context_analysis'] or {}).get('reason') == 'Contexto ambiguo':
+                reason = 'ambiguous'
+            else:
+                reason = 'candidate'
+            sentence_start, sentence_end = index.bounds(start, end - start)
+            signals.append({
+                'start': offset + sentence_start,
+                'end': offset + sentence_end,
+                'word_start': offset + start,
+                'word_end': offset + end,
+                'spaced': spaced,
+                'reason': reason
+            })
+        
+        if detected:
+            suggestion = self.get_suggestion(detected['term'], detected['category'])
+            explanation = self.get_explanation(detected['category'], detected.get('context_analysis'))
+            severity = self.calculate_severity(detected['confidence'], detected['category'])
+            
+            issues.append({
+                'type': detected['category'],
+                'original_text': word,
+                'suggestion': suggestion,
+                'severity': severity,
+                'explanation': explanation,
+                'confidence': round(detected['confidence'], 2),
+                'start': offset + start,
+                'end': offset + end
+            })
+    
+    def _record_scan(self, stages: Dict[str, float], words: int, candidates: int,
+                     issues: int, memo_hits: int):
+        """Publica en METRICS las etapas y contadores de un _scan"""
+        for stage, seconds in stages.items():
+            METRICS.observe('analyzer_stage_seconds', seconds, analyzer='basic', stage=stage)
+        METRICS.inc('analyzer_words_total', words, analyzer='basic')
+        METRICS.inc('analyzer_candidates_total', candidates, analyzer='basic')
+        METRICS.inc('analyzer_issues_total', issues, analyzer='basic')
+        METRICS.inc('analyzer_memo_hits_total', memo_hits, analyzer='basic')
+    
+    def analyze_stream(self, chunks: Iterable[str], max_buffer: int = 20000) -> Iterator[Dict]:
+        """Analiza texto que llega por fragmentos con memoria constante.
+        
+        Corta en fin de oración, conserva como contexto la cola del texto ya
+        analizado y emite cada issue en cuanto aparece. Al final emite un
+        evento 'summary' con las estadísticas acumuladas.
+        """
+        memo = AnalysisMemo()
+        consumed = 0
+        total_words = 0
+        category_count = {category: 0 for category in self.offensive_base_terms}
+        severity_count = {'high': 0, 'medium': 0, 'low': 0}
+        context = ''
+        buffer = ''
+        
+        def process(segment: str) -> Iterator[Dict]:
+            nonlocal consumed, total_words, context
+            issues, words = self._scan(context + segment, memo, start=len(context),
+                                       offset=consumed - len(context))
+            consumed += len(segment)
+            total_words += words
+            for issue in issues:
+                category_count[issue['type']] += 1
+                severity_count[issue['severity']] += 1
+                yield {'event': 'issue', 'issue': issue}
+            context = tail_context(context + segment, CONTEXT_WINDOW)
+        
+        for chunk in chunks:
+            buffer += chunk
+            complete, buffer = split_complete(buffer, max_buffer)
+            if complete:
+                yield from process(complete)
+            # Evitar que memo crezca sin límite en documentos enormes
+            if len(memo.normalized) > 50000:
+                memo = AnalysisMemo()
+        
+        if buffer.strip():
+            yield from process(buffer)
+        
+        stats, overall_feedback = self.summarize(total_words, category_count, severity_count)
+        yield {'event': 'summary', 'stats': stats, 'overall_feedback': overall_feedback}
+    
+    def build_result(self, text: str, issues: List[Dict], total_words: int) -> Dict:
+        """Calcula estadísticas, puntuación y feedback a partir de los issues"""
+        category_count = {category: 0 for category in ('sexist', 'ableist', 'ethnic', 'offensive')}
+        severity_count = {'high': 0, 'medium': 0, 'low': 0}
+        for issue in issues:
+            category_count[issue['type']] += 1
+            severity_count[issue['severity']] += 1
         
-        # Estadísticas
-        total_words = len(words)
-        issues_found = len(issues)
-        
-        category_count = {
-            'sexist': sum(1 for i in issues if i['type'] == 'sexist'),
-            'ableist': sum(1 for i in issues if i['type'] == 'ableist'),
-            'ethnic': sum(1 for i in issues if i['type'] == 'ethnic'),
-            'offensive': sum(1 for i in issues if i['type'] == 'offensive')
+        stats, overall_feedback = self.summarize(total_words, category_count, severity_count)
+        
+        return {
+            'original_text': text,
+            'issues': issues,
+            'suggestions': [
+                {
+                    'original': i['original_text'],
+                    'replacement': i['suggestion'],
+                    'reason': i['explanation']
+                }
+                for i in issues
+            ],
+            'stats': stats,
+            'overall_feedback': overall_feedback
         }
+    
+    def summarize(self, total_words: int, category_count: Dict[str, int],
+                  severity_count: Dict[str, int]) -> Tuple[Dict, str]:
+        """Estadísticas y feedback a partir de contadores por categoría y severidad"""
+        # Estadísticas
+        issues_found = sum(severity_count.values())
         
         # Calcular score de inclusividad
         severity_weight = {'high': 3, 'medium': 2, 'low': 1}
-        weighted_issues = sum(severity_weight[i['severity']] for i in issues)
+        weighted_issues = sum(severity_weight[s] * count for s, count in severity_count.items())
         inclusive_score = max(0, round(100 - (weighted_issues / max(1, total_words)) * 100))
         
         # Feedback inteligente
         if issues_found == 0:
             overall_feedback = '✅ ¡Excelente! Tu texto utiliza un lenguaje inclusivo y respetuoso. No se detectaron términos problemáticos.'
         elif issues_found == 1:
-            severity = issues[0]['severity']
-            if severity == 'high':
+            if severity_count['high']:
                 overall_feedback = '🚨 Encontré 1 término de alta severidad que resulta claramente ofensivo. Te sugiero revisarlo.'
             else:
                 overall_feedback = '⚠️ Encontré 1 término que podría mejorarse para ser más inclusivo.'
         else:
-            high_count = sum(1 for i in issues if i['severity'] == 'high')
-            medium_count = sum(1 for i in issues if i['severity'] == 'medium')
-            
+            high_count = severity_count['high']
+            medium_count = severity_count['medium']
             if high_count > 0:
                 overall_feedback = f'🚨 Detecté {high_count} término{"s" if high_count > 1 else ""} de alta severidad que {"resultan" if high_count > 1 else "resulta"} claramente ofensivo{"s" if high_count > 1 else ""}.'
                 if medium_count > 0:
@@ -661,22 +988,11 @@ class BasicAnalyzer:
             else:
                 overall_feedback += ' - El texto requiere una revisión profunda.'
         
-        return {
-            'original_text': text,
-            'issues': issues,
-            'suggestions': [
-                {
-                    'original': i['original_text'],
-                    'replacement': i['suggestion'],
-                    'reason': i['explanation']
-                }
-                for i in issues
-            ],
-            'stats': {
-                'total_words': total_words,
-                'issues_found': issues_found,
-                'inclusive_score': inclusive_score,
-                'categories': category_count
-            },
-            'overall_feedback': overall_feedback
-        }
\ No newline at end of file
+        stats = {
+            'total_words': total_words,
+            'issues_found': issues_found,
+            'inclusive_score': inclusive_score,
+            'categories': dict(category_count)
+        }
+        
+        return stats, overall_feedback
\ No newline at end of file
@@ -0,0 +1,161 @@
+# services/fuzzy_index.py - BÚSQUEDA APROXIMADA (DISTANCIA DE EDICIÓN) SOBRE EL LÉXICO
+
+import sys
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+# Distancia máxima según la longitud de la palabra: las palabras cortas no
+# admiten errores (perro/perra, loco/loca son palabras distintas, no erratas)
+DISTANCE_BY_LENGTH = ((10, 2), (6, 1))
+
+# Las palabras más largas no se buscan: acota el número de borrados por consulta
+MAX_WORD_LENGTH = 24
+
+
+def allowed_distance(length: int, max_distance: int) -> int:
+    """Distancia de edición admitida para una palabra de esa longitud"""
+    for min_length, distance in DISTANCE_BY_LENGTH:
+        if length >= min_length:
+            return min(distance, max_distance)
+    return 0
+
+
+def deletes(word: str, distance: int) -> Set[str]:
+    """Variantes de la palabra con hasta `distance` caracteres borrados (incluida ella)"""
+    found = {word}
+    if distance <= 2:
+        # Caso de las consultas: pares de posiciones sin pasar por los borrados
+        # intermedios (la mitad de cortes que ir nivel a nivel)
+        length = len(word)
+        if distance:
+            found.update([word[:i] + word[i + 1:] for i in range(length)])
+        if distance == 2:
+            found.update([word[:i] + word[i + 1:j] + word[j + 1:]
+                          for j in range(1, length) for i in range(j)])
+        return found
+
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {
+            candidate[:index] + candidate[index + 1:]
+            for candidate in frontier
+            for index in range(len(candidate))
+        }
+        found |= frontier
+    return found
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Distancia de Damerau-Levenshtein restringida (OSA), o limit + 1 si la supera.
+
+    Solo calcula la banda |i - j| <= limit de la matriz: fuera de ella la
+    distancia ya supera el límite, así que el coste es O(len * limit).
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if a == b:
+        return 0
+
+    over = limit + 1
+    width = len(b)
+    previous2: Optional[List[int]] = None
+    previous = [j if j <= limit else over for j in range(width + 1)]
+    for i, ca in enumerate(a, 1):
+        current = [over] * (width + 1)
+        if i <= limit:
+            current[0] = i
+        row_min = current[0]
+        for j in range(max(1, i - limit), min(width, i + limit) + 1):
+            cb = b[j - 1]
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if previous2 is not None and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                value = min(value, previous2[j - 2] + 1)
+            if value > over:
+                value = over
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return over
+        previous2, previous = previous, current
+
+    return previous[-1] if previous[-1] <= limit else over
+
+
+class FuzzyIndex:
+    """Diccionario de borrados (estilo SymSpell) sobre las entradas normalizadas.
+
+    Cada entrada se indexa por todas sus variantes con hasta 1 o 2
+    caracteres borrados (según DISTANCE_BY_LENGTH). Una consulta genera los
+    borrados de la palabra, recoge las entradas que comparten alguno y solo
+    verifica esas con la distancia real: el coste depende de la longitud de
+    la palabra, no del tamaño del léxico.
+    """
+
+    def __init__(self, words: Sequence[str], max_distance: int = 2):
+        self.max_distance = max_distance
+        self._words = tuple(words)
+        index: Dict[str, List[int]] = {}
+
+        for entry_id, word in enumerate(self._words):
+            # Una entrada de longitud n puede estar a distancia d de palabras
+            # de hasta n + d caracteres: indexar con la distancia que estas admiten
+            distance = allowed_distance(len(word) + max_distance, max_distance)
+            if not distance:
+                continue
+            for variant in deletes(word, distance):
+                index.setdefault(variant, []).append(entry_id)
+
+        # Casi todas las variantes apuntan a una sola entrada: se guarda el id
+        # suelto en vez de una tupla de un elemento
+        self._index: Dict[str, object] = {
+            variant: ids[0] if len(ids) == 1 else tuple(ids) for variant, ids in index.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def lookup(self, word: str, max_distance: Optional[int] = None) -> List[Tuple[int, int]]:
+        """Pares (distancia, id de entrada) a distancia 1..máxima, del más cercano al más lejano"""
+        limit = allowed_distance(len(word), self.max_distance if max_distance is None
+                                 else min(max_distance, self.max_distance))
+        if not limit or len(word) > MAX_WORD_LENGTH:
+            return []
+
+        candidates: Set[int] = set()
+        index = self._index
+        for variant in deletes(word, limit):
+            ids = index.get(variant)
+            if ids is None:
+                continue
+            if ids.__class__ is int:
+                candidates.add(ids)
+            else:
+                candidates.update(ids)
+
+        results = []
+        for entry_id in candidates:
+            distance = edit_distance(word, self._words[entry_id], limit)
+            if 0 < distance <= limit:
+                results.append((distance, entry_id))
+        results.sort()
+        return results
+
+    def brute_force(self, word: str, max_distance: Optional[int] = None) -> List[Tuple[int, int]]:
+        """Lo mismo que lookup recorriendo todas las entradas (referencia para benchmarks)"""
+        limit = allowed_distance(len(word), self.max_distance if max_distance is None
+                                 else min(max_distance, self.max_distance))
+        if not limit or len(word) > MAX_WORD_LENGTH:
+            return []
+        results = []
+        for entry_id, entry in enumerate(self._words):
+            distance = edit_distance(word, entry, limit)
+            if 0 < distance <= limit:
+                results.append((distance, entry_id))
+        results.sort()
+        return results
+
+    def memory_bytes(self) -> int:
+        """Tamaño aproximado del índice de borrados"""
+        return sys.getsizeof(self._index) + sum(
+            sys.getsizeof(variant) + sys.getsizeof(ids) for variant, ids in self._index.items()
+        )
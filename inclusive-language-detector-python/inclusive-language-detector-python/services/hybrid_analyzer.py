@@ -0,0 +1,176 @@
+# services/hybrid_analyzer.py - MODO HÍBRIDO: BÁSICO PRIMERO, IA SOLO CUANDO HAY SEÑAL
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .basic_analyzer import AnalysisMemo, BasicAnalyzer
+
+VALID_TYPES = ('sexist', 'ableist', 'ethnic', 'offensive')
+VALID_SEVERITIES = ('high', 'medium', 'low')
+
+
+class HybridAnalyzer:
+    """Análisis escalonado: BasicAnalyzer responde los textos limpios al instante.
+
+    Solo se envían a la IA las oraciones con palabras que contienen un término
+    completo del léxico (BasicAnalyzer.candidate_spans: "con" dentro de
+    "maricón" no cuenta) y que el contexto no descartó, o con letras
+    espaciadas que forman un término. El resultado indica qué nivel
+    respondió ('basic' o 'pro').
+    """
+
+    def __init__(self, basic: BasicAnalyzer, escalate: Callable[[str], Dict]):
+        self.basic = basic
+        # escalate(texto) -> resultado de ProAnalyzer (síncrono o puente al bucle asyncio)
+        self.escalate = escalate
+
+        self._lock = threading.Lock()
+        self.counters = {
+            'basic': {'count': 0, 'total_ms': 0.0},
+            'pro': {'count': 0, 'total_ms': 0.0},
+            'pro_errors': 0,
+        }
+
+    def analyze(self, text: str) -> Dict:
+        """Analiza con el modo básico y escala a la IA las oraciones con señal"""
+        if not text or not text.strip():
+            return {'error': 'El texto no puede estar vacío'}
+
+        started = time.perf_counter()
+        memo = AnalysisMemo()
+        signals: List[Dict] = []
+
+        issues, total_words = self.basic._scan(text, memo, signals=signals)
+        signals = self._strict_signals(text, memo, signals)
+        basic_ms = (time.perf_counter() - started) * 1000
+
+        spans = self._merge_spans(signals)
+        reasons: Dict[str, int] = {}
+        for signal in signals:
+            reasons[signal['reason']] = reasons.get(signal['reason'], 0) + 1
+
+        escalation = {
+            'sentences': len(spans),
+            'signals': reasons,
+            'basic_ms': round(basic_ms, 2),
+        }
+
+        if not spans:
+            return self._answer('basic', self.basic.build_result(text, issues, total_words), escalation, started)
+
+        excerpt = '\n'.join(text[start:end].strip() for start, end in spans)
+        pro_started = time.perf_counter()
+        pro_result = self.escalate(excerpt)
+        escalation['pro_ms'] = round((time.perf_counter() - pro_started) * 1000, 2)
+
+        if 'error' in pro_result or 'fallback' in pro_result:
+            # La IA no respondió (o respondió el respaldo básico): el resultado local sigue siendo válido
+            with self._lock:
+                self.counters['pro_errors'] += 1
+            escalation['error'] = pro_result.get('error') or pro_result['fallback']['message']
+            return self._answer('basic', self.basic.build_result(text, issues, total_words), escalation, started)
+
+        # Dentro de las oraciones escaladas decide la IA; fuera, el modo básico
+        merged = [issue for issue in issues if not self._inside(issue['start'], spans)]
+        merged.extend(self._locate(text, spans, pro_result.get('issues', [])))
+        merged.sort(key=lambda issue: issue.get('start', len(text)))
+
+        result = self.basic.build_result(text, merged, total_words)
+        return self._answer('pro', result, escalation, started)
+
+    def stats(self) -> Dict:
+        """Respuestas por nivel, latencia media y llamadas a la IA evitadas"""
+        with self._lock:
+            basic = self.counters['basic']
+            pro = self.counters['pro']
+            return {
+                'answered_by': {'basic': basic['count'], 'pro': pro['count']},
+                'llm_calls_avoided': basic['count'] - self.counters['pro_errors'],
+                'pro_errors': self.counters['pro_errors'],
+                'avg_ms': {
+                    'basic': round(basic['total_ms'] / basic['count'], 2) if basic['count'] else 0.0,
+                    'pro': round(pro['total_ms'] / pro['count'], 2) if pro['count'] else 0.0,
+                },
+            }
+
+    def _answer(self, tier: str, result: Dict, escalation: Dict, started: float) -> Dict:
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.counters[tier]['count'] += 1
+            self.counters[tier]['total_ms'] += elapsed
+
+        result['tier'] = tier
+        result['escalation'] = escalation
+        return result
+
+    def _strict_signals(self, text: str, memo: AnalysisMemo, signals: List[Dict]) -> List[Dict]:
+        """Señales de _scan cuya palabra pasa el filtro estricto y que el contexto no descartó.
+
+        _scan también señala palabras contenidas en un término ("los" en
+        "losninos", "para" en "paranoico"), que aparecen en casi cualquier
+        texto; escalarlas mandaría a la IA los textos limpios. Las secuencias de
+        letras espaciadas de _scan ("p e n d e j o") pasan el mismo filtro con
+        sus letras unidas y cuentan como 'evasion'.
+        """
+        strict = {start for start, _ in self.basic.candidate_spans(text, memo)}
+        kept = []
+        for signal in signals:
+            if signal['reason'] == 'dismissed':
+                continue
+            if signal['spaced']:
+                letters = self.basic.normalize(text[signal['word_start']:signal['word_end']])
+                if self.basic.is_strict_candidate(letters):
+                    kept.append(dict(signal, reason='evasion'))
+            elif signal['word_start'] in strict:
+                kept.append(signal)
+        return kept
+
+    @staticmethod
+    def _merge_spans(signals: List[Dict]) -> List[Tuple[int, int]]:
+        spans: List[Tuple[int, int]] = []
+        for start, end in sorted((signal['start'], signal['end']) for signal in signals):
+            if spans and start <= spans[-1][1]:
+                spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+            else:
+                spans.append((start, end))
+        return spans
+
+    @staticmethod
+    def _inside(position: int, spans: List[Tuple[int, int]]) -> bool:
+        return any(start <= position < end for start, end in spans)
+
+    @staticmethod
+    def _locate(text: str, spans: List[Tuple[int, int]], pro_issues: List[Dict]) -> List[Dict]:
+        """Normaliza los issues de la IA y les asigna posiciones dentro de las oraciones escaladas"""
+        located = []
+        lower = text.lower()
+        used = set()
+
+        for issue in pro_issues:
+            if not isinstance(issue, dict):
+                continue
+            issue = dict(issue)
+            if issue.get('type') not in VALID_TYPES:
+                issue['type'] = 'offensive'
+            if issue.get('severity') not in VALID_SEVERITIES:
+                issue['severity'] = 'medium'
+
+            needle = str(issue.get('original_text', '')).lower()
+            position: Optional[int] = None
+            if needle:
+                for start, end in spans:
+                    found = lower.find(needle, start, end)
+                    while found != -1 and found in used:
+                        found = lower.find(needle, found + 1, end)
+                    if found != -1:
+                        position = found
+                        break
+
+            if position is not None:
+                used.add(position)
+                issue['start'] = position
+                issue['end'] = position + len(needle)
+            located.append(issue)
+
+        return located
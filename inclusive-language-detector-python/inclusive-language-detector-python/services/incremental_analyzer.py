@@ -0,0 +1,175 @@
+# services/incremental_analyzer.py - REANÁLISIS INCREMENTAL POR ORACIÓN PARA EL EDITOR
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .basic_analyzer import AnalysisMemo, BasicAnalyzer
+from .segmentation import sentence_hash, split_sentences
+
+
+class IncrementalAnalyzer:
+    """Mantiene los resultados por oración y solo reanaliza las oraciones que cambian.
+
+    El cliente identifica el documento con `document_id` y envía una de:
+      - `text`: el documento completo (el servidor lo divide y calcula los hashes);
+      - `sentences`: la lista ordenada de oraciones como {"hash"} si el servidor
+        ya la conoce, o {"text"} si es nueva o cambió;
+      - `diff`: {"start", "delete", "insert": [...]} sobre la última versión
+        del documento (mismo formato que `sentences` para las insertadas).
+
+    Si falta el texto de algún hash desconocido (p. ej. expulsado de la caché),
+    el resultado trae `missing` con esos hashes para que el cliente los reenvíe.
+    """
+
+    def __init__(self, analyzer: BasicAnalyzer, max_sentences: int = 20000,
+                 max_documents: int = 1000):
+        self.analyzer = analyzer
+        self.max_sentences = max_sentences
+        self.max_documents = max_documents
+
+        # hash -> (texto, issues con posiciones relativas a la oración, palabras)
+        self._sentences: 'OrderedDict[str, Tuple[str, List[Dict], int]]' = OrderedDict()
+        # document_id -> hashes de la última versión analizada
+        self._documents: 'OrderedDict[str, List[str]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.reanalyzed = 0
+        self.reused = 0
+
+    def analyze(self, document_id: str, text: Optional[str] = None,
+                sentences: Optional[List[Dict]] = None,
+                diff: Optional[Dict] = None) -> Dict:
+        """Analiza la nueva versión del documento reutilizando las oraciones sin cambios"""
+        if text is not None:
+            items = [{'text': text[start:end]} for start, end in split_sentences(text)]
+        elif sentences is not None:
+            items = sentences
+        elif diff is not None:
+            try:
+                items = self._apply_diff(document_id, diff)
+            except ValueError as e:
+                return {'error': f'Diff inválido: {str(e)}'}
+            if items is None:
+                return {
+                    'error': 'Documento desconocido: envía el texto completo',
+                    'missing_document': True
+                }
+        else:
+            return {'error': 'Envía "text", "sentences" o "diff"'}
+
+        # Resolver cada oración: caché por hash o análisis de las nuevas
+        memo = AnalysisMemo()
+        resolved: List[Tuple[str, Tuple[str, List[Dict], int]]] = []
+        missing: List[str] = []
+        reanalyzed = 0
+
+        for item in items:
+            if not isinstance(item, dict):
+                return {'error': 'Oración inválida: se esperaba un objeto con "hash" o "text"'}
+
+            sentence = item.get('text')
+            if isinstance(sentence, str):
+                key = sentence_hash(sentence)
+                entry = self._get(key)
+                if entry is None:
+                    issues, total_words = self.analyzer._scan(sentence, memo)
+                    entry = (sentence, issues, total_words)
+                    self._put(key, entry)
+                    reanalyzed += 1
+            else:
+                key = str(item.get('hash', ''))
+                entry = self._get(key)
+                if entry is None:
+                    missing.append(key)
+                    continue
+            resolved.append((key, entry))
+
+        if missing:
+            return {
+                'error': 'Faltan oraciones: reenvía su texto',
+                'missing': missing
+            }
+
+        with self._lock:
+            self._documents[document_id] = [key for key, _ in resolved]
+            self._documents.move_to_end(document_id)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+            self.reanalyzed += reanalyzed
+            self.reused += len(resolved) - reanalyzed
+
+        # Fusionar: posiciones desplazadas al documento y estadísticas recalculadas
+        parts = []
+        issues = []
+        total_words = 0
+        position = 0
+        for _, (sentence, sentence_issues, sentence_words) in resolved:
+            for issue in sentence_issues:
+                issues.append(dict(issue, start=issue['start'] + position, end=issue['end'] + position))
+            parts.append(sentence)
+            total_words += sentence_words
+            position += len(sentence)
+
+        document = ''.join(parts)
+        if not document.strip():
+            return {'error': 'El texto no puede estar vacío'}
+
+        result = self.analyzer.build_result(document, issues, total_words)
+        result['document_id'] = document_id
+        result['sentences'] = [key for key, _ in resolved]
+        result['incremental'] = {
+            'sentences': len(resolved),
+            'reanalyzed': reanalyzed,
+            'reused': len(resolved) - reanalyzed
+        }
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'documents': len(self._documents),
+                'sentences': len(self._sentences),
+                'max_sentences': self.max_sentences,
+                'reanalyzed': self.reanalyzed,
+                'reused': self.reused,
+            }
+
+    def _apply_diff(self, document_id: str, diff: Dict) -> Optional[List[Dict]]:
+        """Aplica un diff por oraciones sobre la última versión conocida del documento.
+
+        None si el documento no se conoce; ValueError si el diff no es válido.
+        """
+        start = diff.get('start', 0)
+        delete = diff.get('delete', 0)
+        insert = diff.get('insert', [])
+        # bool es subclase de int: {"start": true} no es una posición
+        for name, value in (('start', start), ('delete', delete)):
+            if type(value) is not int or value < 0:
+                raise ValueError(f'"{name}" debe ser un entero no negativo')
+        if not isinstance(insert, list):
+            raise ValueError('"insert" debe ser una lista de oraciones')
+
+        with self._lock:
+            previous = self._documents.get(document_id)
+        if previous is None:
+            return None
+        if start > len(previous) or start + delete > len(previous):
+            raise ValueError(f'el documento tiene {len(previous)} oraciones')
+
+        items = [{'hash': key} for key in previous]
+        items[start:start + delete] = insert
+        return items
+
+    def _get(self, key: str) -> Optional[Tuple[str, List[Dict], int]]:
+        with self._lock:
+            entry = self._sentences.get(key)
+            if entry is not None:
+                self._sentences.move_to_end(key)
+            return entry
+
+    def _put(self, key: str, entry: Tuple[str, List[Dict], int]):
+        with self._lock:
+            self._sentences[key] = entry
+            while len(self._sentences) > self.max_sentences:
+                self._sentences.popitem(last=False)
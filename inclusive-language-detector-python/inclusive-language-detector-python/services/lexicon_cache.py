@@ -0,0 +1,173 @@
+# services/lexicon_cache.py - ARTEFACTO COMPILADO Y VERSIONADO DEL LÉXICO
+
+import glob
+import hashlib
+import json
+import os
+import pickle
+import stat
+import tempfile
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .term_matcher import TermMatcher
+
+
+def _user_id() -> Optional[int]:
+    # None en sistemas sin uid (Windows): ahí no hay /tmp compartido que proteger
+    return os.getuid() if hasattr(os, 'getuid') else None
+
+
+def _writable(directory: str) -> bool:
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError:
+        return False
+    return os.access(directory, os.W_OK)
+
+
+def _private(info: os.stat_result, directory: bool) -> bool:
+    """¿Es del usuario actual y nadie más puede escribir (ni, si es directorio, entrar)?"""
+    uid = _user_id()
+    if uid is None:
+        return True
+    if info.st_uid != uid:
+        return False
+    if directory:
+        return stat.S_ISDIR(info.st_mode) and not info.st_mode & 0o077
+    return stat.S_ISREG(info.st_mode) and not info.st_mode & 0o022
+
+
+class LexiconCache:
+    """Guarda en disco los metadatos del léxico y su TermMatcher compilado.
+
+    El artefacto se indexa por un hash del contenido de las listas base, los
+    afijos y el mapa de caracteres: mientras no cambien, cada arranque en frío
+    carga el autómata ya construido en lugar de regenerarlo.
+
+    El artefacto es un pickle (cargarlo ejecuta código), así que solo se lee
+    del directorio del proyecto o de un directorio de respaldo privado del
+    usuario (0700, comprobado antes de leer): nunca de una ruta compartida
+    donde otro usuario pueda dejar un archivo con el nombre esperado.
+    """
+
+    # Subir cuando cambie la normalización o la estructura del TermMatcher
+    FORMAT_VERSION = 4
+
+    def __init__(self, directory: Optional[str] = None):
+        configured = directory or os.environ.get('LEXICON_CACHE_DIR')
+        default = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.lexicon_cache')
+
+        self.primary = configured or default
+        # En serverless el proyecto suele ser de solo lectura: respaldo privado en /tmp
+        suffix = _user_id() if _user_id() is not None else 'user'
+        self.fallback = os.path.join(tempfile.gettempdir(), f'inclusive-lexicon-cache-{suffix}')
+
+    @property
+    def directories(self) -> List[str]:
+        """Directorios en uso: el principal y, solo si no se puede escribir en él, el de respaldo"""
+        if _writable(self.primary):
+            return [self.primary]
+        return [self.primary, self.fallback]
+
+    def _trusted_fallback(self, create: bool) -> bool:
+        """Crea (si se pide) y comprueba el directorio de respaldo: propio y con permisos 0700"""
+        try:
+            if create:
+                os.makedirs(self.fallback, mode=0o700, exist_ok=True)
+            info = os.lstat(self.fallback)
+        except OSError:
+            return False
+        if not _private(info, directory=True):
+            print(f"⚠️ Directorio de respaldo del léxico ignorado (no es privado): {self.fallback}")
+            return False
+        return True
+
+    @classmethod
+    def fingerprint(cls, base_db: Dict, affixes: Dict, char_map: Dict) -> str:
+        """Hash estable del contenido que determina el léxico compilado"""
+        payload = json.dumps(
+            {
+                'format': cls.FORMAT_VERSION,
+                'base': base_db,
+                'affixes': affixes,
+                'char_map': sorted(char_map.items()),
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path(self, key: str, directory: Optional[str] = None) -> str:
+        """Ruta del artefacto para un hash dado"""
+        return os.path.join(directory or self.primary, f'lexicon-{key[:16]}.pkl')
+
+    def load(self, key: str) -> Optional[Tuple[Dict, TermMatcher]]:
+        """Carga el artefacto si existe y corresponde al hash actual"""
+        for directory in self.directories:
+            fallback = directory == self.fallback
+            if fallback and not self._trusted_fallback(create=False):
+                continue
+            try:
+                with open(self.path(key, directory), 'rb') as handle:
+                    if fallback and not _private(os.fstat(handle.fileno()), directory=False):
+                        print(f"⚠️ Artefacto de léxico ignorado (no es del usuario o lo puede escribir otro): "
+                              f"{self.path(key, directory)}")
+                        continue
+                    payload = pickle.load(handle)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                print(f"⚠️ Artefacto de léxico ilegible en {directory}: {str(e)}")
+                continue
+
+            if payload.get('format') == self.FORMAT_VERSION and payload.get('key') == key:
+                return payload['database'], payload['matcher']
+
+        return None
+
+    def save(self, key: str, database: Dict, matcher: TermMatcher) -> Optional[str]:
+        """Escribe el artefacto de forma atómica y elimina versiones obsoletas"""
+        payload = {
+            'format': self.FORMAT_VERSION,
+            'key': key,
+            'database': database,
+            'matcher': matcher,
+        }
+
+        # Se escribe en el último directorio en uso: el principal o, si es de solo lectura, el de respaldo
+        for directory in self.directories[-1:]:
+            if directory == self.fallback and not self._trusted_fallback(create=True):
+                continue
+            target = self.path(key, directory)
+            try:
+                os.makedirs(directory, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+                with os.fdopen(fd, 'wb') as handle:
+                    pickle.dump(payload, handle, protocol=pickle.HIGHEST_PROTOCOL)
+                os.chmod(tmp_path, 0o644)
+                os.replace(tmp_path, target)
+            except OSError:
+                continue
+
+            for stale in glob.glob(os.path.join(directory, 'lexicon-*.pkl')):
+                if stale != target:
+                    try:
+                        os.remove(stale)
+                    except OSError:
+                        pass
+            return target
+
+        print("⚠️ No se pudo guardar el artefacto de léxico compilado")
+        return None
+
+    def load_or_build(self, key: str,
+                      build: Callable[[], Tuple[Dict, TermMatcher]]) -> Tuple[Dict, TermMatcher]:
+        """Devuelve el léxico compilado, reconstruyéndolo solo si el hash cambió"""
+        cached = self.load(key)
+        if cached is not None:
+            return cached
+
+        database, matcher = build()
+        self.save(key, database, matcher)
+        return database, matcher
+
@@ -0,0 +1,365 @@
+# services/llm_backends.py - BACKENDS INTERCAMBIABLES PARA LAS LLAMADAS AL LLM
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+try:
+    from openai import AsyncOpenAI, OpenAI
+except ImportError:
+    AsyncOpenAI = None
+    OpenAI = None
+
+
+def request_key(kwargs: Dict) -> str:
+    """Identifica una petición por modelo y mensajes (lo que determina la respuesta)"""
+    payload = json.dumps(
+        {'model': kwargs.get('model'), 'messages': kwargs.get('messages')},
+        ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _namespace(value):
+    """dict/list JSON -> objetos con atributos, como los que devuelve el cliente de OpenAI"""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_namespace(item) for item in value]
+    return value
+
+
+def _plain(value):
+    """Inverso de _namespace (también acepta los modelos pydantic del cliente)"""
+    if hasattr(value, 'model_dump'):
+        return value.model_dump()
+    if isinstance(value, SimpleNamespace):
+        return {key: _plain(item) for key, item in vars(value).items()}
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    return value
+
+
+# Elementos del prompt de micro-lote: "[0] TEXTO: ..."
+BATCH_ITEM = re.compile(r'^\[(\d+)\] TEXTO: (".*")$', re.MULTILINE)
+# Elementos del micro-lote compacto: "[0]" y sus fragmentos numerados debajo
+COMPACT_BATCH_ITEM = re.compile(r'^\[(\d+)\]\n((?:\d+\. ".*"(?:\n|$))+)', re.MULTILINE)
+# Texto del prompt completo y fragmentos del compacto
+FULL_TEXT = re.compile(r'TEXTO A ANALIZAR:\*\*\n"(.*?)" \n', re.DOTALL)
+FRAGMENT = re.compile(r'^\d+\. (".*")$', re.MULTILINE)
+SYNTHETIC_WORD = re.compile(r'[^\W\d_]{5,}')
+
+
+def _synthetic_issues(text: str, count: int, compact: bool = False) -> list:
+    """Hasta `count` issues sobre palabras del propio texto (para pruebas de carga y streaming)"""
+    issues = []
+    for word in list(dict.fromkeys(SYNTHETIC_WORD.findall(text)))[:count]:
+        if compact:
+            issues.append({'type': 'offensive', 'text': word, 'fix': 'alternativa', 'sev': 'l',
+                           'why': 'Issue sintético del servidor de pruebas.'})
+        else:
+            issues.append({'type': 'offensive', 'original_text': word, 'suggestion': 'alternativa',
+                           'severity': 'low', 'explanation': 'Issue sintético del servidor de pruebas.',
+                           'confidence': 0.5})
+    return issues
+
+
+def synthesize_content(kwargs: Dict, issues: int = 0) -> str:
+    """Respuesta JSON válida con la forma que espera cada tipo de prompt.
+
+    Sin issues por defecto; con `issues` > 0 marca hasta ese número de
+    palabras de cada texto analizado.
+    """
+    prompt = kwargs['messages'][-1]['content']
+
+    items = BATCH_ITEM.findall(prompt)
+    if items:
+        return json.dumps({'results': {
+            item: {'issues': _synthetic_issues(json.loads(text), issues) if issues else [],
+                   'overall_feedback': '✅ Análisis completado.'}
+            for item, text in items
+        }}, ensure_ascii=False)
+    compact_items = COMPACT_BATCH_ITEM.findall(prompt)
+    if compact_items:
+        return json.dumps({'results': {
+            item: {'issues': _synthetic_issues(
+                ' '.join(json.loads(fragment) for fragment in FRAGMENT.findall(block)), issues, compact=True
+            ) if issues else []}
+            for item, block in compact_items
+        }}, ensure_ascii=False)
+    if '"fix"' in prompt:
+        fragments = ' '.join(json.loads(fragment) for fragment in FRAGMENT.findall(prompt))
+        return json.dumps({'issues': _synthetic_issues(fragments, issues, compact=True) if issues else []},
+                          ensure_ascii=False)
+    match = FULL_TEXT.search(prompt)
+    found = _synthetic_issues(match.group(1), issues) if issues and match else []
+    return json.dumps({'issues': found, 'overall_feedback': '✅ Análisis completado.'}, ensure_ascii=False)
+
+
+def content_chunks(content: str, size: int = 16) -> list:
+    """Trocea una respuesta como llegaría en streaming (unos pocos tokens por fragmento)"""
+    return [content[index:index + size] for index in range(0, len(content), size)] or ['']
+
+
+def completion_payload(kwargs: Dict, content: str) -> Dict:
+    """Cuerpo de una respuesta de chat.completions con un uso de tokens estimado (~4 caracteres/token)"""
+    prompt_chars = sum(len(message.get('content', '')) for message in kwargs.get('messages', []))
+    prompt_tokens = max(1, prompt_chars // 4)
+    completion_tokens = max(1, len(content) // 4)
+    return {
+        'id': f'chatcmpl-local-{request_key(kwargs)[:12]}',
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': kwargs.get('model', 'local'),
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content},
+            'finish_reason': 'stop',
+        }],
+        'usage': {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+        },
+    }
+
+
+class OpenAIBackend:
+    """Clientes síncrono y asíncrono de OpenAI (o de un servidor compatible en `base_url`)"""
+
+    name = 'openai'
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None,
+                 timeout: float = 20.0, max_retries: int = 0):
+        self.base_url = base_url
+        # Sin reintentos propios: plazos y reintentos los decide LLMGateway por llamada
+        self.client = OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=max_retries)
+
+        # Cliente asíncrono: muchas llamadas en vuelo sin bloquear un worker cada una
+        self.async_client = None
+        if AsyncOpenAI is not None:
+            try:
+                self.async_client = AsyncOpenAI(
+                    api_key=api_key, base_url=base_url, timeout=timeout, max_retries=max_retries
+                )
+            except Exception as e:
+                print(f"⚠️ Error inicializando el cliente asíncrono de OpenAI: {str(e)}")
+
+    @staticmethod
+    def _parse(raw, headers: Optional[Dict[str, str]]):
+        """Respuesta ya parseada; copia las cabeceras (x-ratelimit-*, etc.) en `headers`"""
+        if headers is not None:
+            headers.update({key.lower(): value for key, value in raw.headers.items()})
+        return raw.parse()
+
+    def complete(self, kwargs: Dict, timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None, headers: Optional[Dict[str, str]] = None):
+        client = self.client
+        if timeout is not None or max_retries is not None:
+            options = {'timeout': timeout, 'max_retries': max_retries}
+            client = client.with_options(**{key: value for key, value in options.items() if value is not None})
+        return self._parse(client.chat.completions.with_raw_response.create(**kwargs), headers)
+
+    async def complete_async(self, kwargs: Dict, timeout: float, max_retries: int = 2,
+                             headers: Optional[Dict[str, str]] = None):
+        if self.async_client is None:
+            raise RuntimeError('Cliente asíncrono de OpenAI no disponible')
+        raw = await self.async_client.with_options(
+            timeout=timeout, max_retries=max_retries
+        ).chat.completions.with_raw_response.create(**kwargs)
+        return self._parse(raw, headers)
+
+    async def stream_async(self, kwargs: Dict, timeout: float, headers: Optional[Dict[str, str]] = None,
+                           usage: Optional[Dict[str, int]] = None):
+        """Fragmentos de texto de la respuesta según llegan; `usage` recibe los tokens al final"""
+        if self.async_client is None:
+            raise RuntimeError('Cliente asíncrono de OpenAI no disponible')
+        raw = await self.async_client.with_options(
+            timeout=timeout, max_retries=0
+        ).chat.completions.with_raw_response.create(
+            **kwargs, stream=True, stream_options={'include_usage': True}
+        )
+        stream = self._parse(raw, headers)
+        try:
+            async for chunk in stream:
+                if chunk.usage is not None and usage is not None:
+                    usage.update(prompt_tokens=chunk.usage.prompt_tokens,
+                                 completion_tokens=chunk.usage.completion_tokens)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+
+
+class ReplayBackend:
+    """Reproduce respuestas grabadas sin red (CI, pruebas de carga, demos).
+
+    Las grabaciones son un JSONL con {"key": request_key, "response": cuerpo
+    de chat.completions}. Una petición ya grabada recibe su respuesta exacta;
+    el resto, si `strict` es False, una respuesta sintética válida y vacía
+    (ver synthesize_content) con la forma que espera su prompt.
+    """
+
+    name = 'replay'
+
+    def __init__(self, fixtures: Optional[Dict[str, Dict]] = None,
+                 latency: float = 0.0, strict: bool = False, issues: int = 0):
+        self.fixtures = fixtures or {}
+        self.latency = latency
+        self.strict = strict
+        self.issues = issues
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str, **options) -> 'ReplayBackend':
+        return cls(load_fixtures(path), **options)
+
+    def payload(self, kwargs: Dict) -> Dict:
+        """Cuerpo JSON de la respuesta a esta petición"""
+        recorded = self.fixtures.get(request_key(kwargs))
+        with self._lock:
+            if recorded is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if recorded is not None:
+            return recorded
+        if self.strict:
+            raise LookupError('Petición sin respuesta grabada (replay estricto)')
+        return completion_payload(kwargs, synthesize_content(kwargs, self.issues))
+
+    def complete(self, kwargs: Dict, timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None, headers: Optional[Dict[str, str]] = None):
+        if self.latency:
+            time.sleep(self.latency)
+        return _namespace(self.payload(kwargs))
+
+    async def complete_async(self, kwargs: Dict, timeout: float, max_retries: int = 2,
+                             headers: Optional[Dict[str, str]] = None):
+        if self.latency:
+            await asyncio.sleep(min(self.latency, timeout))
+        return _namespace(self.payload(kwargs))
+
+    async def stream_async(self, kwargs: Dict, timeout: float, headers: Optional[Dict[str, str]] = None,
+                           usage: Optional[Dict[str, int]] = None):
+        """La respuesta grabada en fragmentos; la latencia se reparte entre el primero y el resto"""
+        payload = self.payload(kwargs)
+        chunks = content_chunks(payload['choices'][0]['message']['content'] or '')
+        if self.latency:
+            await asyncio.sleep(min(self.latency * 0.3, timeout))
+        for index, chunk in enumerate(chunks):
+            if index and self.latency:
+                await asyncio.sleep(self.latency * 0.7 / len(chunks))
+            yield chunk
+        if usage is not None and payload.get('usage'):
+            usage.update(prompt_tokens=payload['usage'].get('prompt_tokens', 0),
+                         completion_tokens=payload['usage'].get('completion_tokens', 0))
+
+
+class RecordingBackend:
+    """Envuelve otro backend y graba cada petición/respuesta en un JSONL para ReplayBackend"""
+
+    def __init__(self, inner, path: str):
+        self.inner = inner
+        self.path = path
+        self.name = f'{inner.name}+record'
+        self._lock = threading.Lock()
+
+    def _record(self, kwargs: Dict, response):
+        entry = {'key': request_key(kwargs), 'response': _plain(response)}
+        try:
+            with self._lock, open(self.path, 'a', encoding='utf-8') as handle:
+                handle.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        except OSError as e:
+            print(f"⚠️ No se pudo grabar la respuesta del LLM: {str(e)}")
+
+    def complete(self, kwargs: Dict, timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None, headers: Optional[Dict[str, str]] = None):
+        response = self.inner.complete(kwargs, timeout, max_retries, headers)
+        self._record(kwargs, response)
+        return response
+
+    async def complete_async(self, kwargs: Dict, timeout: float, max_retries: int = 2,
+                             headers: Optional[Dict[str, str]] = None):
+        response = await self.inner.complete_async(kwargs, timeout, max_retries, headers)
+        self._record(kwargs, response)
+        return response
+
+    async def stream_async(self, kwargs: Dict, timeout: float, headers: Optional[Dict[str, str]] = None,
+                           usage: Optional[Dict[str, int]] = None):
+        parts = []
+        async for chunk in self.inner.stream_async(kwargs, timeout, headers, usage):
+            parts.append(chunk)
+            yield chunk
+        self._record(kwargs, completion_payload(kwargs, ''.join(parts)))
+
+
+def load_fixtures(path: str) -> Dict[str, Dict]:
+    """Grabaciones de un JSONL (la última gana si una clave se repite)"""
+    fixtures = {}
+    with open(path, encoding='utf-8') as handle:
+        for number, line in enumerate(handle, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                fixtures[entry['key']] = entry['response']
+            except (ValueError, KeyError, TypeError):
+                print(f"⚠️ Línea {number} de {path} ignorada: no es una grabación válida")
+    return fixtures
+
+
+def backend_from_env(api_key: str, base_url: Optional[str]):
+    """Construye el backend configurado (PRO_BACKEND) o None si no hay ninguno utilizable.
+
+    - openai (por defecto): API de OpenAI o servidor compatible en OPENAI_BASE_URL
+    - replay: respuestas grabadas en PRO_REPLAY_FIXTURES, sin red
+    PRO_RECORD_FIXTURES graba además cada respuesta del backend elegido.
+    """
+    kind = os.environ.get('PRO_BACKEND', 'openai').strip().lower()
+
+    if kind == 'replay':
+        path = os.environ.get('PRO_REPLAY_FIXTURES', '')
+        fixtures = {}
+        if path:
+            try:
+                fixtures = load_fixtures(path)
+            except OSError as e:
+                print(f"⚠️ No se pudieron leer las grabaciones del LLM: {str(e)}")
+        backend = ReplayBackend(
+            fixtures,
+            latency=float(os.environ.get('PRO_REPLAY_LATENCY_MS', 0)) / 1000,
+            strict=os.environ.get('PRO_REPLAY_STRICT', '').lower() in ('1', 'true', 'yes'),
+            issues=int(os.environ.get('PRO_REPLAY_ISSUES', 0)),
+        )
+    elif kind == 'openai':
+        # Un servidor local compatible no necesita una clave real
+        if base_url and not api_key:
+            api_key = 'sk-local'
+        if not api_key or (not base_url and len(api_key) < 20):
+            print("⚠️ Warning: OPENAI_API_KEY no configurada")
+            return None
+        if OpenAI is None:
+            print("⚠️ Warning: openai package no disponible")
+            return None
+        try:
+            backend = OpenAIBackend(api_key, base_url)
+        except Exception as e:
+            print(f"⚠️ Error inicializando OpenAI: {str(e)}")
+            return None
+    else:
+        print(f"⚠️ PRO_BACKEND desconocido: {kind} (usa openai o replay)")
+        return None
+
+    record_path = os.environ.get('PRO_RECORD_FIXTURES', '')
+    if record_path:
+        backend = RecordingBackend(backend, record_path)
+    return backend
@@ -0,0 +1,651 @@
+# services/llm_gateway.py - CAPA DE LLAMADAS AL LLM: LÍMITE DE RITMO, CIRCUIT BREAKER Y HEDGING
+
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Dict, Mapping, Optional
+
+try:
+    from openai import APIConnectionError, APITimeoutError
+except ImportError:
+    APIConnectionError = APITimeoutError = ()
+
+# Tipos de fallo que indican un problema del proveedor (abren el circuito y
+# permiten responder con el modo básico); el resto son errores de la petición
+PROVIDER_FAILURES = ('rate_limit', 'server', 'timeout', 'connection')
+
+
+class LLMCallError(Exception):
+    """Fallo clasificado de una llamada al LLM.
+
+    kind: rate_limit | server | timeout | connection | auth | bad_request |
+    circuit_open | deadline | cancelled | other
+    """
+
+    def __init__(self, kind: str, message: str = '', status: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(message or kind)
+        self.kind = kind
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.kind in PROVIDER_FAILURES
+
+    @property
+    def provider_failure(self) -> bool:
+        """¿Fallo del proveedor o del propio circuito/plazo (se puede degradar al modo básico)?"""
+        return self.kind in PROVIDER_FAILURES or self.kind in ('circuit_open', 'deadline')
+
+
+DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+
+
+def parse_duration(value) -> Optional[float]:
+    """Segundos de '1.5', '20ms', '6m0s' o '1h2m3s' (formatos de Retry-After y x-ratelimit-reset-*)"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def _headers(source) -> Dict[str, str]:
+    headers = getattr(getattr(source, 'response', None), 'headers', None) or {}
+    return {str(key).lower(): value for key, value in headers.items()}
+
+
+def classify(error: BaseException) -> LLMCallError:
+    """Traduce una excepción del cliente (o del bucle) a un LLMCallError por tipo y estado HTTP"""
+    if isinstance(error, LLMCallError):
+        return error
+    if isinstance(error, asyncio.TimeoutError) or (APITimeoutError and isinstance(error, APITimeoutError)):
+        return LLMCallError('timeout', str(error) or 'timeout')
+    if APIConnectionError and isinstance(error, APIConnectionError):
+        return LLMCallError('connection', str(error))
+
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        return LLMCallError('other', str(error))
+
+    headers = _headers(error)
+    retry_after = parse_duration(headers.get('retry-after'))
+    if retry_after is None:
+        retry_after = parse_duration(headers.get('x-ratelimit-reset-requests'))
+    if status == 429:
+        return LLMCallError('rate_limit', str(error), status, retry_after)
+    if status in (401, 403):
+        return LLMCallError('auth', str(error), status)
+    if status == 408 or status >= 500:
+        return LLMCallError('server', str(error), status, retry_after)
+    return LLMCallError('bad_request', str(error), status)
+
+
+class TokenBucket:
+    """Limitador de ritmo (peticiones/s) que se ajusta con las cabeceras del proveedor.
+
+    x-ratelimit-limit-requests fija el ritmo sostenible (límite por minuto /
+    60); x-ratelimit-remaining-requests recorta los tokens disponibles; un
+    429 o un remaining de 0 detiene el bucket hasta el reset indicado.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.paused_until = 0.0
+        self.waits = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, now: float) -> float:
+        """Toma un token (puede quedar en negativo) y devuelve cuánto esperar; con el lock tomado"""
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self.tokens -= 1
+        wait = max(0.0, self.paused_until - now)
+        if self.tokens < 0:
+            wait = max(wait, -self.tokens / self.rate)
+        return wait
+
+    def reserve(self, expires: float) -> Optional[float]:
+        """Espera necesaria para el siguiente token, o None (sin tomarlo) si supera el plazo"""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._reserve(now)
+            if now + wait > expires:
+                self.tokens += 1
+                return None
+            if wait:
+                self.waits += 1
+            return wait
+
+    def try_acquire(self) -> bool:
+        """Toma un token solo si está disponible ya (peticiones opcionales, como los hedges)"""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._reserve(now)
+            if wait:
+                self.tokens += 1
+                return False
+            return True
+
+    async def acquire(self, expires: float) -> bool:
+        wait = self.reserve(expires)
+        if wait is None:
+            return False
+        if wait:
+            await asyncio.sleep(wait)
+        return True
+
+    def acquire_sync(self, expires: float) -> bool:
+        wait = self.reserve(expires)
+        if wait is None:
+            return False
+        if wait:
+            time.sleep(wait)
+        return True
+
+    def observe(self, headers: Mapping[str, str], rate_limited: bool = False,
+                retry_after: Optional[float] = None):
+        """Ajusta ritmo, tokens y pausa a partir de las cabeceras de una respuesta"""
+        limit = headers.get('x-ratelimit-limit-requests')
+        remaining = headers.get('x-ratelimit-remaining-requests')
+        reset = parse_duration(headers.get('x-ratelimit-reset-requests'))
+        if retry_after is None:
+            retry_after = parse_duration(headers.get('retry-after'))
+
+        with self._lock:
+            now = time.monotonic()
+            try:
+                if limit is not None and float(limit) > 0:
+                    self.rate = float(limit) / 60
+                    self.capacity = max(1.0, min(self.capacity, float(limit)))
+                if remaining is not None:
+                    self.tokens = min(self.tokens, float(remaining))
+                    if float(remaining) <= 0 and reset:
+                        self.paused_until = max(self.paused_until, now + reset)
+            except ValueError:
+                pass
+            if rate_limited:
+                self.tokens = min(self.tokens, 0.0)
+                self.paused_until = max(self.paused_until, now + (retry_after or reset or 1.0))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'rate_per_second': round(self.rate, 3),
+                'capacity': self.capacity,
+                'tokens': round(self.tokens, 2),
+                'paused_for_seconds': round(max(0.0, self.paused_until - time.monotonic()), 3),
+                'waits': self.waits,
+            }
+
+
+class CircuitBreaker:
+    """Abre el circuito si fallan demasiadas de las últimas llamadas al proveedor.
+
+    closed: todo pasa. open: nada pasa durante `cooldown` segundos (los
+    llamadores degradan al modo básico). half_open: pasa una sola llamada de
+    prueba; si sale bien se cierra, si falla vuelve a abrirse.
+    """
+
+    def __init__(self, failure_ratio: float = 0.5, window: int = 20,
+                 min_calls: int = 10, cooldown: float = 15.0):
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.opened = 0
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        return self.admit() is not None
+
+    def admit(self) -> Optional[bool]:
+        """None si la llamada no pasa; si pasa, True cuando es la llamada de prueba del half_open"""
+        with self._lock:
+            if self.state == 'open':
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    return None
+                self.state = 'half_open'
+                self._probing = False
+            if self.state == 'half_open':
+                if self._probing:
+                    return None
+                self._probing = True
+                return True
+            return False
+
+    def record(self, success: bool):
+        with self._lock:
+            if self.state == 'half_open':
+                self._probing = False
+                if success:
+                    self.state = 'closed'
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if (self.state == 'closed' and len(self._outcomes) >= self.min_calls
+                    and failures >= self.failure_ratio * len(self._outcomes)):
+                self._open()
+
+    def release(self):
+        """Libera la llamada de prueba sin resultado (p. ej. si se canceló)"""
+        with self._lock:
+            if self.state == 'half_open':
+                self._probing = False
+
+    def _open(self):
+        # Llamar con el lock tomado
+        self.state = 'open'
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'state': self.state,
+                'opened': self.opened,
+                'recent_failures': self._outcomes.count(False),
+                'recent_calls': len(self._outcomes),
+            }
+
+
+class Admission:
+    """Un intento que pasó por el circuit breaker: su resultado se anota una sola vez.
+
+    Si el intento termina sin resultado (plazo agotado en el limitador,
+    cancelación...), release() libera la llamada de prueba del half_open;
+    si no, el breaker se quedaría esperándola para siempre.
+    """
+
+    __slots__ = ('breaker', 'probe', 'settled')
+
+    def __init__(self, breaker: CircuitBreaker, probe: bool = False):
+        self.breaker = breaker
+        self.probe = probe
+        self.settled = False
+
+    def settle(self, error: Optional[LLMCallError]):
+        if self.settled:
+            return
+        self.settled = True
+        if error is None:
+            self.breaker.record(True)
+        elif error.kind in ('cancelled', 'rate_limit'):
+            # Un 429 ya lo gestiona el limitador de ritmo; no indica que el proveedor esté caído
+            self._release()
+        else:
+            # Un error de la petición (auth, 400...) no cuenta como fallo del proveedor
+            self.breaker.record(not error.retryable)
+
+    def release(self):
+        if not self.settled:
+            self.settled = True
+            self._release()
+
+    def _release(self):
+        if self.probe:
+            self.breaker.release()
+
+
+class LatencyTracker:
+    """Latencias recientes de las llamadas que salieron bien (para el umbral de hedging)"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class LLMGateway:
+    """Todas las llamadas al backend del LLM pasan por aquí.
+
+    - Plazo por llamada: cada intento tiene como máximo `attempt_timeout`
+      segundos y nunca más de lo que queda del plazo total (`expires`); el
+      cliente no reintenta por su cuenta (max_retries=0).
+    - Reintentos propios solo para fallos del proveedor, con espera
+      exponencial o la que pida Retry-After, siempre dentro del plazo.
+    - CircuitBreaker y TokenBucket antes de cada intento; el breaker cuenta
+      cada intento, así que los reintentos no esconden un proveedor caído.
+    - Hedging (solo asíncrono): si un intento tarda más que el percentil
+      `hedge_percentile` de las latencias recientes, se lanza un segundo en
+      paralelo y gana el primero que responda; como mucho `max_hedge_ratio`
+      de las llamadas y solo si el bucket tiene un token libre.
+    - Streaming (stream_async): mismos controles, pero solo se reintenta
+      hasta que llega el primer fragmento; después, cada fragmento tiene su
+      propio plazo y un corte se propaga al llamador. Sin hedging.
+    """
+
+    def __init__(self, backend, limiter: Optional[TokenBucket] = None,
+                 breaker: Optional[CircuitBreaker] = None, attempt_timeout: float = 20.0,
+                 max_attempts: int = 3, backoff: float = 0.5, hedge_percentile: float = 0.95,
+                 max_hedge_ratio: float = 0.1, latency: Optional[LatencyTracker] = None):
+        self.backend = backend
+        self.limiter = limiter or TokenBucket(rate=50.0, capacity=50.0)
+        self.breaker = breaker or CircuitBreaker()
+        self.attempt_timeout = attempt_timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.hedge_percentile = hedge_percentile
+        self.max_hedge_ratio = max_hedge_ratio
+        self.latency = latency or LatencyTracker()
+        self.counters = {'calls': 0, 'attempts': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0,
+                         'rejected_open': 0, 'failures': 0, 'streams': 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, backend) -> 'LLMGateway':
+        rate = float(os.environ.get('PRO_RATE_LIMIT_RPS', 50))
+        return cls(
+            backend,
+            limiter=TokenBucket(rate=rate, capacity=float(os.environ.get('PRO_RATE_LIMIT_BURST', rate))),
+            breaker=CircuitBreaker(
+                failure_ratio=float(os.environ.get('PRO_BREAKER_FAILURE_RATIO', 0.5)),
+                window=int(os.environ.get('PRO_BREAKER_WINDOW', 20)),
+                min_calls=int(os.environ.get('PRO_BREAKER_MIN_CALLS', 10)),
+                cooldown=float(os.environ.get('PRO_BREAKER_COOLDOWN_SECONDS', 15)),
+            ),
+            attempt_timeout=float(os.environ.get('PRO_ATTEMPT_TIMEOUT_SECONDS', 20)),
+            max_attempts=int(os.environ.get('PRO_MAX_ATTEMPTS', 3)),
+            hedge_percentile=float(os.environ.get('PRO_HEDGE_PERCENTILE', 0.95)),
+            max_hedge_ratio=float(os.environ.get('PRO_HEDGE_MAX_RATIO', 0.1)),
+        )
+
+    @property
+    def name(self) -> str:
+        return getattr(self.backend, 'name', 'llm')
+
+    def _count(self, **changes):
+        with self._lock:
+            for name, delta in changes.items():
+                self.counters[name] += delta
+
+    def _admit(self) -> Admission:
+        """Cada intento (también los reintentos) pasa antes por el circuit breaker.
+
+        Quien admite debe llamar a release() al terminar (en un finally): no
+        hace nada si el intento ya anotó su resultado.
+        """
+        probe = self.breaker.admit()
+        if probe is None:
+            self._count(rejected_open=1)
+            raise LLMCallError('circuit_open', 'Circuito abierto: el proveedor del LLM está fallando')
+        return Admission(self.breaker, probe)
+
+    def _backoff(self, error: LLMCallError, attempt: int, expires: float) -> Optional[float]:
+        """Espera antes del siguiente intento, o None si no hay otro intento"""
+        if not error.retryable or attempt + 1 >= self.max_attempts:
+            return None
+        wait = error.retry_after if error.retry_after is not None else self.backoff * (2 ** attempt)
+        # Al menos un intento corto tiene que caber en el plazo
+        if time.monotonic() + wait + 0.05 >= expires:
+            return None
+        return wait
+
+    def _attempt_timeout(self, expires: float) -> float:
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            raise LLMCallError('deadline', 'Plazo agotado')
+        return min(self.attempt_timeout, remaining)
+
+    def _observe(self, headers: Dict[str, str], error: Optional[LLMCallError] = None):
+        if error is not None and error.kind == 'rate_limit':
+            self.limiter.observe(headers, rate_limited=True, retry_after=error.retry_after)
+        elif headers:
+            self.limiter.observe(headers)
+
+    # ------------------------------------------------------------------
+    # Asíncrono
+    # ------------------------------------------------------------------
+
+    async def complete_async(self, kwargs: Dict, expires: float):
+        """Respuesta de chat.completions dentro del plazo `expires` (time.monotonic) o LLMCallError"""
+        self._count(calls=1)
+        try:
+            for attempt in range(self.max_attempts):
+                admission = self._admit()
+                try:
+                    if not await self.limiter.acquire(expires):
+                        raise LLMCallError('deadline', 'Plazo agotado esperando al limitador de ritmo')
+                    return await self._hedged(kwargs, expires, admission)
+                except LLMCallError as e:
+                    wait = self._backoff(e, attempt, expires)
+                    if wait is None:
+                        raise
+                finally:
+                    admission.release()
+                self._count(retries=1)
+                await asyncio.sleep(wait)
+        except LLMCallError as e:
+            if e.retryable:
+                self._count(failures=1)
+            raise
+
+    async def _attempt_async(self, kwargs: Dict, expires: float, admission: Admission):
+        timeout = self._attempt_timeout(expires)
+        headers: Dict[str, str] = {}
+        started = time.monotonic()
+        self._count(attempts=1)
+        try:
+            response = await asyncio.wait_for(
+                self.backend.complete_async(kwargs, timeout=timeout, max_retries=0, headers=headers),
+                timeout=timeout,
+            )
+        except asyncio.CancelledError:
+            # Perdió contra su hedge (o se canceló la petición): no dice nada del proveedor
+            admission.settle(LLMCallError('cancelled'))
+            raise
+        except Exception as e:
+            error = classify(e)
+            admission.settle(error)
+            self._observe(_headers(e) or headers, error)
+            raise error from e
+        admission.settle(None)
+        self.latency.add(time.monotonic() - started)
+        self._observe(headers)
+        return response
+
+    def _hedge_delay(self, expires: float) -> Optional[float]:
+        # Sin hedges mientras el circuito no esté cerrado: duplicarían carga sobre un proveedor con problemas
+        if not self.hedge_percentile or self.breaker.state != 'closed':
+            return None
+        with self._lock:
+            if self.counters['hedges'] >= self.max_hedge_ratio * max(1, self.counters['calls']):
+                return None
+        delay = self.latency.percentile(self.hedge_percentile)
+        if delay is None or time.monotonic() + delay >= expires:
+            return None
+        return delay
+
+    async def _hedged(self, kwargs: Dict, expires: float, admission: Admission):
+        primary = asyncio.ensure_future(self._attempt_async(kwargs, expires, admission))
+        tasks = [primary]
+        try:
+            delay = self._hedge_delay(expires)
+            if delay is None:
+                return await primary
+
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self.limiter.try_acquire():
+                return await primary
+
+            self._count(hedges=1)
+            # El hedge solo sale con el circuito cerrado: no es la llamada de prueba
+            hedge = asyncio.ensure_future(self._attempt_async(kwargs, expires, Admission(self.breaker)))
+            tasks.append(hedge)
+            pending = {primary, hedge}
+            first_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self._count(hedge_wins=1)
+                        return task.result()
+                    first_error = first_error or task.exception()
+            raise first_error
+        finally:
+            # También si se cancela la petición: ningún intento sigue en vuelo tras salir de aquí
+            unfinished = [task for task in tasks if not task.done()]
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                await asyncio.gather(*unfinished, return_exceptions=True)
+
+    async def stream_async(self, kwargs: Dict, expires: float, usage: Optional[Dict[str, int]] = None):
+        """Fragmentos de texto de la respuesta según llegan (generador asíncrono) o LLMCallError.
+
+        `usage` recibe los tokens de la llamada cuando el backend los envía al final.
+        """
+        self._count(calls=1, streams=1)
+        try:
+            chunks, first = await self._open_stream(kwargs, expires, usage)
+        except LLMCallError as e:
+            if e.retryable:
+                self._count(failures=1)
+            raise
+
+        try:
+            if first is None:
+                return
+            yield first
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=self._attempt_timeout(expires))
+                except StopAsyncIteration:
+                    return
+                except LLMCallError:
+                    self._count(failures=1)
+                    raise
+                except Exception as e:
+                    # Corte a mitad de respuesta: ya no se puede reintentar sin repetir lo enviado
+                    self._count(failures=1)
+                    raise classify(e) from e
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    async def _open_stream(self, kwargs: Dict, expires: float, usage: Optional[Dict[str, int]]):
+        """(fragmentos, primer fragmento o None): intentos y reintentos como complete_async hasta el primero"""
+        for attempt in range(self.max_attempts):
+            admission = self._admit()
+            try:
+                if not await self.limiter.acquire(expires):
+                    raise LLMCallError('deadline', 'Plazo agotado esperando al limitador de ritmo')
+                timeout = self._attempt_timeout(expires)
+                headers: Dict[str, str] = {}
+                self._count(attempts=1)
+                chunks = self.backend.stream_async(kwargs, timeout=timeout, headers=headers, usage=usage)
+                try:
+                    first = await asyncio.wait_for(chunks.__anext__(), timeout=timeout)
+                except StopAsyncIteration:
+                    first = None
+                except asyncio.CancelledError:
+                    admission.settle(LLMCallError('cancelled'))
+                    await chunks.aclose()
+                    raise
+                except Exception as e:
+                    await chunks.aclose()
+                    error = classify(e)
+                    admission.settle(error)
+                    self._observe(_headers(e) or headers, error)
+                    wait = self._backoff(error, attempt, expires)
+                    if wait is None:
+                        raise error from e
+                else:
+                    # El primer fragmento ya dice que el proveedor responde
+                    admission.settle(None)
+                    self._observe(headers)
+                    return chunks, first
+            finally:
+                admission.release()
+            self._count(retries=1)
+            await asyncio.sleep(wait)
+        raise LLMCallError('deadline', 'Sin intentos disponibles')
+
+    # ------------------------------------------------------------------
+    # Síncrono (sin hedging: un solo hilo por llamada)
+    # ------------------------------------------------------------------
+
+    def complete(self, kwargs: Dict, expires: float):
+        self._count(calls=1)
+        try:
+            for attempt in range(self.max_attempts):
+                admission = self._admit()
+                try:
+                    if not self.limiter.acquire_sync(expires):
+                        raise LLMCallError('deadline', 'Plazo agotado esperando al limitador de ritmo')
+                    return self._attempt_sync(kwargs, expires, admission)
+                except LLMCallError as e:
+                    wait = self._backoff(e, attempt, expires)
+                    if wait is None:
+                        raise
+                finally:
+                    admission.release()
+                self._count(retries=1)
+                time.sleep(wait)
+        except LLMCallError as e:
+            if e.retryable:
+                self._count(failures=1)
+            raise
+
+    def _attempt_sync(self, kwargs: Dict, expires: float, admission: Admission):
+        timeout = self._attempt_timeout(expires)
+        headers: Dict[str, str] = {}
+        started = time.monotonic()
+        self._count(attempts=1)
+        try:
+            response = self.backend.complete(kwargs, timeout=timeout, max_retries=0, headers=headers)
+        except Exception as e:
+            error = classify(e)
+            admission.settle(error)
+            self._observe(_headers(e) or headers, error)
+            raise error from e
+        admission.settle(None)
+        self.latency.add(time.monotonic() - started)
+        self._observe(headers)
+        return response
+
+    def stats(self) -> Dict:
+        """Contadores para /api/health"""
+        with self._lock:
+            counters = dict(self.counters)
+        delay = self.latency.percentile(self.hedge_percentile) if self.hedge_percentile else None
+        counters.update({
+            'breaker': self.breaker.stats(),
+            'rate_limiter': self.limiter.stats(),
+            'hedge_after_ms': round(delay * 1000, 1) if delay is not None else None,
+        })
+        return counters
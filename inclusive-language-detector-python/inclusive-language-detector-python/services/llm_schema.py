@@ -0,0 +1,386 @@
+# services/llm_schema.py - ESQUEMA ESTRICTO Y DECODIFICADOR VALIDADO DE LAS RESPUESTAS DEL LLM
+
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+CATEGORIES = ('sexist', 'ableist', 'ethnic', 'offensive')
+SEVERITIES = ('high', 'medium', 'low')
+CATEGORY_SET = frozenset(CATEGORIES)
+SEVERITY_SET = frozenset(SEVERITIES)
+
+# Severidades del esquema compacto (text/fix/sev/why -> original_text/suggestion/severity/explanation)
+COMPACT_SEVERITIES = {'h': 'high', 'm': 'medium', 'l': 'low'}
+
+# Modelos con salidas estructuradas (response_format json_schema estricto)
+STRUCTURED_MODEL_PREFIXES = ('gpt-4o', 'gpt-4.1', 'gpt-5', 'o1', 'o3', 'o4')
+
+
+def _object(properties: Dict) -> Dict:
+    """Objeto estricto: todas las propiedades obligatorias y ninguna más"""
+    return {
+        'type': 'object',
+        'properties': properties,
+        'required': list(properties),
+        'additionalProperties': False,
+    }
+
+
+ISSUE_SCHEMA = _object({
+    'type': {'type': 'string', 'enum': list(CATEGORIES)},
+    'original_text': {'type': 'string'},
+    'suggestion': {'type': 'string'},
+    'severity': {'type': 'string', 'enum': list(SEVERITIES)},
+    'explanation': {'type': 'string'},
+    'confidence': {'type': 'number'},
+})
+
+COMPACT_ISSUE_SCHEMA = _object({
+    'type': {'type': 'string', 'enum': list(CATEGORIES)},
+    'text': {'type': 'string'},
+    'fix': {'type': 'string'},
+    'sev': {'type': 'string', 'enum': list(COMPACT_SEVERITIES)},
+    'why': {'type': 'string'},
+})
+
+FULL_SCHEMA = _object({
+    'issues': {'type': 'array', 'items': ISSUE_SCHEMA},
+    'stats': _object({
+        'total_words': {'type': 'integer'},
+        'issues_found': {'type': 'integer'},
+        'inclusive_score': {'type': 'integer'},
+        'categories': _object({category: {'type': 'integer'} for category in CATEGORIES}),
+    }),
+    'overall_feedback': {'type': 'string'},
+})
+
+COMPACT_SCHEMA = _object({'issues': {'type': 'array', 'items': COMPACT_ISSUE_SCHEMA}})
+
+ITEM_SCHEMA = _object({
+    'issues': {'type': 'array', 'items': ISSUE_SCHEMA},
+    'overall_feedback': {'type': 'string'},
+})
+
+
+@lru_cache(maxsize=64)
+def _batch_schema(items: int, compact: bool = False) -> Dict:
+    # Claves fijas "0".."n-1": el modo estricto no admite claves libres
+    item = COMPACT_SCHEMA if compact else ITEM_SCHEMA
+    return _object({'results': _object({str(index): item for index in range(items)})})
+
+
+def response_format(shape: str, items: int = 0) -> Dict:
+    """response_format de chat.completions con el esquema estricto de cada tipo de prompt"""
+    if shape in ('batch', 'compact_batch'):
+        schema = _batch_schema(items, shape == 'compact_batch')
+    elif shape == 'compact':
+        schema = COMPACT_SCHEMA
+    else:
+        schema = FULL_SCHEMA
+    return {
+        'type': 'json_schema',
+        'json_schema': {'name': f'inclusive_{shape}', 'strict': True, 'schema': schema},
+    }
+
+
+def structured_outputs_enabled(model: str) -> bool:
+    """PRO_STRUCTURED_OUTPUTS: auto (según el modelo), 1 o 0"""
+    setting = os.environ.get('PRO_STRUCTURED_OUTPUTS', 'auto').strip().lower()
+    if setting in ('1', 'true', 'yes'):
+        return True
+    if setting in ('0', 'false', 'no'):
+        return False
+    return model.startswith(STRUCTURED_MODEL_PREFIXES)
+
+
+class SchemaError(ValueError):
+    """La respuesta no se pudo decodificar ni reparar; `problems` detalla por qué"""
+
+    def __init__(self, message: str, problems: Optional[List[str]] = None):
+        super().__init__(message)
+        self.problems = problems or [message]
+
+
+class Issue:
+    """Issue validado de una respuesta del LLM (esquema completo)"""
+
+    __slots__ = ('type', 'original_text', 'suggestion', 'severity', 'explanation', 'confidence')
+
+    def __init__(self, type: str, original_text: str, suggestion: str = '',
+                 severity: str = 'medium', explanation: str = '', confidence: float = 0.9):
+        self.type = type
+        self.original_text = original_text
+        self.suggestion = suggestion
+        self.severity = severity
+        self.explanation = explanation
+        self.confidence = confidence
+
+    @classmethod
+    def parse(cls, raw, problems: List[str]) -> Optional['Issue']:
+        """Issue desde un objeto JSON (esquema completo o compacto); None y un problema si no es válido"""
+        if not isinstance(raw, dict):
+            problems.append(f'issue no es un objeto: {type(raw).__name__}')
+            return None
+
+        # Camino rápido: el esquema completo con valores ya válidos (lo normal con salidas estructuradas)
+        compact = 'original_text' not in raw
+        original_text = raw.get('text') if compact else raw['original_text']
+        if type(original_text) is not str or not original_text.strip():
+            problems.append('issue sin original_text')
+            return None
+
+        issue_type = raw.get('type')
+        if type(issue_type) is not str or issue_type not in CATEGORY_SET:
+            issue_type = issue_type.strip().lower() if isinstance(issue_type, str) else ''
+            if issue_type not in CATEGORY_SET:
+                problems.append(f'tipo desconocido {issue_type!r}: se usa offensive')
+                issue_type = 'offensive'
+
+        severity = raw.get('sev' if compact else 'severity')
+        if type(severity) is not str or severity not in SEVERITY_SET:
+            severity = severity.strip().lower() if isinstance(severity, str) else ''
+            severity = COMPACT_SEVERITIES.get(severity, severity)
+            if severity not in SEVERITY_SET:
+                severity = 'medium'
+
+        confidence = raw.get('confidence', 0.9)
+        if type(confidence) is not float or not 0.0 <= confidence <= 1.0:
+            if isinstance(confidence, bool) or not isinstance(confidence, (int, float)):
+                confidence = 0.9
+            confidence = min(1.0, max(0.0, float(confidence)))
+
+        suggestion = raw.get('fix' if compact else 'suggestion')
+        explanation = raw.get('why' if compact else 'explanation')
+        return cls(
+            issue_type, original_text.strip(),
+            suggestion if type(suggestion) is str else '',
+            severity,
+            explanation if type(explanation) is str else '',
+            confidence,
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            'type': self.type,
+            'original_text': self.original_text,
+            'suggestion': self.suggestion,
+            'severity': self.severity,
+            'explanation': self.explanation,
+            'confidence': self.confidence,
+        }
+
+
+class Analysis:
+    """Análisis decodificado de un texto: issues validados y lo que se pudo aprovechar del resto"""
+
+    __slots__ = ('issues', 'overall_feedback', 'inclusive_score', 'problems', 'repaired')
+
+    def __init__(self, issues: List[Issue], overall_feedback: Optional[str] = None,
+                 inclusive_score: Optional[int] = None, problems: Optional[List[str]] = None,
+                 repaired: bool = False):
+        self.issues = issues
+        self.overall_feedback = overall_feedback
+        self.inclusive_score = inclusive_score
+        self.problems = problems or []
+        self.repaired = repaired
+
+    @classmethod
+    def from_object(cls, data, repaired: bool = False) -> 'Analysis':
+        if not isinstance(data, dict):
+            raise SchemaError(f'se esperaba un objeto JSON, no {type(data).__name__}')
+
+        problems: List[str] = []
+        raw_issues = data.get('issues', [])
+        if not isinstance(raw_issues, list):
+            problems.append('issues no es una lista')
+            raw_issues = []
+        issues = [issue for issue in (Issue.parse(raw, problems) for raw in raw_issues) if issue is not None]
+
+        feedback = data.get('overall_feedback')
+        stats = data.get('stats')
+        score = stats.get('inclusive_score') if isinstance(stats, dict) else None
+        if isinstance(score, bool) or not isinstance(score, (int, float)) or not 0 <= score <= 100:
+            score = None
+        return cls(
+            issues,
+            feedback if isinstance(feedback, str) and feedback.strip() else None,
+            int(score) if score is not None else None,
+            problems, repaired,
+        )
+
+
+# ----------------------------------------------------------------------
+# Decodificación y reparación
+# ----------------------------------------------------------------------
+
+DECODER = json.JSONDecoder()
+FENCE = re.compile(r'```(?:json)?\s*', re.IGNORECASE)
+TRAILING_COMMA = re.compile(r',\s*([}\]])')
+WHITESPACE = re.compile(r'\s*')
+
+
+def _repair(raw: str):
+    """Objeto JSON tras quitar texto alrededor, bloques markdown y comas finales; None si no basta"""
+    text = FENCE.sub('', raw)
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end <= start:
+        return None
+    text = text[start:end + 1]
+    for candidate in (text, TRAILING_COMMA.sub(r'\1', text)):
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            continue
+    return None
+
+
+def _container(raw: str, key: str, opener: str) -> int:
+    """Posición tras el '[' o '{' que abre el valor de "key", o -1"""
+    match = re.search(r'"%s"\s*:\s*\%s' % (re.escape(key), opener), raw)
+    return match.end() if match else -1
+
+
+def salvage_array(raw: str, key: str) -> Optional[list]:
+    """Elementos completos del array "key" de un JSON cortado (p. ej. por max_tokens)"""
+    index = _container(raw, key, '[')
+    if index == -1:
+        return None
+    items = []
+    while True:
+        index = WHITESPACE.match(raw, index).end()
+        if index >= len(raw) or raw[index] == ']':
+            return items
+        try:
+            value, index = DECODER.raw_decode(raw, index)
+        except ValueError:
+            return items
+        items.append(value)
+        index = WHITESPACE.match(raw, index).end()
+        if raw.startswith(',', index):
+            index += 1
+
+
+def salvage_object(raw: str, key: str) -> Optional[Dict]:
+    """Entradas completas del objeto "key" de un JSON cortado"""
+    index = _container(raw, key, '{')
+    if index == -1:
+        return None
+    entries = {}
+    while True:
+        index = WHITESPACE.match(raw, index).end()
+        if index >= len(raw) or raw[index] == '}':
+            return entries
+        try:
+            name, index = DECODER.raw_decode(raw, index)
+            index = WHITESPACE.match(raw, index).end()
+            if not raw.startswith(':', index):
+                return entries
+            value, index = DECODER.raw_decode(raw, WHITESPACE.match(raw, index + 1).end())
+        except ValueError:
+            return entries
+        entries[str(name)] = value
+        index = WHITESPACE.match(raw, index).end()
+        if raw.startswith(',', index):
+            index += 1
+
+
+def load(raw: str) -> Tuple[object, bool]:
+    """(JSON, reparado): json.loads directo y, si falla, reparación local; SchemaError si no hay forma"""
+    try:
+        return json.loads(raw), False
+    except (TypeError, ValueError):
+        pass
+    if isinstance(raw, str):
+        repaired = _repair(raw)
+        if repaired is not None:
+            return repaired, True
+    raise SchemaError('la respuesta no es JSON válido')
+
+
+def decode_analysis(raw: str) -> Analysis:
+    """Análisis de un texto (prompts 'full' y 'compact') desde el contenido de la respuesta"""
+    try:
+        data, repaired = load(raw)
+    except SchemaError:
+        issues = salvage_array(raw, 'issues') if isinstance(raw, str) else None
+        if not issues:
+            raise
+        data, repaired = {'issues': issues}, True
+    return Analysis.from_object(data, repaired)
+
+
+class IssueStream:
+    """Decodificador incremental del array "issues" de una respuesta que llega en fragmentos.
+
+    `feed` devuelve los issues que se han completado con el nuevo fragmento:
+    solo se intenta decodificar cuando hay un '}' más allá del último issue
+    leído, así que el coste por fragmento es mínimo. `buffer` guarda la
+    respuesta completa para la validación final con decode_analysis.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.problems: List[str] = []
+        self.count = 0
+        self._index = -1
+        self._done = False
+
+    def feed(self, delta: str) -> List[Issue]:
+        self.buffer += delta
+        if self._done:
+            return []
+        raw = self.buffer
+        if self._index == -1:
+            self._index = _container(raw, 'issues', '[')
+            if self._index == -1:
+                return []
+
+        found = []
+        while raw.find('}', self._index) != -1:
+            index = WHITESPACE.match(raw, self._index).end()
+            if raw.startswith(',', index):
+                index = WHITESPACE.match(raw, index + 1).end()
+            if raw.startswith(']', index):
+                self._done = True
+                break
+            try:
+                value, index = DECODER.raw_decode(raw, index)
+            except ValueError:
+                break
+            self._index = index
+            issue = Issue.parse(value, self.problems)
+            if issue is not None:
+                self.count += 1
+                found.append(issue)
+        return found
+
+
+def decode_batch(raw: str) -> Tuple[Dict[str, Analysis], List[str]]:
+    """Análisis por identificador de una respuesta de micro-lote y los problemas encontrados.
+
+    Los elementos ausentes o inválidos no están en el resultado: el llamador
+    los reanaliza uno a uno.
+    """
+    problems: List[str] = []
+    try:
+        data, repaired = load(raw)
+        results = data.get('results') if isinstance(data, dict) else None
+    except SchemaError:
+        results = salvage_object(raw, 'results') if isinstance(raw, str) else None
+        if not results:
+            raise
+        repaired = True
+        problems.append('respuesta de micro-lote cortada: se aprovechan los elementos completos')
+
+    if not isinstance(results, dict):
+        raise SchemaError("respuesta de micro-lote sin 'results'")
+
+    analyses = {}
+    for key, value in results.items():
+        if not isinstance(value, dict) or not isinstance(value.get('issues'), list):
+            problems.append(f'elemento {key} sin issues válidos')
+            continue
+        analyses[str(key)] = Analysis.from_object(value, repaired)
+    return analyses, problems
@@ -0,0 +1,90 @@
+# services/llm_usage.py - CONTABILIDAD DE TOKENS Y LATENCIA POR LLAMADA AL LLM
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+
+class UsageRecorder:
+    """Registra tokens de prompt/respuesta y latencia de cada llamada al LLM.
+
+    Guarda las últimas `history` llamadas en memoria y totales por tipo de
+    prompt ('full', 'compact', 'batch', 'compact_batch'); opcionalmente añade cada registro a
+    un archivo JSONL (PRO_USAGE_LOG) para comparar costes entre versiones.
+    """
+
+    def __init__(self, history: int = 200, log_path: Optional[str] = None):
+        self.calls = deque(maxlen=history)
+        self.log_path = log_path
+        self.totals: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'UsageRecorder':
+        return cls(
+            history=int(os.environ.get('PRO_USAGE_HISTORY', 200)),
+            log_path=os.environ.get('PRO_USAGE_LOG') or None,
+        )
+
+    def record(self, kind: str, response=None, latency_ms: float = 0.0,
+               items: int = 1, ok: bool = True, model: str = '') -> Dict:
+        """Anota una llamada; `response` es la respuesta de chat.completions (o None si falló)"""
+        usage = getattr(response, 'usage', None)
+        entry = {
+            'time': round(time.time(), 3),
+            'kind': kind,
+            'model': model,
+            'items': items,
+            'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+            'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+            'latency_ms': round(latency_ms, 1),
+            'ok': ok,
+        }
+
+        with self._lock:
+            self.calls.append(entry)
+            totals = self.totals.setdefault(kind, {
+                'calls': 0, 'errors': 0, 'items': 0,
+                'prompt_tokens': 0, 'completion_tokens': 0, 'latency_ms': 0.0,
+            })
+            totals['calls'] += 1
+            totals['errors'] += 0 if ok else 1
+            totals['items'] += items
+            totals['prompt_tokens'] += entry['prompt_tokens']
+            totals['completion_tokens'] += entry['completion_tokens']
+            totals['latency_ms'] += entry['latency_ms']
+
+        if self.log_path:
+            try:
+                with open(self.log_path, 'a', encoding='utf-8') as handle:
+                    handle.write(json.dumps(entry) + '\n')
+            except OSError as e:
+                print(f"⚠️ No se pudo escribir el registro de uso: {str(e)}")
+
+        return entry
+
+    def recent(self, limit: int = 20) -> List[Dict]:
+        with self._lock:
+            return list(self.calls)[-limit:]
+
+    def summary(self) -> Dict:
+        """Totales y medias por tipo de prompt"""
+        with self._lock:
+            report = {}
+            for kind, totals in self.totals.items():
+                calls = max(1, totals['calls'])
+                items = max(1, totals['items'])
+                report[kind] = {
+                    'calls': totals['calls'],
+                    'errors': totals['errors'],
+                    'items': totals['items'],
+                    'prompt_tokens': totals['prompt_tokens'],
+                    'completion_tokens': totals['completion_tokens'],
+                    'avg_prompt_tokens_per_item': round(totals['prompt_tokens'] / items, 1),
+                    'avg_completion_tokens_per_item': round(totals['completion_tokens'] / items, 1),
+                    'avg_latency_ms': round(totals['latency_ms'] / calls, 1),
+                }
+            return report
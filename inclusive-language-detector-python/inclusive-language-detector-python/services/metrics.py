@@ -0,0 +1,184 @@
+# services/metrics.py - CONTADORES E HISTOGRAMAS EN FORMATO DE EXPOSICIÓN DE PROMETHEUS
+
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# Límites (segundos) de los histogramas de latencia
+DEFAULT_BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+# Un collector devuelve (nombre, tipo, ayuda, [(etiquetas, valor)]) al exportar
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]
+
+
+def _labels(labels: Dict[str, str]) -> LabelSet:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: LabelSet) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        (key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metrics:
+    """Registro mínimo de métricas (contadores e histogramas) sin dependencias externas.
+
+    Con `enabled` en False las rutas calientes no miden nada: los analizadores
+    consultan el flag una vez por análisis antes de tomar tiempos. Los
+    collectors (cachés, uso del LLM...) se evalúan solo al exportar.
+    """
+
+    def __init__(self, enabled: bool = False, prefix: str = 'inclusive_'):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelSet, float]] = {}
+        self._histograms: Dict[str, Dict[LabelSet, List]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: List[Collector] = []
+
+    @classmethod
+    def from_env(cls) -> 'Metrics':
+        """METRICS_ENABLED=1 activa la instrumentación de las rutas calientes"""
+        return cls(enabled=os.environ.get('METRICS_ENABLED', '').lower() in ('1', 'true', 'yes'))
+
+    def describe(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self._help[name] = help_text
+        self._buckets[name] = buckets
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels(labels)
+        buckets = self._buckets.get(name, DEFAULT_BUCKETS)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [[0] * len(buckets), 0.0, 0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def timer(self, name: str, **labels):
+        """Context manager que observa la duración del bloque (no hace nada si está desactivado)"""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name, labels)
+
+    @contextmanager
+    def _timed(self, name: str, labels: Dict[str, str]):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def add_collector(self, collector: Collector):
+        """Registra una función que aporta métricas calculadas en el momento de exportar"""
+        self._collectors.append(collector)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        """Exporta todo en formato de texto de Prometheus (version 0.0.4)"""
+        lines = [
+            f'# HELP {self.prefix}metrics_enabled Instrumentación de rutas calientes activa (1) o no (0)',
+            f'# TYPE {self.prefix}metrics_enabled gauge',
+            f'{self.prefix}metrics_enabled {int(self.enabled)}',
+        ]
+
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {
+                name: {key: [list(state[0]), state[1], state[2]] for key, state in series.items()}
+                for name, series in self._histograms.items()
+            }
+
+        for name in sorted(counters):
+            full = self.prefix + name
+            lines.append(f'# HELP {full} {self._help.get(name, name)}')
+            lines.append(f'# TYPE {full} counter')
+            for key, value in sorted(counters[name].items()):
+                lines.append(f'{full}{_format_labels(key)} {_format_value(value)}')
+
+        for name in sorted(histograms):
+            full = self.prefix + name
+            buckets = self._buckets.get(name, DEFAULT_BUCKETS)
+            lines.append(f'# HELP {full} {self._help.get(name, name)}')
+            lines.append(f'# TYPE {full} histogram')
+            for key, (counts, total, count) in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, bucket_count in zip(buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(key + (('le', _format_value(bound)),))
+                    lines.append(f'{full}_bucket{labels} {cumulative}')
+                lines.append(f'{full}_bucket{_format_labels(key + (("le", "+Inf"),))} {count}')
+                lines.append(f'{full}_sum{_format_labels(key)} {_format_value(total)}')
+                lines.append(f'{full}_count{_format_labels(key)} {count}')
+
+        for collector in self._collectors:
+            try:
+                collected = list(collector())
+            except Exception as e:
+                print(f"⚠️ Error en un collector de métricas: {str(e)}")
+                continue
+            for name, kind, help_text, samples in collected:
+                full = self.prefix + name
+                lines.append(f'# HELP {full} {help_text}')
+                lines.append(f'# TYPE {full} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{full}{_format_labels(_labels(labels))} {_format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+# Registro del proceso (los analizadores y app.py comparten el mismo)
+METRICS = Metrics.from_env()
+
+METRICS.describe('analyzer_stage_seconds', 'Tiempo por etapa y análisis')
+METRICS.describe('analyzer_words_total', 'Palabras recorridas por el analizador básico')
+METRICS.describe('analyzer_candidates_total', 'Palabras con coincidencia en el léxico')
+METRICS.describe('analyzer_issues_total', 'Issues reportados')
+METRICS.describe('analyzer_memo_hits_total', 'Aciertos de la caché de normalización por análisis')
+METRICS.describe('llm_request_seconds', 'Latencia de las llamadas al LLM')
+METRICS.describe('llm_requests_total', 'Llamadas al LLM por tipo de prompt y resultado')
+METRICS.describe('llm_tokens_total', 'Tokens de prompt y respuesta del LLM')
+METRICS.describe('llm_retries_total', 'Reintentos propios tras una respuesta de micro-lote inválida')
+METRICS.describe('llm_responses_total', 'Respuestas del LLM decodificadas: ok, reparadas, re-preguntadas o fallidas')
+METRICS.describe('pro_fallbacks_total', 'Respuestas pro servidas por el modo básico por motivo del fallo')
+METRICS.describe('stream_first_issue_seconds', 'Tiempo hasta el primer issue en /api/analyze/events por modo')
+METRICS.describe('stream_summary_seconds', 'Tiempo hasta el evento final en /api/analyze/events por modo')
+METRICS.describe('http_request_seconds', 'Latencia de las peticiones HTTP por endpoint')
@@ -0,0 +1,96 @@
+# services/micro_batcher.py - MICRO-LOTES DE PETICIONES PRO EN UNA SOLA LLAMADA AL LLM
+
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class MicroBatcher:
+    """Agrupa peticiones pro concurrentes en una sola llamada a chat.completions.
+
+    La primera petición abre una ventana corta (PRO_BATCH_WINDOW_MS); las que
+    llegan durante ella se empaquetan juntas hasta PRO_BATCH_MAX_ITEMS
+    elementos o PRO_BATCH_MAX_CHARS caracteres. Las instrucciones del prompt
+    se envían una sola vez por lote y la respuesta se reparte a cada llamador.
+
+    Debe usarse desde un único bucle asyncio (ver BackgroundLoop).
+    """
+
+    def __init__(self, analyzer, window: Optional[float] = None,
+                 max_items: Optional[int] = None, max_chars: Optional[int] = None):
+        self.analyzer = analyzer
+        self.window = window if window is not None else float(os.environ.get('PRO_BATCH_WINDOW_MS', 20)) / 1000
+        self.max_items = max_items or int(os.environ.get('PRO_BATCH_MAX_ITEMS', 8))
+        self.max_chars = max_chars or int(os.environ.get('PRO_BATCH_MAX_CHARS', 6000))
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._pending_chars = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.batches = 0
+        self.batched_items = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_items > 1
+
+    async def analyze(self, text: str, deadline: Optional[float] = None) -> Dict:
+        """Analiza un texto, compartiendo llamada al LLM con peticiones simultáneas"""
+        deadline = self.analyzer.deadline if deadline is None else deadline
+        if not self.enabled or len(text) >= self.max_chars:
+            return await self.analyzer.analyze_async(text, deadline)
+
+        # Un texto que no cabe en el lote abierto lo cierra y empieza otro
+        if self._pending and self._pending_chars + len(text) > self.max_chars:
+            self._flush()
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        self._pending_chars += len(text)
+
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+        try:
+            # shield: si este llamador agota su plazo, el lote sigue para los demás
+            return await asyncio.wait_for(asyncio.shield(future), timeout=deadline)
+        except asyncio.TimeoutError:
+            return self.analyzer.timeout_result(deadline, text)
+
+    def stats(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'batches': self.batches,
+            'batched_items': self.batched_items,
+            'window_ms': round(self.window * 1000, 3),
+            'max_items': self.max_items,
+        }
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending, self._pending_chars = self._pending, [], 0
+        if batch:
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in batch]
+        if len(batch) > 1:
+            self.batches += 1
+            self.batched_items += len(batch)
+
+        try:
+            results = await self.analyzer.analyze_many_async(
+                texts, time.monotonic() + self.analyzer.deadline
+            )
+        except Exception as e:
+            results = [self.analyzer.error_result(e) for _ in batch]
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,106 @@
+# services/normalizer.py - NORMALIZACIÓN DE UNA SOLA PASADA (str.translate)
+
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+
+# Separadores que BasicAnalyzer elimina antes de comparar (además de espacios)
+BASIC_SEPARATORS = "-_.,;:'\"`´~!¡¿?()[]{}/\\*+=#&%^<>|"
+
+# Separadores que ProAnalyzer elimina para el texto normalizado del prompt
+PRO_SEPARATORS = "-_.,;:'\"`´~!¡¿?()[]{}/\\|"
+
+# Números usados como letras en evasiones (ProAnalyzer)
+DIGIT_MAP = {
+    '0': 'o', '1': 'i', '3': 'e', '4': 'a',
+    '5': 's', '7': 't', '8': 'b', '9': 'g',
+}
+
+
+def compose_char_map(char_map: Dict[str, str]) -> Dict[str, str]:
+    """Convierte una cadena de str.replace secuenciales en un mapeo de una pasada.
+
+    Con reemplazos secuenciales, un carácter producido por un reemplazo
+    anterior puede volver a reemplazarse más adelante; un carácter ya
+    reemplazado no. El mapeo resultante reproduce ese orden exacto.
+    """
+    composed: Dict[str, str] = {}
+
+    for char, replacement in char_map.items():
+        for source, current in composed.items():
+            if current == char:
+                composed[source] = replacement
+        if char not in composed:
+            composed[char] = replacement
+
+    return composed
+
+
+class _TranslationTable(dict):
+    """Tabla para str.translate que se completa y cachea carácter a carácter"""
+
+    def __init__(self, char_map: Dict[str, str], separators: str):
+        super().__init__()
+        self._char_map = char_map
+        self._separators = frozenset(separators)
+
+    def __missing__(self, codepoint: int) -> Optional[str]:
+        char = chr(codepoint)
+
+        if unicodedata.category(char) == 'Mn' or char.isspace() or char in self._separators:
+            value = None
+        else:
+            value = self._char_map.get(char, char)
+
+        self[codepoint] = value
+        return value
+
+
+class _PieceCache(dict):
+    """Normalización cacheada de cada carácter (ya en minúsculas)"""
+
+    def __init__(self, table: _TranslationTable):
+        super().__init__()
+        self._table = table
+
+    def __missing__(self, char: str) -> str:
+        piece = unicodedata.normalize('NFD', char).translate(self._table)
+        self[char] = piece
+        return piece
+
+
+class TextNormalizer:
+    """Normalizador compartido: minúsculas, NFD y una única traducción.
+
+    Equivale a la secuencia lower → NFD → quitar marcas combinantes → quitar
+    separadores → reemplazos de caracteres, pero sin una copia completa del
+    texto por cada entrada del mapa. El texto ASCII usa la ruta rápida en C de
+    str.translate; el resto se resuelve con una caché por carácter.
+    """
+
+    def __init__(self, char_map: Optional[Dict[str, str]] = None, separators: str = ''):
+        self.table = _TranslationTable(compose_char_map(char_map or {}), separators)
+        self._pieces = _PieceCache(self.table)
+
+    def normalize(self, text: str) -> str:
+        """Normaliza un texto"""
+        if not text:
+            return ""
+
+        lowered = text.lower()
+        if lowered.isascii():
+            return lowered.translate(self.table)
+        return ''.join(map(self._pieces.__getitem__, lowered))
+
+    def normalize_with_offsets(self, text: str) -> Tuple[str, List[int]]:
+        """Normaliza y devuelve, para cada posición normalizada, su posición original"""
+        pieces = []
+        offsets: List[int] = []
+        cache = self._pieces
+
+        for index, char in enumerate(text):
+            piece = cache[char.lower()]
+            if piece:
+                pieces.append(piece)
+                offsets.extend([index] * len(piece))
+
+        return ''.join(pieces), offsets
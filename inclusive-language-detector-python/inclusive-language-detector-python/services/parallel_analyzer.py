@@ -0,0 +1,116 @@
+# services/parallel_analyzer.py - EJECUCIÓN EN PARALELO CON POOL DE PROCESOS
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from .basic_analyzer import AnalysisMemo, BasicAnalyzer
+from .segmentation import CONTEXT_WINDOW, split_into_spans, tail_context
+
+# Analizador de cada proceso del pool (se carga una sola vez en el initializer)
+_worker_analyzer: Optional[BasicAnalyzer] = None
+
+
+def _init_worker(shared: Optional[BasicAnalyzer] = None):
+    """Carga el léxico compilado una vez por proceso (o usa el heredado del padre)"""
+    global _worker_analyzer
+    _worker_analyzer = shared if shared is not None else BasicAnalyzer()
+
+
+def _analyze_batch(texts: List[str]) -> List[Dict]:
+    """Tarea del pool: analiza un lote de textos"""
+    return _worker_analyzer.analyze_batch(texts)
+
+
+def _analyze_chunk(context: str, chunk: str, offset: int) -> Dict:
+    """Tarea del pool: analiza un fragmento de documento (issues + total de palabras).
+
+    `context` es el texto inmediatamente anterior al fragmento y `offset` la
+    posición del fragmento dentro del documento completo.
+    """
+    issues, total_words = _worker_analyzer._scan(
+        context + chunk, AnalysisMemo(), start=len(context), offset=offset - len(context)
+    )
+    return {'issues': issues, 'total_words': total_words}
+
+
+class ParallelAnalyzer:
+    """Reparte documentos (o fragmentos de un documento largo) en un pool de procesos"""
+
+    def __init__(self, processes: Optional[int] = None, batch_size: int = 64,
+                 chunk_chars: int = 20000, analyzer: Optional[BasicAnalyzer] = None):
+        self.processes = processes or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.chunk_chars = chunk_chars
+
+        # Con fork los procesos heredan el analizador del padre: el léxico
+        # compacto (arrays y pools de cadenas) se comparte copy-on-write en
+        # lugar de cargarse una vez por proceso. Con spawn cada uno lo carga.
+        shared = None
+        if multiprocessing.get_start_method() == 'fork':
+            shared = analyzer = analyzer or BasicAnalyzer()
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.processes, initializer=_init_worker, initargs=(shared,)
+        )
+
+        # Para fusionar resultados de fragmentos en el proceso principal
+        self.merger = analyzer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Libera los procesos del pool"""
+        self.executor.shutdown(wait=True)
+
+    def _batches(self, texts: Iterable[str]) -> Iterator[List[str]]:
+        batch = []
+        for text in texts:
+            batch.append(text)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def analyze_many(self, texts: Iterable[str]) -> Iterator[Dict]:
+        """Analiza muchos textos en paralelo y devuelve los resultados en el mismo orden.
+
+        Mantiene un número acotado de lotes en vuelo, de modo que puede
+        consumir iterables de millones de textos sin cargarlos en memoria.
+        """
+        in_flight = deque()
+        max_in_flight = self.processes * 2
+
+        for batch in self._batches(texts):
+            in_flight.append(self.executor.submit(_analyze_batch, batch))
+            if len(in_flight) >= max_in_flight:
+                yield from in_flight.popleft().result()
+
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+    def analyze_document(self, text: str) -> Dict:
+        """Analiza un documento largo por fragmentos y fusiona el resultado"""
+        if not text or not text.strip():
+            return {'error': 'El texto no puede estar vacío'}
+
+        spans = split_into_spans(text, self.chunk_chars)
+        contexts = [tail_context(text[max(0, start - 2 * CONTEXT_WINDOW):start], CONTEXT_WINDOW)
+                    for start, _ in spans]
+        chunks = [text[start:end] for start, end in spans]
+        offsets = [start for start, _ in spans]
+        partials = list(self.executor.map(_analyze_chunk, contexts, chunks, offsets))
+
+        # Fusión determinista: issues en orden de fragmento, estadísticas recalculadas
+        issues = [issue for partial in partials for issue in partial['issues']]
+        total_words = sum(partial['total_words'] for partial in partials)
+
+        if self.merger is None:
+            self.merger = BasicAnalyzer()
+        return self.merger.build_result(text, issues, total_words)
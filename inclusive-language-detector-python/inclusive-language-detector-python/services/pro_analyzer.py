@@ -1,62 +1,95 @@
 import os
-import re
 import json
-import unicodedata
+import asyncio
+import time
+from types import SimpleNamespace
 
-try:
-    from openai import OpenAI
-except ImportError:
-    OpenAI = None
+from .llm_backends import backend_from_env
+from .llm_gateway import LLMCallError, LLMGateway, classify
+from .llm_schema import (
+    CATEGORIES, Analysis, IssueStream, SchemaError, decode_analysis, decode_batch, response_format,
+    structured_outputs_enabled
+)
+from .llm_usage import UsageRecorder
+from .metrics import METRICS
+from .normalizer import DIGIT_MAP, PRO_SEPARATORS, TextNormalizer
+from .streaming import result_events, summary_event
+
+ANALYSIS_PRINCIPLES = """**TU MISIÓN**: Analizar el CONTEXTO y la INTENCIÓN, no solo las palabras superficiales.
+
+**PRINCIPIOS DE ANÁLISIS CONTEXTUAL:**
+
+1. **INTENCIÓN vs. FORMA**: 
+   - "Mi amigo es negro" (descriptivo) ≠ "trabaja como negro" (ofensivo)
+   - Analiza si el término se usa para DESCRIBIR o para DEGRADAR
+
+2. **EVASIÓN DETECTADA**:
+   Identifica intentos de ocultar lenguaje ofensivo:
+   - Números: "p3nd3j0", "n3gr0", "m4r1c0n" "m4ld1 t 4"
+   - Espacios: "p e n d e j o", "l o c a"
+   - Símbolos: "p@ndejo", "n€gro" 
+
+3. **CATEGORÍAS**:
+   - **SEXISMO**: Insultos de género, masculino genérico, estereotipos
+   - **CAPACITISMO**: Términos sobre salud mental o discapacidad como insultos
+   - **RACISMO**: Términos raciales peyorativos, estereotipos étnicos
+   - **OFENSIVO**: Insultos, clasismo, body shaming, homofobia"""
+
+SYSTEM_PROMPT = "Eres un lingüista experto en análisis contextual de lenguaje inclusivo. Analizas el SIGNIFICADO y el CONTEXTO. Tu objetivo es educar y sugerir alternativas. Siempre devuelves respuestas en formato JSON válido."
+
+COMPACT_SYSTEM_PROMPT = "Lingüista experto en lenguaje inclusivo en español. Respondes solo JSON válido."
+
+REPAIR_SYSTEM_PROMPT = "Corriges respuestas JSON mal formadas. Devuelves solo el JSON corregido, sin cambiar su contenido."
+
+# Formato esperado por tipo de prompt (para la re-pregunta de reparación)
+RESPONSE_SHAPES = {
+    'full': '{"issues":[{"type":"sexist|ableist|ethnic|offensive","original_text":"...","suggestion":"...",'
+            '"severity":"high|medium|low","explanation":"...","confidence":0.9}],"overall_feedback":"..."}',
+    'compact': '{"issues":[{"type":"sexist|ableist|ethnic|offensive","text":"...","fix":"...","sev":"h|m|l","why":"..."}]}',
+}
 
 
 class ProAnalyzer:
     """Analizador avanzado con IA de OpenAI"""
     
-    def __init__(self):
-        # Configurar API de OpenAI desde variable de entorno
+    def __init__(self, candidate_finder=None, backend=None, fallback=None):
+        # Configurar API de OpenAI desde variable de entorno; OPENAI_BASE_URL
+        # apunta a un servidor compatible (p. ej. benchmarks/llm_stub.py)
         self.api_key = os.environ.get('OPENAI_API_KEY', '')
+        self.base_url = os.environ.get('OPENAI_BASE_URL') or None
         
-        if not self.api_key or len(self.api_key) < 20:
-            print("⚠️ Warning: OPENAI_API_KEY no configurada")
-            self.client = None
-        elif OpenAI is None:
-            print("⚠️ Warning: openai package no disponible")
-            self.client = None
-        else:
-            try:
-                # Inicializar con timeout más largo para Vercel
-                self.client = OpenAI(
-                    api_key=self.api_key,
-                    timeout=60.0,
-                    max_retries=2
-                )
-            except Exception as e:
-                print(f"⚠️ Error inicializando OpenAI: {str(e)}")
-                self.client = None
+        # backend: objeto con complete(kwargs) y complete_async(kwargs, timeout, max_retries)
+        # (ver services/llm_backends.py); por defecto, el de PRO_BACKEND
+        self.backend = backend if backend is not None else backend_from_env(self.api_key, self.base_url)
+        # Límite de ritmo, circuit breaker, reintentos y hedging (ver services/llm_gateway.py)
+        self.gateway = LLMGateway.from_env(self.backend) if self.backend else None
+        # fallback(texto) -> resultado del modo básico cuando el proveedor falla o el circuito está abierto
+        self.fallback = fallback
+        
+        # Límite de llamadas simultáneas al LLM y plazo máximo por petición
+        self.max_concurrency = int(os.environ.get('PRO_MAX_CONCURRENCY', 32))
+        self.deadline = float(os.environ.get('PRO_DEADLINE_SECONDS', 45))
+        self._semaphore = None
+        self._semaphore_loop = None
+        
+        # Prompt 'full' (texto + normalizado + instrucciones completas) o 'compact'
+        # (solo fragmentos candidatos con contexto y esquema de issue mínimo)
+        self.prompt_mode = os.environ.get('PRO_PROMPT_MODE', 'full')
+        self.compact_window = int(os.environ.get('PRO_COMPACT_WINDOW', 60))
+        self.compact_max_tokens = int(os.environ.get('PRO_COMPACT_MAX_TOKENS', 800))
+        # candidate_finder(texto) -> [(inicio, fin)] de términos candidatos (p. ej. del modo básico)
+        self.candidate_finder = candidate_finder
+        self.usage = UsageRecorder.from_env()
         
         self.model = os.environ.get('OPENAI_MODEL', 'gpt-3.5-turbo')
+        # Esquema JSON estricto en response_format si el modelo lo admite (PRO_STRUCTURED_OUTPUTS)
+        self.structured_outputs = structured_outputs_enabled(self.model)
+        self.normalizer = TextNormalizer(DIGIT_MAP, PRO_SEPARATORS)
     
     def normalize_text(self, text):
         """Normaliza texto para detectar evasiones"""
-        normalized = text.lower()
-        
-        # Normalizar caracteres especiales
-        normalized = unicodedata.normalize('NFD', normalized)
-        normalized = ''.join(c for c in normalized if unicodedata.category(c) != 'Mn')
-        
-        # Remover separadores
-        normalized = re.sub(r'[\s\-_\.\,\;\:\'\"\`\´\~\!\¡\¿\?\(\)\[\]\{\}\/\\\|]', '', normalized)
-        
-        # Reemplazar números por letras
-        replacements = {
-            '0': 'o', '1': 'i', '3': 'e', '4': 'a',
-            '5': 's', '7': 't', '8': 'b', '9': 'g'
-        }
-        
-        for num, letter in replacements.items():
-            normalized = normalized.replace(num, letter)
-        
-        return normalized
+        # Minúsculas + NFD + separadores y números→letras en una sola traducción
+        return self.normalizer.normalize(text)
     
     def build_prompt(self, text, normalized_text):
         """Construye el prompt para la IA"""
@@ -64,25 +97,7 @@ class ProAnalyzer:
         
         prompt = f"""Eres un experto lingüista especializado en análisis de lenguaje inclusivo.
 
-**TU MISIÓN**: Analizar el CONTEXTO y la INTENCIÓN, no solo las palabras superficiales.
-
-**PRINCIPIOS DE ANÁLISIS CONTEXTUAL:**
-
-1. **INTENCIÓN vs. FORMA**: 
-   - "Mi amigo es negro" (descriptivo) ≠ "trabaja como negro" (ofensivo)
-   - Analiza si el término se usa para DESCRIBIR o para DEGRADAR
-
-2. **EVASIÓN DETECTADA**:
-   Identifica intentos de ocultar lenguaje ofensivo:
-   - Números: "p3nd3j0", "n3gr0", "m4r1c0n" "m4ld1 t 4"
-   - Espacios: "p e n d e j o", "l o c a"
-   - Símbolos: "p@ndejo", "n€gro" 
-
-3. **CATEGORÍAS**:
-   - **SEXISMO**: Insultos de género, masculino genérico, estereotipos
-   - **CAPACITISMO**: Términos sobre salud mental o discapacidad como insultos
-   - **RACISMO**: Términos raciales peyorativos, estereotipos étnicos
-   - **OFENSIVO**: Insultos, clasismo, body shaming, homofobia
+{ANALYSIS_PRINCIPLES}
 
 **TEXTO A ANALIZAR:**
 "{text}" 
@@ -134,130 +149,568 @@ ANALIZA CON INTELIGENCIA CONTEXTUAL."""
     
     def analyze(self, text):
         """Analiza texto usando IA de OpenAI"""
-        if not self.client:
+        if not self.backend:
             return {
                 'error': '⚠️ API Key de OpenAI no configurada. Configura OPENAI_API_KEY en variables de entorno.'
             }
         
+        with METRICS.timer('analyzer_stage_seconds', analyzer='pro', stage='prompt'):
+            kwargs = self.completion_kwargs(text)
+        expires = time.monotonic() + self.deadline
+        started = time.perf_counter()
         try:
-            normalized = self.normalize_text(text)
-            prompt = self.build_prompt(text, normalized)
-            
             # Llamar a OpenAI
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Eres un lingüista experto en análisis contextual de lenguaje inclusivo. Analizas el SIGNIFICADO y el CONTEXTO. Tu objetivo es educar y sugerir alternativas. Siempre devuelves respuestas en formato JSON válido."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.5,
-                max_tokens=3000,
-                response_format={"type": "json_object"}
-            )
-            
+            response = self.gateway.complete(kwargs, expires)
+        except LLMCallError as e:
+            self.record_usage(self.prompt_mode, None, started, ok=False)
+            return self.failure_result(text, e)
+        
+        try:
+            self.record_usage(self.prompt_mode, response, started)
             ai_response = response.choices[0].message.content
-            
-            # Parsear respuesta JSON
+            with METRICS.timer('analyzer_stage_seconds', analyzer='pro', stage='parse'):
+                return self.process_response(text, ai_response)
+        except SchemaError as e:
+            if not ai_response:
+                return self.invalid_result(ai_response)
+            failed = e
+        except Exception as e:
+            return self.error_result(e)
+        
+        # Re-pregunta dirigida: solo la respuesta rota, no el análisis completo
+        started = time.perf_counter()
+        try:
+            response = self.gateway.complete(self.repair_kwargs(ai_response, failed), expires)
+        except LLMCallError as e:
+            self.record_usage('repair', None, started, ok=False)
+            return self.failure_result(text, e)
+        self.record_usage('repair', response, started)
+        return self.repaired_result(text, ai_response, response.choices[0].message.content)
+    
+    async def analyze_async(self, text, deadline=None):
+        """Igual que analyze, pero con el cliente asíncrono.
+        
+        Respeta el límite de llamadas simultáneas (PRO_MAX_CONCURRENCY) y un
+        plazo total por petición (PRO_DEADLINE_SECONDS) que incluye la espera
+        en cola: si se agota, responde el modo básico (o un error) en lugar de
+        seguir esperando.
+        """
+        if not self.backend:
+            return {
+                'error': '⚠️ API Key de OpenAI no configurada. Configura OPENAI_API_KEY en variables de entorno.'
+            }
+        
+        deadline = self.deadline if deadline is None else deadline
+        expires = time.monotonic() + deadline
+        
+        try:
+            with METRICS.timer('analyzer_stage_seconds', analyzer='pro', stage='prompt'):
+                kwargs = self.completion_kwargs(text)
+            ai_response = await self.complete_async(kwargs, expires, self.prompt_mode)
             try:
-                # Limpiar respuesta
-                clean_response = ai_response.strip()
-                clean_response = re.sub(r'```json\n?', '', clean_response)
-                clean_response = re.sub(r'```\n?', '', clean_response)
-                clean_response = clean_response.strip()
-                
-                analysis = json.loads(clean_response)
-            except json.JSONDecodeError as e:
-                print(f"❌ Error parseando JSON: {ai_response}")
-                return {
-                    'error': 'Error al procesar respuesta de IA. Intenta con modo básico.'
-                }
-            
-            # Validar y corregir estructura de análisis
-            if 'issues' not in analysis:
-                analysis['issues'] = []
-            
-            if 'stats' not in analysis:
-                analysis['stats'] = {
-                    'total_words': len(text.split()),
-                    'issues_found': len(analysis.get('issues', [])),
-                    'inclusive_score': 100,
-                    'categories': {
-                        'sexist': 0,
-                        'ableist': 0,
-                        'ethnic': 0,
-                        'offensive': 0
-                    }
-                }
-            
-            # Actualizar contadores de categorías
-            if 'categories' in analysis['stats']:
-                for issue in analysis['issues']:
-                    issue_type = issue.get('type', 'offensive')
-                    if issue_type in analysis['stats']['categories']:
-                        analysis['stats']['categories'][issue_type] += 1
-            
-            # Actualizar issues_found
-            analysis['stats']['issues_found'] = len(analysis['issues'])
-            
-            # Calcular inclusive_score si no está presente
-            if analysis['stats']['inclusive_score'] == 100 and analysis['stats']['issues_found'] > 0:
-                total_words = analysis['stats']['total_words']
-                issues_found = analysis['stats']['issues_found']
-                severity_weight = {'high': 3, 'medium': 2, 'low': 1}
-                weighted_issues = sum(
-                    severity_weight.get(issue.get('severity', 'medium'), 2) 
-                    for issue in analysis['issues']
-                )
-                analysis['stats']['inclusive_score'] = max(
-                    0, 
-                    round(100 - (weighted_issues / max(1, total_words)) * 100)
-                )
-            
-            # Construir resultado
-            result = {
-                'original_text': text,
-                'issues': analysis['issues'],
-                'suggestions': [
-                    {
-                        'original': issue.get('original_text', ''),
-                        'replacement': issue.get('suggestion', ''),
-                        'reason': issue.get('explanation', 'Sin explicación')
-                    }
-                    for issue in analysis['issues']
-                ],
-                'stats': analysis['stats'],
-                'overall_feedback': analysis.get(
-                    'overall_feedback', 
-                    '✅ Análisis completado.' if len(analysis['issues']) == 0 
-                    else f'⚠️ Detecté {len(analysis["issues"])} término(s) que podrían mejorarse.'
-                )
+                with METRICS.timer('analyzer_stage_seconds', analyzer='pro', stage='parse'):
+                    return self.process_response(text, ai_response)
+            except SchemaError as e:
+                if not ai_response:
+                    return self.invalid_result(ai_response)
+                repaired = await self.complete_async(self.repair_kwargs(ai_response, e), expires, 'repair')
+                return self.repaired_result(text, ai_response, repaired)
+        
+        except asyncio.TimeoutError:
+            return self.timeout_result(deadline, text)
+        except LLMCallError as e:
+            return self.failure_result(text, e)
+        except Exception as e:
+            return self.error_result(e)
+    
+    async def analyze_stream_async(self, text, deadline=None):
+        """Igual que analyze_async, pero emite cada issue en cuanto el LLM termina de escribirlo.
+        
+        Genera eventos {'event': 'issue', 'issue': {...}} mientras llega la
+        respuesta y un evento 'summary' final con stats y overall_feedback (ver
+        services/streaming.py). Si la llamada falla antes del primer issue,
+        responde el modo básico como analyze_async; si falla después, emite un
+        evento 'error'.
+        """
+        if not self.backend:
+            yield {
+                'event': 'error',
+                'error': '⚠️ API Key de OpenAI no configurada. Configura OPENAI_API_KEY en variables de entorno.'
             }
-            
-            return result
-            
+            return
+        
+        deadline = self.deadline if deadline is None else deadline
+        expires = time.monotonic() + deadline
+        with METRICS.timer('analyzer_stage_seconds', analyzer='pro', stage='prompt'):
+            kwargs = self.completion_kwargs(text)
+        
+        semaphore = self._llm_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=max(0.0, expires - time.monotonic()))
+        except asyncio.TimeoutError:
+            for event in result_events(self.timeout_result(deadline, text)):
+                yield event
+            return
+        
+        decoder = IssueStream()
+        streamed = []
+        usage = {}
+        failed = None
+        started = time.perf_counter()
+        stream = self.gateway.stream_async(kwargs, expires, usage)
+        try:
+            async for chunk in stream:
+                for issue in decoder.feed(chunk):
+                    streamed.append(issue)
+                    yield {'event': 'issue', 'issue': issue.to_dict()}
+        except LLMCallError as e:
+            failed = e
         except Exception as e:
-            error_msg = str(e)
-            
-            if 'authentication' in error_msg.lower() or '401' in error_msg:
-                return {
-                    'error': '❌ API Key inválida. Verifica tu configuración de OPENAI_API_KEY.'
-                }
-            elif 'rate' in error_msg.lower() or '429' in error_msg:
-                return {
-                    'error': 'Límite de solicitudes alcanzado. Prueba el modo básico o espera un momento.'
-                }
-            elif '500' in error_msg or '503' in error_msg:
-                return {
-                    'error': '🔧 OpenAI está experimentando problemas. Intenta de nuevo en unos segundos.'
+            failed = classify(e)
+        finally:
+            await stream.aclose()
+            semaphore.release()
+        
+        if failed is not None:
+            self.record_usage(self.prompt_mode, None, started, ok=False)
+            if not streamed:
+                for event in result_events(self.failure_result(text, failed)):
+                    yield event
+            else:
+                yield {'event': 'error', 'error': self.error_result(failed)['error']}
+            return
+        
+        self.record_usage(self.prompt_mode, SimpleNamespace(usage=SimpleNamespace(**usage)), started)
+        try:
+            with METRICS.timer('analyzer_stage_seconds', analyzer='pro', stage='parse'):
+                result = self.process_response(text, decoder.buffer)
+        except SchemaError as e:
+            if streamed:
+                # Lo ya enviado son issues completos y validados: se mantienen
+                result = self.build_result(text, Analysis(streamed, repaired=True))
+            elif not decoder.buffer:
+                result = self.invalid_result(decoder.buffer)
+            else:
+                try:
+                    repaired = await self.complete_async(self.repair_kwargs(decoder.buffer, e), expires, 'repair')
+                    result = self.repaired_result(text, decoder.buffer, repaired)
+                except asyncio.TimeoutError:
+                    result = self.timeout_result(deadline, text)
+                except LLMCallError as e:
+                    result = self.failure_result(text, e)
+                for event in result_events(result):
+                    yield event
+                return
+        
+        if 'error' in result:
+            yield {'event': 'error', 'error': result['error']}
+        else:
+            yield summary_event(result, [issue.to_dict() for issue in streamed])
+    
+    async def analyze_many_async(self, texts, expires):
+        """Analiza varios textos en una sola llamada al LLM (micro-lote).
+        
+        La respuesta trae un resultado por identificador de elemento; los
+        elementos que falten o no tengan la forma esperada se reanalizan con
+        una llamada individual cada uno.
+        """
+        if len(texts) == 1:
+            return [await self.analyze_async(texts[0], max(0.0, expires - time.monotonic()))]
+        
+        analyses = {}
+        try:
+            ai_response = await self.complete_async(
+                self.batch_completion_kwargs(texts), expires, self.batch_kind(), len(texts)
+            )
+            with METRICS.timer('analyzer_stage_seconds', analyzer='pro', stage='parse'):
+                analyses, problems = decode_batch(ai_response)
+            self.count_response('repaired' if problems else 'ok')
+            if problems:
+                print(f"⚠️ Respuesta de micro-lote incompleta ({'; '.join(problems[:3])}): se reanalizan los elementos afectados")
+        except SchemaError as e:
+            self.count_response('reask')
+            print(f"⚠️ Respuesta de micro-lote inválida ({str(e)}): se analiza por elemento")
+        except asyncio.TimeoutError:
+            return [self.timeout_result(self.deadline, text) for text in texts]
+        except LLMCallError as e:
+            return [self.failure_result(text, e) for text in texts]
+        except Exception as e:
+            error = self.error_result(e)
+            return [dict(error) for _ in texts]
+        
+        results = [None] * len(texts)
+        fallback = []
+        for index, text in enumerate(texts):
+            analysis = analyses.get(str(index))
+            if analysis is not None:
+                results[index] = self.build_result(text, analysis)
+            else:
+                fallback.append(index)
+        
+        if fallback:
+            if METRICS.enabled:
+                METRICS.inc('llm_retries_total', len(fallback), kind=self.batch_kind())
+            remaining = max(0.0, expires - time.monotonic())
+            retried = await asyncio.gather(*(self.analyze_async(texts[index], remaining) for index in fallback))
+            for index, result in zip(fallback, retried):
+                results[index] = result
+        
+        return results
+    
+    def _llm_semaphore(self):
+        """Semáforo de llamadas simultáneas del bucle actual (se recrea si el bucle cambia)"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+    
+    async def complete_async(self, kwargs, expires, kind='full', items=1):
+        """Llamada asíncrona a chat.completions limitada por el semáforo y el plazo `expires`"""
+        semaphore = self._llm_semaphore()
+        
+        async def call():
+            async with semaphore:
+                # El gateway reparte lo que queda del plazo entre intentos y hedges
+                started = time.perf_counter()
+                try:
+                    response = await self.gateway.complete_async(kwargs, expires)
+                except BaseException:
+                    self.record_usage(kind, None, started, items, ok=False)
+                    raise
+                self.record_usage(kind, response, started, items)
+                return response.choices[0].message.content
+        
+        return await asyncio.wait_for(call(), timeout=max(0.0, expires - time.monotonic()))
+    
+    def record_usage(self, kind, response, started, items=1, ok=True):
+        """Anota tokens y latencia de una llamada (ver UsageRecorder y METRICS)"""
+        entry = self.usage.record(
+            kind, response, (time.perf_counter() - started) * 1000,
+            items=items, ok=ok, model=self.model
+        )
+        if METRICS.enabled:
+            seconds = entry['latency_ms'] / 1000
+            METRICS.observe('llm_request_seconds', seconds, kind=kind)
+            METRICS.observe('analyzer_stage_seconds', seconds, analyzer='pro', stage='llm')
+            METRICS.inc('llm_requests_total', kind=kind, outcome='ok' if ok else 'error')
+            METRICS.inc('llm_tokens_total', entry['prompt_tokens'], kind=kind, type='prompt')
+            METRICS.inc('llm_tokens_total', entry['completion_tokens'], kind=kind, type='completion')
+    
+    def timeout_result(self, deadline, text=None):
+        """Resultado cuando se agota el plazo de la petición (el del modo básico si hay texto y fallback)"""
+        error = LLMCallError(
+            'deadline',
+            f'⏱️ El análisis con IA superó el tiempo máximo ({deadline:g}s). Intenta de nuevo o usa el modo básico.'
+        )
+        if text is not None:
+            return self.failure_result(text, error)
+        return {'error': str(error)}
+    
+    def failure_result(self, text, error):
+        """Si el fallo es del proveedor (o del circuito/plazo), responde el modo básico marcado como tal"""
+        if self.fallback is None or not error.provider_failure:
+            return self.error_result(error)
+        
+        reason = self.error_result(error)['error']
+        try:
+            result = dict(self.fallback(text))
+        except Exception as e:
+            print(f"❌ Error en el análisis básico de respaldo: {str(e)}")
+            return {'error': reason}
+        if 'error' in result:
+            return {'error': reason}
+        
+        if METRICS.enabled:
+            METRICS.inc('pro_fallbacks_total', reason=error.kind)
+        result['fallback'] = {'analyzer': 'basic', 'reason': error.kind, 'message': reason}
+        result['overall_feedback'] = (
+            f"ℹ️ El análisis con IA no está disponible ahora mismo; este es el resultado del modo básico. "
+            f"{result.get('overall_feedback', '')}"
+        ).strip()
+        return result
+    
+    def completion_kwargs(self, text):
+        """Parámetros de la llamada a chat.completions (compartidos por ambos clientes)"""
+        if self.prompt_mode == 'compact':
+            return self.request_kwargs(
+                COMPACT_SYSTEM_PROMPT, self.build_compact_prompt(text), self.compact_max_tokens, 'compact'
+            )
+        
+        normalized = self.normalize_text(text)
+        prompt = self.build_prompt(text, normalized)
+        return self.request_kwargs(SYSTEM_PROMPT, prompt, 3000)
+    
+    def request_kwargs(self, system_prompt, prompt, max_tokens, shape='full', items=0):
+        """Mensajes y parámetros comunes de chat.completions (con el esquema estricto de `shape` si procede)"""
+        return {
+            'model': self.model,
+            'messages': [
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
+                {
+                    "role": "user",
+                    "content": prompt
                 }
+            ],
+            'temperature': 0.5,
+            'max_tokens': max_tokens,
+            'response_format': response_format(shape, items) if self.structured_outputs else {"type": "json_object"}
+        }
+    
+    def repair_kwargs(self, ai_response, error):
+        """Re-pregunta dirigida: la respuesta rota, el problema y el formato esperado (sin el texto original)"""
+        shape = 'compact' if self.prompt_mode == 'compact' else 'full'
+        prompt = (
+            f"Esta respuesta debía ser JSON con el formato {RESPONSE_SHAPES[shape]} "
+            f"pero falla: {error}.\n"
+            f"Devuelve SOLO el JSON corregido, con los mismos términos y explicaciones; "
+            f"completa o elimina lo que haya quedado cortado.\n\nRESPUESTA:\n{ai_response[:8000]}"
+        )
+        return self.request_kwargs(
+            REPAIR_SYSTEM_PROMPT, prompt, min(3000, len(ai_response) // 3 + 200), shape
+        )
+    
+    def compact_fragments(self, text):
+        """Fragmentos del texto alrededor de los candidatos (±compact_window caracteres).
+        
+        Sin buscador de candidatos, o si los fragmentos cubren casi todo el
+        texto, se devuelve el texto completo como único fragmento.
+        """
+        spans = self.candidate_finder(text) if self.candidate_finder else []
+        if not spans:
+            return [text.strip()]
+        
+        windows = []
+        for span_start, span_end in sorted(spans):
+            start = max(0, span_start - self.compact_window)
+            end = min(len(text), span_end + self.compact_window)
+            # Ajustar a límites de palabra sin recortar el candidato
+            if start > 0:
+                space = text.find(' ', start, span_start)
+                start = space + 1 if space != -1 else span_start
+            if end < len(text):
+                space = text.rfind(' ', span_end, end)
+                end = space if space != -1 else span_end
+            if windows and start <= windows[-1][1]:
+                windows[-1] = (windows[-1][0], max(windows[-1][1], end))
             else:
-                print(f"❌ Error detallado: {error_msg}")
-                return {
-                    'error': f'Error al conectar con OpenAI: {error_msg}\n\nIntenta con el modo básico.'
-                }
\ No newline at end of file
+                windows.append((start, end))
+        
+        if sum(end - start for start, end in windows) >= 0.8 * len(text):
+            return [text.strip()]
+        return [text[start:end].strip() for start, end in windows]
+    
+    def build_compact_prompt(self, text):
+        """Prompt compacto: fragmentos candidatos, instrucciones breves y esquema mínimo"""
+        fragments = '\n'.join(
+            f'{index}. {json.dumps(fragment, ensure_ascii=False)}'
+            for index, fragment in enumerate(self.compact_fragments(text), 1)
+        )
+        
+        return f"""Revisa el lenguaje inclusivo de estos fragmentos de un texto en español.
+Marca solo usos que DEGRADAN o excluyen según el contexto; los usos descriptivos o neutrales no.
+Detecta evasiones con números, espacios o símbolos (p3nd3j0, l o c a, n€gro).
+type: sexist|ableist|ethnic|offensive. sev: h|m|l.
+
+FRAGMENTOS:
+{fragments}
+
+Responde SOLO JSON: {{"issues":[{{"type":"...","text":"término exacto del fragmento","fix":"alternativa inclusiva","sev":"h|m|l","why":"explicación breve"}}]}}
+Sin problemas: {{"issues":[]}}"""
+    
+    def build_batch_prompt(self, texts):
+        """Prompt de micro-lote: las instrucciones una sola vez y un resultado por elemento"""
+        items = '\n\n'.join(
+            f'[{index}] TEXTO: {json.dumps(text, ensure_ascii=False)}\n'
+            f'[{index}] NORMALIZADO: {json.dumps(self.normalize_text(text), ensure_ascii=False)}'
+            for index, text in enumerate(texts)
+        )
+        ids = ', '.join(f'"{index}"' for index in range(len(texts)))
+        
+        return f"""Eres un experto lingüista especializado en análisis de lenguaje inclusivo.
+
+{ANALYSIS_PRINCIPLES}
+
+**TEXTOS A ANALIZAR (cada uno por separado; el normalizado detecta variaciones ocultas):**
+
+{items}
+
+**FORMATO DE RESPUESTA (SOLO JSON VÁLIDO), con una entrada por identificador ({ids}):**
+{{
+  "results": {{
+    "0": {{
+      "issues": [
+        {{
+          "type": "sexist|ableist|ethnic|offensive",
+          "original_text": "término_exacto",
+          "suggestion": "alternativa_inclusiva",
+          "severity": "high|medium|low",
+          "explanation": "Explicación CONTEXTUAL de por qué es problemático",
+          "confidence": 0.95
+        }}
+      ],
+      "overall_feedback": "Análisis contextual del texto"
+    }}
+  }}
+}}
+
+**INSTRUCCIONES CRÍTICAS:**
+1. Analiza cada texto de forma independiente; no mezcles términos entre textos
+2. NO etiquetes como problemático si el uso es claramente neutral o descriptivo
+3. SÍ detecta evasiones con números/espacios/símbolos
+4. "original_text" debe aparecer literalmente en su propio texto
+5. Si un texto NO tiene problemas, devuelve issues como array vacío []
+6. Devuelve SOLO JSON válido
+
+ANALIZA CON INTELIGENCIA CONTEXTUAL."""
+    
+    def build_compact_batch_prompt(self, texts):
+        """Prompt compacto de micro-lote: los fragmentos candidatos de cada texto bajo su identificador"""
+        items = '\n\n'.join(
+            f'[{index}]\n' + '\n'.join(
+                f'{number}. {json.dumps(fragment, ensure_ascii=False)}'
+                for number, fragment in enumerate(self.compact_fragments(text), 1)
+            )
+            for index, text in enumerate(texts)
+        )
+        ids = ', '.join(f'"{index}"' for index in range(len(texts)))
+        
+        return f"""Revisa el lenguaje inclusivo de los fragmentos de estos textos en español, cada texto por separado.
+Marca solo usos que DEGRADAN o excluyen según el contexto; los usos descriptivos o neutrales no.
+Detecta evasiones con números, espacios o símbolos (p3nd3j0, l o c a, n€gro).
+type: sexist|ableist|ethnic|offensive. sev: h|m|l.
+
+TEXTOS:
+{items}
+
+Responde SOLO JSON con una entrada por identificador ({ids}): {{"results":{{"0":{{"issues":[{{"type":"...","text":"término exacto de los fragmentos de ese texto","fix":"alternativa inclusiva","sev":"h|m|l","why":"explicación breve"}}]}}}}}}
+Texto sin problemas: {{"issues":[]}}"""
+    
+    def batch_kind(self):
+        """Tipo de prompt de micro-lote: 'compact_batch' con PRO_PROMPT_MODE=compact, si no 'batch'"""
+        return 'compact_batch' if self.prompt_mode == 'compact' else 'batch'
+    
+    def batch_completion_kwargs(self, texts):
+        """Parámetros de la llamada de micro-lote (respeta PRO_PROMPT_MODE como las individuales)"""
+        if self.prompt_mode == 'compact':
+            return self.request_kwargs(
+                COMPACT_SYSTEM_PROMPT, self.build_compact_batch_prompt(texts),
+                min(4000, self.compact_max_tokens * len(texts)), 'compact_batch', len(texts)
+            )
+        return self.request_kwargs(
+            SYSTEM_PROMPT, self.build_batch_prompt(texts), min(4000, 1000 * len(texts)), 'batch', len(texts)
+        )
+    
+    def count_response(self, outcome):
+        """Respuestas decodificadas por resultado: ok, repaired (reparación local), reask o failed"""
+        if METRICS.enabled:
+            METRICS.inc('llm_responses_total', outcome=outcome)
+    
+    def process_response(self, text, ai_response):
+        """Convierte la respuesta de la IA en el resultado del análisis (SchemaError si no es aprovechable)"""
+        try:
+            analysis = decode_analysis(ai_response)
+        except SchemaError:
+            self.count_response('reask')
+            print("⚠️ Respuesta de IA no válida: se pide que la corrija")
+            raise
+        
+        self.count_response('repaired' if analysis.repaired or analysis.problems else 'ok')
+        if analysis.problems:
+            print(f"⚠️ Respuesta de IA corregida: {'; '.join(analysis.problems[:3])}")
+        return self.build_result(text, analysis)
+    
+    def repaired_result(self, text, ai_response, repaired_response):
+        """Resultado tras la re-pregunta de reparación, o el error de siempre si tampoco sirve"""
+        try:
+            return self.build_result(text, decode_analysis(repaired_response))
+        except SchemaError:
+            return self.invalid_result(ai_response)
+    
+    def invalid_result(self, ai_response):
+        """Error cuando la respuesta no se pudo aprovechar ni corregir"""
+        self.count_response('failed')
+        print(f"❌ Error parseando JSON: {ai_response}")
+        return {
+            'error': 'Error al procesar respuesta de IA. Intenta con modo básico.'
+        }
+    
+    def build_result(self, text, analysis):
+        """Construye el resultado a partir del análisis validado (ver llm_schema.Analysis).
+        
+        Las estadísticas se calculan aquí a partir de los issues: las que
+        trae la IA solo aportan inclusive_score.
+        """
+        issues = [issue.to_dict() for issue in analysis.issues]
+        categories = dict.fromkeys(CATEGORIES, 0)
+        for issue in analysis.issues:
+            categories[issue.type] += 1
+        
+        stats = {
+            'total_words': len(text.split()),
+            'issues_found': len(issues),
+            'inclusive_score': 100 if analysis.inclusive_score is None else analysis.inclusive_score,
+            'categories': categories
+        }
+        
+        # Calcular inclusive_score si no está presente
+        if stats['inclusive_score'] == 100 and stats['issues_found'] > 0:
+            severity_weight = {'high': 3, 'medium': 2, 'low': 1}
+            weighted_issues = sum(severity_weight[issue.severity] for issue in analysis.issues)
+            stats['inclusive_score'] = max(
+                0, 
+                round(100 - (weighted_issues / max(1, stats['total_words'])) * 100)
+            )
+        
+        # Construir resultado
+        result = {
+            'original_text': text,
+            'issues': issues,
+            'suggestions': [
+                {
+                    'original': issue.original_text,
+                    'replacement': issue.suggestion,
+                    'reason': issue.explanation or 'Sin explicación'
+                }
+                for issue in analysis.issues
+            ],
+            'stats': stats,
+            'overall_feedback': analysis.overall_feedback or (
+                '✅ Análisis completado.' if len(issues) == 0 
+                else f'⚠️ Detecté {len(issues)} término(s) que podrían mejorarse.'
+            )
+        }
+        
+        return result
+    
+    def error_result(self, e):
+        """Traduce una excepción de la llamada a OpenAI en un resultado de error (por tipo, ver classify)"""
+        error = classify(e)
+        error_msg = str(e)
+        
+        if error.kind == 'auth':
+            return {
+                'error': '❌ API Key inválida. Verifica tu configuración de OPENAI_API_KEY.'
+            }
+        elif error.kind == 'rate_limit':
+            return {
+                'error': 'Límite de solicitudes alcanzado. Prueba el modo básico o espera un momento.'
+            }
+        elif error.kind in ('server', 'connection', 'timeout'):
+            return {
+                'error': '🔧 OpenAI está experimentando problemas. Intenta de nuevo en unos segundos.'
+            }
+        elif error.kind == 'circuit_open':
+            return {
+                'error': '🔧 El análisis con IA está en pausa por fallos recientes del proveedor. Prueba el modo básico.'
+            }
+        elif error.kind == 'deadline':
+            return {'error': error_msg}
+        else:
+            print(f"❌ Error detallado: {error_msg}")
+            return {
+                'error': f'Error al conectar con OpenAI: {error_msg}\n\nIntenta con el modo básico.'
+            }
\ No newline at end of file
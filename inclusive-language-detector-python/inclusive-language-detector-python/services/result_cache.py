@@ -0,0 +1,321 @@
+# services/result_cache.py - CACHÉ DE RESULTADOS DIRECCIONADA POR CONTENIDO
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+# Los almacenes compartidos borran lo caducado cada tantas escrituras: sin
+# esto, las claves que no se vuelven a pedir se quedarían en disco para siempre
+PURGE_EVERY = 256
+
+
+class SqliteCacheBackend:
+    """Almacén compartido en sqlite (varios procesos/workers sobre el mismo archivo).
+
+    get devuelve (payload, caducidad en time.time()) para que cada proceso
+    respete el plazo original de la entrada. La conexión se abre en el primer
+    uso de cada proceso: con preload_app el módulo se importa en el master de
+    gunicorn y una conexión sqlite no debe cruzar un fork.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str, purge_every: int = PURGE_EVERY):
+        self.path = path
+        self.purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        # Conexiones heredadas de otro proceso: no se cierran (liberarían los
+        # bloqueos del proceso padre), solo se dejan de usar
+        self._inherited = []
+
+    def _connection(self) -> sqlite3.Connection:
+        # Llamar con el lock tomado
+        if self._conn is None or self._pid != os.getpid():
+            if self._conn is not None:
+                self._inherited.append(self._conn)
+            self._conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                ' key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires REAL NOT NULL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS results_expires ON results (expires)')
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT payload, expires FROM results WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                # Si esta caducó, probablemente haya más: se borran todas de una vez
+                self._purge()
+                return None
+            return row[0], row[1]
+
+    def set(self, key: str, payload: str, ttl: float):
+        with self._lock:
+            self._connection().execute(
+                'INSERT OR REPLACE INTO results (key, payload, expires) VALUES (?, ?, ?)',
+                (key, payload, time.time() + ttl),
+            )
+            self._writes += 1
+            if self._writes % self.purge_every == 0:
+                self._purge()
+            else:
+                self._conn.commit()
+
+    def purge(self):
+        """Elimina las entradas caducadas"""
+        with self._lock:
+            self._purge()
+
+    def _purge(self):
+        # Llamar con el lock tomado
+        connection = self._connection()
+        connection.execute('DELETE FROM results WHERE expires < ?', (time.time(),))
+        connection.commit()
+
+
+class FileCacheBackend:
+    """Almacén compartido en archivos: un JSON por clave dentro de un directorio.
+
+    La fecha de modificación de cada archivo es su caducidad, así que purge
+    encuentra lo caducado sin abrir ningún archivo.
+    """
+
+    name = 'file'
+
+    def __init__(self, directory: str, purge_every: int = PURGE_EVERY):
+        self.directory = directory
+        self.purge_every = purge_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.json')
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        try:
+            with open(self._path(key), encoding='utf-8') as handle:
+                entry = json.load(handle)
+        except (OSError, ValueError):
+            return None
+
+        expires = entry.get('expires', 0)
+        if expires < time.time() or 'payload' not in entry:
+            self._remove(self._path(key))
+            return None
+        return entry['payload'], expires
+
+    def set(self, key: str, payload: str, ttl: float):
+        expires = time.time() + ttl
+        # Escritura atómica: otros procesos nunca leen un archivo a medias
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as handle:
+            json.dump({'expires': expires, 'payload': payload}, handle)
+        os.utime(tmp_path, (expires, expires))
+        os.replace(tmp_path, self._path(key))
+
+        with self._lock:
+            self._writes += 1
+            due = self._writes % self.purge_every == 0
+        if due:
+            self.purge()
+
+    def purge(self):
+        """Elimina los archivos caducados (y los temporales de escrituras interrumpidas)"""
+        now = time.time()
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                modified = entry.stat().st_mtime
+            except OSError:
+                continue
+            if entry.name.endswith('.json') and modified < now:
+                self._remove(entry.path)
+            elif entry.name.endswith('.tmp') and modified < now - 3600:
+                self._remove(entry.path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def backend_from_env() -> Optional[object]:
+    """Construye el almacén compartido configurado (RESULT_CACHE_BACKEND), si lo hay"""
+    kind = os.environ.get('RESULT_CACHE_BACKEND', '').strip().lower()
+    if not kind:
+        return None
+
+    default_path = os.path.join(tempfile.gettempdir(), 'inclusive-result-cache')
+    path = os.environ.get('RESULT_CACHE_PATH', '')
+
+    try:
+        if kind == 'sqlite':
+            if not path:
+                os.makedirs(default_path, exist_ok=True)
+                path = os.path.join(default_path, 'results.sqlite3')
+            return SqliteCacheBackend(path)
+        if kind == 'file':
+            return FileCacheBackend(path or default_path)
+    except (OSError, sqlite3.Error) as e:
+        print(f"⚠️ Caché de resultados compartida no disponible: {str(e)}")
+        return None
+
+    print(f"⚠️ RESULT_CACHE_BACKEND desconocido: {kind} (usa 'sqlite' o 'file')")
+    return None
+
+
+class ResultCache:
+    """LRU con caducidad (TTL) de resultados de análisis, con almacén compartido opcional.
+
+    Las claves son un hash del texto, el modo, la versión del léxico y el
+    modelo: un cambio en cualquiera de ellos invalida el resultado. Los
+    resultados se guardan serializados en JSON, de modo que cada acierto
+    devuelve una copia independiente que el llamador puede modificar.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, backend=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self._entries: 'OrderedDict[str, Tuple[float, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> 'ResultCache':
+        """Configuración desde RESULT_CACHE_SIZE, RESULT_CACHE_TTL y RESULT_CACHE_BACKEND"""
+        return cls(
+            max_entries=int(os.environ.get('RESULT_CACHE_SIZE', 1024)),
+            ttl=float(os.environ.get('RESULT_CACHE_TTL', 3600)),
+            backend=backend_from_env(),
+        )
+
+    @staticmethod
+    def key(text: str, mode: str, lexicon_version: str = '', model: str = '') -> str:
+        """Clave direccionada por contenido.
+
+        Se usa el texto tal cual: los normalizadores de los analizadores
+        eliminan espacios y puntuación, y dos textos con la misma forma
+        normalizada producen posiciones, palabras y original_text distintos.
+        """
+        digest = hashlib.sha256()
+        for part in (mode, lexicon_version, model, text):
+            digest.update(part.encode('utf-8', 'surrogatepass'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Resultado cacheado o None (cuenta aciertos y fallos)"""
+        if not self.enabled:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(entry[1])
+                del self._entries[key]
+
+        shared = self._backend_get(key)
+        with self._lock:
+            if shared is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.shared_hits += 1
+            # La entrada conserva la caducidad que le dio quien la escribió
+            payload, expires = shared
+            self._store(key, payload, now + min(self.ttl, expires - time.time()))
+        return json.loads(payload)
+
+    def set(self, key: str, result: Dict):
+        """Guarda un resultado; los errores y las respuestas de respaldo del modo básico no se cachean"""
+        if not self.enabled or not isinstance(result, dict) or 'error' in result or 'fallback' in result:
+            return
+
+        payload = json.dumps(result, ensure_ascii=False)
+        with self._lock:
+            self._store(key, payload, time.monotonic() + self.ttl)
+
+        if self.backend is not None:
+            try:
+                self.backend.set(key, payload, self.ttl)
+            except Exception as e:
+                print(f"⚠️ Error escribiendo en la caché compartida: {str(e)}")
+
+    def get_or_compute(self, key: str, compute: Callable[[], Dict]) -> Dict:
+        """Devuelve el resultado cacheado o lo calcula y lo guarda"""
+        result = self.get(key)
+        if result is None:
+            result = compute()
+            self.set(key, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Contadores para /api/health"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'backend': getattr(self.backend, 'name', None),
+            }
+
+    def _store(self, key: str, payload: str, expires: float):
+        # Llamar con el lock tomado; `expires` en time.monotonic()
+        self._entries[key] = (expires, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _backend_get(self, key: str) -> Optional[Tuple[str, float]]:
+        if self.backend is None:
+            return None
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            print(f"⚠️ Error leyendo la caché compartida: {str(e)}")
+            return None
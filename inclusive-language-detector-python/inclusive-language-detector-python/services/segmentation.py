@@ -0,0 +1,147 @@
+# services/segmentation.py - CORTES EN FIN DE ORACIÓN PARA FRAGMENTOS Y STREAMING
+
+import hashlib
+import re
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+# Fin de oración: puntuación seguida de espacio, o salto de línea. El punto
+# tras una letra suelta no corta, para no partir evasiones como "p. e. n. d. e. j. o"
+SENTENCE_END = re.compile(r'(?<!(?<![^\W\d_])[^\W\d_])[.!?]+\s+|\n\s*')
+
+# Caracteres de contexto previo que usa extract_context (±150)
+CONTEXT_WINDOW = 150
+
+# Una oración empieza tras [.!?] y termina en [.!?] o salto de línea
+SENTENCE_START_MARK = re.compile(r'[.!?]')
+SENTENCE_END_MARK = re.compile(r'[.!?\n]')
+
+
+class SentenceIndex:
+    """Límites de oración precalculados de un texto para consultas O(log n)"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.starts = [m.start() for m in SENTENCE_START_MARK.finditer(text)]
+        self.ends = [m.start() for m in SENTENCE_END_MARK.finditer(text)]
+        self._sentences: Dict[Tuple[int, int], str] = {}
+
+    def bounds(self, pos: int, length: int) -> Tuple[int, int]:
+        """(inicio, fin) de la oración que contiene text[pos:pos + length].
+
+        Si la palabra lleva su propia puntuación final ("zorra."), la oración
+        termina ahí y no se extiende a la oración siguiente.
+        """
+        i = bisect_left(self.starts, pos)
+        start = self.starts[i - 1] + 1 if i else 0
+
+        core_end = pos + length
+        while core_end > pos and self.text[core_end - 1] in '.!?':
+            core_end -= 1
+
+        j = bisect_left(self.ends, core_end)
+        end = self.ends[j] + 1 if j < len(self.ends) else len(self.text)
+
+        return start, end
+
+    def sentence(self, pos: int, length: int) -> str:
+        """Oración que contiene la palabra (cacheada por límites)"""
+        key = self.bounds(pos, length)
+        sentence = self._sentences.get(key)
+        if sentence is None:
+            sentence = self._sentences[key] = self.text[key[0]:key[1]].strip()
+        return sentence
+
+    def surrounding(self, pos: int, length: int, window: int = CONTEXT_WINDOW) -> str:
+        """Contexto amplio de ±`window` caracteres"""
+        return self.text[max(0, pos - window):min(len(self.text), pos + length + window)]
+
+
+def _cut_point(text: str, start: int, limit: int) -> int:
+    """Mejor posición de corte en text[start:limit] (fin de oración, espacio o límite)"""
+    cut = -1
+    for match in SENTENCE_END.finditer(text, start, limit):
+        cut = match.end()
+
+    if cut <= start:
+        space = max(text.rfind(' ', start, limit), text.rfind('\n', start, limit))
+        cut = space + 1 if space > start else limit
+
+    return cut
+
+
+def split_into_spans(text: str, max_chars: int) -> List[Tuple[int, int]]:
+    """Divide un texto en tramos (inicio, fin) de hasta `max_chars` cortando en fin de oración.
+
+    Una oración más larga que `max_chars` se corta en el último espacio; los
+    cortes nunca parten palabras salvo que no haya ningún espacio disponible.
+    """
+    spans = []
+    start = 0
+    length = len(text)
+
+    while length - start > max_chars:
+        cut = _cut_point(text, start, start + max_chars)
+        spans.append((start, cut))
+        start = cut
+
+    if start < length:
+        spans.append((start, length))
+
+    return [(start, end) for start, end in spans if text[start:end].strip()]
+
+
+def split_into_chunks(text: str, max_chars: int) -> List[str]:
+    """Igual que split_into_spans, pero devuelve el texto de cada fragmento"""
+    return [text[start:end] for start, end in split_into_spans(text, max_chars)]
+
+
+def split_complete(buffer: str, max_chars: int) -> Tuple[str, str]:
+    """Separa las oraciones completas de un buffer de streaming: (completas, resto).
+
+    Si no hay ningún fin de oración y el buffer supera `max_chars`, se corta
+    igualmente para mantener la memoria acotada.
+    """
+    cut = -1
+    for match in SENTENCE_END.finditer(buffer):
+        cut = match.end()
+
+    if cut == -1 and len(buffer) > max_chars:
+        cut = _cut_point(buffer, 0, max_chars)
+
+    if cut <= 0:
+        return '', buffer
+    return buffer[:cut], buffer[cut:]
+
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """Divide el texto en oraciones contiguas (inicio, fin) que lo cubren por completo.
+
+    Cada oración conserva la puntuación y el espacio que la siguen, de modo
+    que concatenarlas reproduce el texto original.
+    """
+    spans = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        spans.append((start, match.end()))
+        start = match.end()
+
+    if start < len(text):
+        spans.append((start, len(text)))
+
+    return spans
+
+
+def sentence_hash(sentence: str) -> str:
+    """Hash de una oración (SHA-256 en hexadecimal, 32 caracteres; el navegador calcula el mismo)"""
+    return hashlib.sha256(sentence.encode('utf-8', 'surrogatepass')).hexdigest()[:32]
+
+
+def tail_context(text: str, window: int) -> str:
+    """Últimos `window` caracteres de un texto, empezando en límite de palabra"""
+    if len(text) <= window:
+        return text
+
+    tail = text[-window:]
+    space = tail.find(' ')
+    return tail[space + 1:] if space != -1 else tail
@@ -0,0 +1,63 @@
+# services/streaming.py - EVENTOS DE ANÁLISIS PROGRESIVO (SSE / NDJSON)
+
+import json
+from typing import Dict, Iterator, List, Optional
+
+# Claves del resultado que viajan en el evento final (los issues ya llegaron uno a uno)
+SUMMARY_KEYS = ('stats', 'overall_feedback', 'fallback')
+
+
+def summary_event(result: Dict, streamed: Optional[List[Dict]] = None) -> Dict:
+    """Evento final con stats y feedback; incluye 'issues' si difieren de los ya emitidos.
+
+    Pasa con el modo Pro cuando la validación de la respuesta completa
+    descarta o corrige algún issue que ya se había enviado.
+    """
+    event = {'event': 'summary'}
+    for key in SUMMARY_KEYS:
+        if key in result:
+            event[key] = result[key]
+    if streamed is not None and result.get('issues') != streamed:
+        event['issues'] = result.get('issues', [])
+    return event
+
+
+def result_events(result: Dict) -> Iterator[Dict]:
+    """Un resultado ya calculado (caché, modo híbrido, fallback) como secuencia de eventos"""
+    if 'error' in result:
+        yield {'event': 'error', 'error': result['error']}
+        return
+    for issue in result.get('issues', []):
+        yield {'event': 'issue', 'issue': issue}
+    yield summary_event(result, result.get('issues', []))
+
+
+def assemble_result(text: str, issues: List[Dict], summary: Dict) -> Dict:
+    """Resultado equivalente al de /api/analyze a partir de los eventos emitidos"""
+    issues = summary.get('issues', issues)
+    result = {
+        'original_text': text,
+        'issues': issues,
+        'suggestions': [
+            {
+                'original': issue.get('original_text', ''),
+                'replacement': issue.get('suggestion', ''),
+                'reason': issue.get('explanation') or 'Sin explicación'
+            }
+            for issue in issues
+        ],
+        'stats': summary.get('stats', {}),
+        'overall_feedback': summary.get('overall_feedback', ''),
+    }
+    if 'fallback' in summary:
+        result['fallback'] = summary['fallback']
+    return result
+
+
+def format_sse(event: Dict) -> str:
+    """Evento Server-Sent Events: el tipo en 'event:' y el JSON en 'data:'"""
+    return f"event: {event.get('event', 'message')}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+def format_ndjson(event: Dict) -> str:
+    return json.dumps(event, ensure_ascii=False) + '\n'
@@ -0,0 +1,433 @@
+# services/tenant_lexicons.py - LÉXICOS POR CLIENTE (TENANT) CON RECARGA EN CALIENTE
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import closing
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .basic_analyzer import BasicAnalyzer
+from .term_matcher import TermMatcher
+
+# Identificador de tenant: también es nombre de archivo, así que sin rutas
+TENANT_ID = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+# Letras mínimas de un término normalizado: el analizador no busca palabras
+# más cortas, y un término de 1-2 letras contenido en otras marcaría casi todo
+MIN_TERM_LENGTH = 3
+
+
+def empty_overlay() -> Dict:
+    """Capa sin cambios: términos y frases añadidos por categoría, exclusiones y sugerencias"""
+    return {'add': {}, 'exclude': [], 'suggestions': {}}
+
+
+def overlay_fingerprint(overlay: Optional[Dict]) -> str:
+    """Hash estable del contenido de una capa (detecta cambios sin compilar nada)"""
+    payload = json.dumps(overlay, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class FileOverlaySource:
+    """Una capa por tenant en `<directorio>/<tenant>.json`:
+
+        {"add": {"offensive": {"terms": ["chingadera"], "phrases": []}},
+         "exclude": ["gordo"],
+         "suggestions": {"chingadera": "cosa / asunto"}}
+    """
+
+    name = 'files'
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def load(self, tenant: str) -> Optional[Dict]:
+        """Capa del tenant o None si no tiene archivo (ValueError si está mal formada)"""
+        try:
+            with open(os.path.join(self.directory, f'{tenant}.json'), encoding='utf-8') as handle:
+                data = json.load(handle)
+        except FileNotFoundError:
+            return None
+        if not isinstance(data, dict):
+            raise ValueError('la capa debe ser un objeto JSON')
+        overlay = empty_overlay()
+        overlay['add'] = data.get('add') or {}
+        overlay['exclude'] = data.get('exclude') or []
+        overlay['suggestions'] = data.get('suggestions') or {}
+        return overlay
+
+
+class SqliteOverlaySource:
+    """Capas en una tabla sqlite compartida por todos los tenants:
+
+        lexicon_overlay(tenant, action, category, term, suggestion)
+
+    `action` es 'term' o 'phrase' (añadir a `category`) o 'exclude';
+    `suggestion` es opcional y también vale para términos del léxico base.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str):
+        self.path = path
+        with closing(sqlite3.connect(path, timeout=5.0)) as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS lexicon_overlay ('
+                ' tenant TEXT NOT NULL, action TEXT NOT NULL, category TEXT,'
+                ' term TEXT NOT NULL, suggestion TEXT)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS lexicon_overlay_tenant ON lexicon_overlay (tenant)')
+            conn.commit()
+
+    def load(self, tenant: str) -> Optional[Dict]:
+        with closing(sqlite3.connect(self.path, timeout=5.0)) as conn:
+            rows = conn.execute(
+                'SELECT action, category, term, suggestion FROM lexicon_overlay'
+                ' WHERE tenant = ? ORDER BY rowid', (tenant,)
+            ).fetchall()
+        if not rows:
+            return None
+
+        overlay = empty_overlay()
+        for action, category, term, suggestion in rows:
+            if action in ('term', 'phrase'):
+                kind = 'terms' if action == 'term' else 'phrases'
+                overlay['add'].setdefault(category, {'terms': [], 'phrases': []})[kind].append(term)
+            elif action == 'exclude':
+                overlay['exclude'].append(term)
+            if suggestion:
+                overlay['suggestions'][term] = suggestion
+        return overlay
+
+
+class LayeredMatcher:
+    """Léxico base compartido + capa del tenant, con la misma API de consulta que TermMatcher.
+
+    La capa solo compila los términos añadidos por el tenant (unos pocos
+    frente a miles), así que se construye en milisegundos y el autómata base
+    nunca se reconstruye. Las exclusiones se compilan igual, en su propio
+    TermMatcher: una palabra que es un término excluido o una forma derivada
+    suya (excluir "gordo" descarta "gordito") no se reporta, ni tampoco una
+    coincidencia del léxico base con un término excluido. Las palabras que
+    solo contienen un término excluido, o están dentro de uno, sí se
+    reportan: excluir "ojón" no apaga "cojones". Los términos del tenant
+    tienen prioridad sobre los del léxico base.
+    """
+
+    def __init__(self, base: TermMatcher, overlay: Optional[TermMatcher],
+                 excluded: Optional[TermMatcher], exclusions: frozenset,
+                 normalize: Callable[[str], str]):
+        self.base = base
+        self.overlay = overlay
+        self.excluded = excluded
+        self.exclusions = exclusions
+        self.normalize = normalize
+
+    def _excluded(self, word: str) -> bool:
+        return self.excluded is not None and self.excluded.is_entry(word)
+
+    def _allowed(self, match: Optional[Tuple[str, str, bool]]) -> Optional[Tuple[str, str, bool]]:
+        if match is None or not self.exclusions or self.normalize(match[1]) not in self.exclusions:
+            return match
+        return None
+
+    def match(self, word: str) -> Optional[Tuple[str, str, bool]]:
+        if self._excluded(word):
+            return None
+        if self.overlay is not None:
+            match = self.overlay.match(word)
+            if match is not None:
+                return match
+        return self._allowed(self.base.match(word))
+
+    def match_fuzzy(self, word: str, max_distance: int = 2) -> Optional[Tuple[str, str, bool]]:
+        if self._excluded(word):
+            return None
+        if self.overlay is not None:
+            match = self.overlay.match_fuzzy(word, max_distance)
+            if match is not None:
+                return match
+        return self._allowed(self.base.match_fuzzy(word, max_distance))
+
+    def contains_entry(self, word: str) -> bool:
+        if not word or self._excluded(word):
+            return False
+        if self.overlay is not None and self.overlay.contains_entry(word):
+            return True
+        return self.base.contains_entry(word) and self._allowed(self.base.match(word)) is not None
+
+    def find_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Tramos de ambas capas; de los solapados, el que empieza antes y, a igual inicio, el más largo"""
+        found = self.base.find_spans(text)
+        if self.overlay is not None:
+            found = sorted(found + self.overlay.find_spans(text), key=lambda span: (span[0], -span[1]))
+        spans = []
+        last_end = 0
+        for start, end in found:
+            if start >= last_end and not self._excluded(text[start:end]):
+                spans.append((start, end))
+                last_end = end
+        return spans
+
+    def memory_report(self) -> Dict[str, int]:
+        report = self.base.memory_report()
+        if self.overlay is not None:
+            report['overlay_bytes'] = self.overlay.memory_report()['total_bytes']
+        return report
+
+
+def _term_list(value, label: str, normalize: Callable[[str], str], problems: List[str]) -> List[str]:
+    """Términos válidos de una lista de la capa; lo que no lo es se informa en `problems`"""
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        # Iterar un texto lo convertiría en términos de una letra
+        problems.append(f'{label}: se esperaba una lista, no {type(value).__name__}')
+        return []
+    terms = []
+    for term in value:
+        if not isinstance(term, str) or not term.strip():
+            problems.append(f'{label}: {term!r} no es un término')
+        elif len(normalize(term)) < MIN_TERM_LENGTH:
+            problems.append(f'{label}: {term!r} es demasiado corto (mínimo {MIN_TERM_LENGTH} letras)')
+        else:
+            terms.append(term)
+    return terms
+
+
+def compile_overlay(base: BasicAnalyzer, overlay: Dict, fingerprint: str) -> Tuple[BasicAnalyzer, List[str]]:
+    """(analizador con la capa aplicada, problemas encontrados en la capa).
+
+    Las entradas inválidas (categoría desconocida, listas que no son listas,
+    términos que no son texto o que normalizados tienen menos de
+    MIN_TERM_LENGTH letras) se ignoran y se informan; el resto de la capa se aplica.
+    """
+    problems: List[str] = []
+    database: Dict[str, Dict[str, List[str]]] = {}
+    add = overlay.get('add')
+    if add is not None and not isinstance(add, dict):
+        problems.append('add: se esperaba {"categoría": {"terms": [...], "phrases": [...]}}')
+    for category, data in (add if isinstance(add, dict) else {}).items():
+        if category not in base.offensive_base_terms:
+            problems.append(f'categoría desconocida {category!r}')
+            continue
+        if not isinstance(data, dict):
+            problems.append(f'{category}: se esperaba {{"terms": [...], "phrases": [...]}}')
+            continue
+        lists = {kind: _term_list(data.get(kind), f'{category}.{kind}', base.normalize, problems)
+                 for kind in ('terms', 'phrases')}
+        if any(lists.values()):
+            database[category] = lists
+
+    excluded_terms = sorted(set(_term_list(overlay.get('exclude'), 'exclude', base.normalize, problems)))
+    exclusions = frozenset(base.normalize(term) for term in excluded_terms)
+    suggestions = overlay.get('suggestions')
+    if suggestions is not None and not isinstance(suggestions, dict):
+        problems.append('suggestions: se esperaba {"término": "sugerencia"}')
+    suggestions = {
+        base.normalize(term): text
+        for term, text in (suggestions if isinstance(suggestions, dict) else {}).items()
+        if isinstance(term, str) and isinstance(text, str) and text.strip()
+    }
+
+    matcher = TermMatcher(database, base.normalize, base.affixes) if database else None
+    excluded = (TermMatcher({'excluded': {'terms': excluded_terms, 'phrases': []}}, base.normalize, base.affixes)
+                if exclusions else None)
+    layered = LayeredMatcher(base.matcher, matcher, excluded, exclusions, base.normalize)
+    version = hashlib.sha256(f'{base.lexicon_version}:{fingerprint}'.encode('utf-8')).hexdigest()
+    return base.with_lexicon(layered, version, suggestions), problems
+
+
+class TenantLexicon:
+    """Léxico compilado de un tenant tal y como se sirve (inmutable: se sustituye entero)"""
+
+    __slots__ = ('tenant', 'fingerprint', 'analyzer', 'loaded_at')
+
+    def __init__(self, tenant: str, fingerprint: str, analyzer: BasicAnalyzer):
+        self.tenant = tenant
+        self.fingerprint = fingerprint
+        self.analyzer = analyzer
+        self.loaded_at = time.time()
+
+
+class TenantLexicons:
+    """Analizadores básicos por tenant: léxico base + capa propia, en una caché LRU.
+
+    - La primera petición de un tenant compila su capa; si llegan varias a
+      la vez, solo una compila y las demás esperan ese mismo resultado.
+    - Un hilo de fondo relee cada `reload_interval` segundos las capas de
+      los tenants en caché y, si su contenido cambió, compila la nueva
+      versión fuera de las peticiones y la sustituye con una sola
+      asignación: las peticiones en curso terminan con la versión que
+      tomaron y ninguna ve un índice a medio construir.
+    - Si una capa no se puede leer o compilar, se sigue sirviendo la última
+      versión buena (o el léxico base si nunca la hubo).
+    """
+
+    def __init__(self, base: BasicAnalyzer, source=None, max_tenants: int = 64,
+                 reload_interval: float = 30.0):
+        self.base = base
+        self.source = source
+        self.max_tenants = max_tenants
+        self.reload_interval = reload_interval
+        self._entries: 'OrderedDict[str, TenantLexicon]' = OrderedDict()
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._reloader: Optional[threading.Thread] = None
+        self._reloader_pid: Optional[int] = None
+        self.counters = {'hits': 0, 'misses': 0, 'builds': 0, 'reloads': 0, 'evictions': 0,
+                         'errors': 0, 'build_ms': 0.0}
+
+    @classmethod
+    def from_env(cls, base: BasicAnalyzer) -> 'TenantLexicons':
+        """LEXICON_OVERLAY_DB (sqlite) o LEXICON_OVERLAY_DIR (un JSON por tenant); sin ninguno, solo el base"""
+        source = None
+        db_path = os.environ.get('LEXICON_OVERLAY_DB', '')
+        directory = os.environ.get('LEXICON_OVERLAY_DIR', '')
+        try:
+            if db_path:
+                source = SqliteOverlaySource(db_path)
+            elif directory:
+                source = FileOverlaySource(directory)
+        except sqlite3.Error as e:
+            print(f"⚠️ Capas de léxico por tenant desactivadas ({db_path}): {str(e)}")
+        return cls(
+            base, source,
+            max_tenants=int(os.environ.get('TENANT_LEXICON_CACHE_SIZE', 64)),
+            reload_interval=float(os.environ.get('TENANT_LEXICON_RELOAD_SECONDS', 30)),
+        )
+
+    @staticmethod
+    def valid_tenant(tenant: str) -> bool:
+        return isinstance(tenant, str) and bool(TENANT_ID.match(tenant))
+
+    def get(self, tenant: Optional[str]) -> BasicAnalyzer:
+        """Analizador del tenant (el base si no hay tenant, capas o capa propia)"""
+        if not tenant or self.source is None:
+            return self.base
+        if not self.valid_tenant(tenant):
+            raise ValueError(f'Identificador de tenant inválido: {tenant!r}')
+
+        with self._lock:
+            entry = self._entries.get(tenant)
+            if entry is not None:
+                self._entries.move_to_end(tenant)
+                self.counters['hits'] += 1
+                return entry.analyzer
+            self.counters['misses'] += 1
+            future = self._pending.get(tenant)
+            owner = future is None
+            if owner:
+                future = self._pending[tenant] = Future()
+
+        if not owner:
+            return future.result().analyzer
+
+        try:
+            entry = self._build(tenant)
+            with self._lock:
+                self._entries[tenant] = entry
+                while len(self._entries) > self.max_tenants:
+                    self._entries.popitem(last=False)
+                    self.counters['evictions'] += 1
+            future.set_result(entry)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(tenant, None)
+
+        self._ensure_reloader()
+        return entry.analyzer
+
+    def _build(self, tenant: str, previous: Optional[TenantLexicon] = None) -> Optional[TenantLexicon]:
+        """Lee y compila la capa; None si no cambió respecto a `previous`"""
+        try:
+            overlay = self.source.load(tenant)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            self._count(errors=1)
+            print(f"⚠️ Capa de léxico de {tenant} ilegible: {str(e)}")
+            if previous is not None:
+                return None
+            # Sin versión buena: el base, con una huella que fuerza a reintentar en la próxima recarga
+            return TenantLexicon(tenant, 'error', self.base)
+
+        fingerprint = overlay_fingerprint(overlay)
+        if previous is not None and previous.fingerprint == fingerprint:
+            return None
+        if overlay is None:
+            return TenantLexicon(tenant, fingerprint, self.base)
+
+        started = time.perf_counter()
+        analyzer, problems = compile_overlay(self.base, overlay, fingerprint)
+        self._count(builds=1, build_ms=(time.perf_counter() - started) * 1000)
+        if problems:
+            print(f"⚠️ Capa de léxico de {tenant}: {'; '.join(problems[:3])}")
+        return TenantLexicon(tenant, fingerprint, analyzer)
+
+    def reload(self, tenant: Optional[str] = None) -> int:
+        """Relee las capas en caché (o solo la de `tenant`) y sustituye las que cambiaron"""
+        with self._lock:
+            entries = [entry for name, entry in self._entries.items() if tenant in (None, name)]
+
+        replaced = 0
+        for entry in entries:
+            try:
+                fresh = self._build(entry.tenant, entry)
+            except Exception as e:
+                self._count(errors=1)
+                print(f"❌ Error recompilando la capa de léxico de {entry.tenant}: {str(e)}")
+                continue
+            if fresh is None:
+                continue
+            with self._lock:
+                # Solo si sigue en caché y nadie la sustituyó mientras tanto
+                if self._entries.get(entry.tenant) is entry:
+                    self._entries[entry.tenant] = fresh
+                    self.counters['reloads'] += 1
+                    replaced += 1
+        return replaced
+
+    def _ensure_reloader(self):
+        """Arranca el hilo de recarga (perezoso y de nuevo tras un fork)"""
+        if not self.reload_interval or self.reload_interval <= 0:
+            return
+        with self._lock:
+            if self._reloader is not None and self._reloader_pid == os.getpid():
+                return
+            self._reloader = threading.Thread(target=self._reload_forever, name='tenant-lexicons', daemon=True)
+            self._reloader_pid = os.getpid()
+            self._reloader.start()
+
+    def _reload_forever(self):
+        while True:
+            time.sleep(self.reload_interval)
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"❌ Error en la recarga de capas de léxico: {str(e)}")
+
+    def _count(self, **changes):
+        with self._lock:
+            for name, delta in changes.items():
+                self.counters[name] += delta
+
+    def stats(self) -> Dict:
+        """Estado para /api/health"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['build_ms'] = round(stats['build_ms'], 1)
+            stats.update({
+                'source': getattr(self.source, 'name', None),
+                'tenants': len(self._entries),
+                'max_tenants': self.max_tenants,
+                'reload_seconds': self.reload_interval,
+            })
+        return stats
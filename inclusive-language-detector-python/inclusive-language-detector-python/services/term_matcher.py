@@ -0,0 +1,615 @@
+# services/term_matcher.py - AUTÓMATA PRECOMPILADO DEL LÉXICO
+
+import sys
+from array import array
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .fuzzy_index import FuzzyIndex
+
+
+def build_aho_corasick(patterns: Iterable[Tuple[str, Any]]):
+    """Construye (goto, fail, outputs) de un autómata Aho-Corasick.
+
+    `outputs[nodo]` lista los pares (patrón, dato) que terminan en ese nodo,
+    incluidos los heredados por enlaces de fallo.
+    """
+    goto: List[Dict[str, int]] = [{}]
+    outputs: List[List[Tuple[str, Any]]] = [[]]
+
+    for pattern, payload in patterns:
+        node = 0
+        for ch in pattern:
+            nxt = goto[node].get(ch)
+            if nxt is None:
+                nxt = len(goto)
+                goto[node][ch] = nxt
+                goto.append({})
+                outputs.append([])
+            node = nxt
+        outputs[node].append((pattern, payload))
+
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+
+    while queue:
+        node = queue.popleft()
+        for ch, child in goto[node].items():
+            queue.append(child)
+            state = fail[node]
+            while state and ch not in goto[state]:
+                state = fail[state]
+            target = goto[state].get(ch, 0)
+            fail[child] = target if target != child else 0
+            outputs[child] = outputs[child] + outputs[fail[child]]
+
+    return goto, fail, outputs
+
+
+class KeywordMatcher:
+    """Busca un conjunto de palabras clave en una sola pasada (Aho-Corasick)"""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = list(keywords)
+        self._goto, self._fail, self._outputs = build_aho_corasick(
+            (keyword, keyword) for keyword in self.keywords
+        )
+
+    def find_all(self, text: str) -> Set[str]:
+        """Palabras clave distintas contenidas en el texto"""
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        found = set()
+        node = 0
+
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for keyword, _ in outputs[node]:
+                found.add(keyword)
+
+        return found
+
+    def contains_any(self, text: str) -> bool:
+        """True si el texto contiene al menos una palabra clave"""
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        node = 0
+
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if outputs[node]:
+                return True
+
+        return False
+
+
+def build_affix_trie(affixes: Iterable[str], reverse: bool = False) -> Dict:
+    """Trie de afijos (al revés para sufijos); la clave None marca el final de un afijo.
+
+    Su valor indica si el afijo empieza por vocal.
+    """
+    root: Dict = {}
+    for affix in affixes:
+        node = root
+        for ch in (reversed(affix) if reverse else affix):
+            node = node.setdefault(ch, {})
+        node[None] = affix[0] in VOWELS
+    return root
+
+
+def build_pool(strings: Iterable[str]) -> Tuple[str, array]:
+    """Concatena cadenas en un único str y devuelve también sus desplazamientos.
+
+    La cadena `i` es ``pool[offsets[i]:offsets[i + 1]]``: un solo objeto str
+    y un array de enteros en lugar de miles de objetos str sueltos.
+    """
+    parts = list(strings)
+    offsets = array('I', [0])
+    total = 0
+    for part in parts:
+        total += len(part)
+        offsets.append(total)
+    return ''.join(parts), offsets
+
+
+# Vocales tras las que una base pierde su vocal final (gordo → gord-ito)
+VOWELS = frozenset('aeiou')
+
+# Longitud mínima de la raíz que queda al quitar afijos (fe-ísimo)
+MIN_STEM = 2
+
+# Cambios ortográficos de la base truncada ante e/i (loco → loqu-ito, gringo → gringu-ito)
+STEM_ALTERNATIONS = (('c', 'qu'), ('g', 'gu'))
+
+
+class TermMatcher:
+    """Léxico normalizado una sola vez y compilado en dos autómatas compactos.
+
+    - Aho-Corasick: términos del léxico contenidos en la palabra.
+    - Autómata de sufijos: palabra contenida en algún término del léxico y,
+      con las entradas delimitadas por centinelas, coincidencia exacta.
+    - Morfología: ``prefijo* + base + sufijo*`` por reglas de afijos, sin
+      materializar las variaciones (ver `_scan_derived`).
+    - Índice de borrados para erratas a distancia de edición acotada
+      (`match_fuzzy`), consultado solo si lo anterior no encuentra nada.
+
+    Cada entrada lleva una máscara de bits: el bit ``2*i`` marca los términos
+    de la categoría ``i`` y el bit ``2*i + 1`` sus frases. El bit más bajo
+    encendido respeta la prioridad original (categoría, luego términos antes
+    que frases).
+
+    Las entradas se guardan en un pool de cadenas con ids enteros (orden
+    alfabético) y el autómata de sufijos en arrays planos (transiciones en
+    formato CSR), sin un dict ni un str por estado. Así el artefacto ocupa
+    una fracción de la memoria y, al no tocar objetos individuales en las
+    búsquedas, sus páginas se comparten copy-on-write entre procesos
+    hijos de un proceso que ya lo cargó (gunicorn con preload_app).
+    """
+
+    # Delimitan cada entrada en el autómata de sufijos. Son espacios para
+    # str.isspace(), así que el normalizador nunca los deja en una palabra.
+    START = '\x1e'
+    END = '\x1f'
+
+    def __init__(self, database: Dict[str, Dict], normalize: Callable[[str], str],
+                 affixes: Optional[Dict[str, List[str]]] = None):
+        self.categories = list(database.keys())
+
+        # Normalizar el léxico completo una sola vez
+        entries: Dict[str, int] = {}
+        originals: Dict[Tuple[str, int], str] = {}
+
+        for index, (category, data) in enumerate(database.items()):
+            for kind, bit in (('terms', 1 << (2 * index)), ('phrases', 1 << (2 * index + 1))):
+                for original in sorted(data[kind]):
+                    normalized = normalize(original)
+                    if not normalized:
+                        continue
+                    entries[normalized] = entries.get(normalized, 0) | bit
+                    originals.setdefault((normalized, bit), original)
+
+        # Pool de entradas: el id es la posición en orden alfabético
+        words = sorted(entries)
+        ids = {word: entry_id for entry_id, word in enumerate(words)}
+        self._pool, self._offsets = build_pool(words)
+        self._masks = array('I', (entries[word] for word in words))
+
+        # Un original por bit de cada entrada, en el orden de los bits de su máscara
+        self._original_first = array('I')
+        ordered_originals: List[str] = []
+        for word in words:
+            self._original_first.append(len(ordered_originals))
+            mask = entries[word]
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                ordered_originals.append(originals[(word, bit)])
+        self._original_pool, self._original_offsets = build_pool(ordered_originals)
+
+        self._build_contained_automaton(entries, ids)
+        self._build_container_automaton(words, entries)
+        self._build_morphology(words, affixes or {}, normalize)
+        self.fuzzy = FuzzyIndex(words)
+
+    def __len__(self) -> int:
+        return len(self._masks)
+
+    def entry(self, entry_id: int) -> str:
+        """Entrada normalizada con ese id"""
+        return self._pool[self._offsets[entry_id]:self._offsets[entry_id + 1]]
+
+    def original(self, entry_id: int, bit: int) -> str:
+        """Término original (sin normalizar) de una entrada para uno de sus bits"""
+        rank = bin(self._masks[entry_id] & (bit - 1)).count('1')
+        index = self._original_first[entry_id] + rank
+        return self._original_pool[self._original_offsets[index]:self._original_offsets[index + 1]]
+
+    # ------------------------------------------------------------------
+    # Aho-Corasick: ¿qué términos aparecen dentro de la palabra?
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _minimal_patterns(entries: Dict[str, int]) -> Dict[str, int]:
+        """Descarta entradas que contienen otra entrada con los mismos bits"""
+        patterns = {}
+
+        for entry, mask in entries.items():
+            remaining = mask
+            length = len(entry)
+
+            for start in range(length):
+                for end in range(start + 1, length + 1):
+                    if end - start == length:
+                        continue
+                    inner = entries.get(entry[start:end])
+                    if inner:
+                        remaining &= ~inner
+                        if not remaining:
+                            break
+                if not remaining:
+                    break
+
+            if remaining:
+                patterns[entry] = remaining
+
+        return patterns
+
+    def _build_contained_automaton(self, entries: Dict[str, int], ids: Dict[str, int]):
+        """Construye el autómata Aho-Corasick sobre los patrones mínimos (unos cientos)"""
+        self._ac_goto, self._ac_fail, self._ac_outputs = build_aho_corasick(
+            (pattern, (ids[pattern], len(pattern), bits))
+            for pattern, bits in self._minimal_patterns(entries).items()
+        )
+
+    def _scan_contained(self, word: str) -> Tuple[int, Dict[int, Tuple[int, int]]]:
+        """Recorre la palabra una vez y devuelve los bits y el patrón más largo (longitud, id) por bit"""
+        goto, fail, outputs = self._ac_goto, self._ac_fail, self._ac_outputs
+        mask = 0
+        found: Dict[int, Tuple[int, int]] = {}
+        node = 0
+
+        for ch in word:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+
+            for _, (entry_id, length, bits) in outputs[node]:
+                mask |= bits
+                while bits:
+                    bit = bits & -bits
+                    bits ^= bit
+                    current = found.get(bit)
+                    if current is None or length > current[0]:
+                        found[bit] = (length, entry_id)
+
+        return mask, found
+
+    # ------------------------------------------------------------------
+    # Autómata de sufijos: ¿en qué términos aparece la palabra?
+    # ------------------------------------------------------------------
+
+    def _build_container_automaton(self, words: List[str], entries: Dict[str, int]):
+        """Construye el autómata de sufijos generalizado y lo aplana en arrays"""
+        nxt: List[Dict[str, int]] = [{}]
+        link = [-1]
+        length = [0]
+        marks = [0]
+        reps: List[Optional[Tuple[int, int, int]]] = [None]
+
+        def new_state(size, transitions, suffix_link):
+            nxt.append(transitions)
+            link.append(suffix_link)
+            length.append(size)
+            marks.append(0)
+            reps.append(None)
+            return len(nxt) - 1
+
+        def clone(p, q, ch, size):
+            cl = new_state(size, dict(nxt[q]), link[q])
+            while p != -1 and nxt[p].get(ch) == q:
+                nxt[p][ch] = cl
+                p = link[p]
+            link[q] = cl
+            return cl
+
+        for entry_id, entry in enumerate(words):
+            mask = entries[entry]
+            low_bit = mask & -mask
+            # Los ids siguen el orden alfabético: mismo desempate que comparar las cadenas
+            rep = (low_bit, len(entry), entry_id)
+            last = 0
+
+            for ch in self.START + entry + self.END:
+                q = nxt[last].get(ch)
+                if q is not None:
+                    last = q if length[q] == length[last] + 1 else clone(last, q, ch, length[last] + 1)
+                else:
+                    cur = new_state(length[last] + 1, {}, 0)
+                    p = last
+                    while p != -1 and ch not in nxt[p]:
+                        nxt[p][ch] = cur
+                        p = link[p]
+                    if p != -1:
+                        q = nxt[p][ch]
+                        link[cur] = q if length[p] + 1 == length[q] else clone(p, q, ch, length[p] + 1)
+                    last = cur
+
+                marks[last] |= mask
+                if reps[last] is None or rep < reps[last]:
+                    reps[last] = rep
+
+        # Propagar máscaras y representantes por los enlaces de sufijo
+        for state in sorted(range(1, len(nxt)), key=length.__getitem__, reverse=True):
+            parent = link[state]
+            marks[parent] |= marks[state]
+            if reps[state] is not None and (reps[parent] is None or reps[state] < reps[parent]):
+                reps[parent] = reps[state]
+
+        # Transiciones en formato CSR: las del estado s son las posiciones
+        # [starts[s], starts[s + 1]) de labels (un carácter cada una) y targets
+        labels: List[str] = []
+        targets = array('I')
+        starts = array('I', [0])
+        for transitions in nxt:
+            for ch in sorted(transitions):
+                labels.append(ch)
+                targets.append(transitions[ch])
+            starts.append(len(targets))
+
+        self._sam_labels = ''.join(labels)
+        self._sam_targets = targets
+        self._sam_starts = starts
+        self._sam_marks = array('I', marks)
+        self._sam_reps = array('i', (rep[2] if rep else -1 for rep in reps))
+
+    def _walk(self, text: str) -> int:
+        """Estado del autómata de sufijos tras leer `text` desde el inicial (-1 si no existe)"""
+        labels, targets, starts = self._sam_labels, self._sam_targets, self._sam_starts
+        state = 0
+
+        for ch in text:
+            position = labels.find(ch, starts[state], starts[state + 1])
+            if position < 0:
+                return -1
+            state = targets[position]
+
+        return state
+
+    def _scan_exact(self, word: str) -> Tuple[int, int]:
+        """Bits e id de la entrada idéntica a la palabra ((0, -1) si no está en el léxico).
+
+        Solo la propia entrada contiene START + palabra + END, así que el
+        representante de ese estado es su id.
+        """
+        state = self._walk(self.START + word + self.END)
+        if state < 0:
+            return 0, -1
+        return self._sam_marks[state], self._sam_reps[state]
+
+    def _scan_container(self, word: str) -> Tuple[int, int]:
+        """Devuelve los bits de las entradas que contienen la palabra y el id representante"""
+        state = self._walk(word)
+        if state < 0:
+            return 0, -1
+        return self._sam_marks[state], self._sam_reps[state]
+
+    # ------------------------------------------------------------------
+    # Morfología: ¿es la palabra una base con prefijos y sufijos?
+    # ------------------------------------------------------------------
+
+    def _build_morphology(self, words: List[str], affixes: Dict[str, List[str]],
+                          normalize: Callable[[str], str]):
+        """Tablas de afijos y de bases (enteras y truncadas) para `_scan_derived`.
+
+        `affixes['prefixes']` son prefijos; el resto de listas, sufijos. Añadir
+        un afijo solo añade una entrada a estas tablas.
+        """
+        prefixes: Set[str] = set()
+        suffixes: Set[str] = set()
+        for kind, values in affixes.items():
+            target = prefixes if kind == 'prefixes' else suffixes
+            target.update(affix for affix in map(normalize, values) if affix)
+
+        self._prefixes = build_affix_trie(sorted(prefixes))
+        self._suffixes = build_affix_trie(sorted(suffixes), reverse=True)
+
+        # Base entera (puta-s) o sin su vocal final ante sufijo vocálico (put-ita)
+        stems: Dict[str, List[int]] = {}
+        truncated: Dict[str, List[int]] = {}
+        for entry_id, word in enumerate(words):
+            stems.setdefault(word, []).append(entry_id)
+            if len(word) > MIN_STEM and word[-1] in VOWELS:
+                stem = word[:-1]
+                truncated.setdefault(stem, []).append(entry_id)
+                for plain, spelled in STEM_ALTERNATIONS:
+                    if stem.endswith(plain):
+                        truncated.setdefault(stem[:-len(plain)] + spelled, []).append(entry_id)
+
+        self._stems = {stem: tuple(ids) for stem, ids in stems.items()}
+        self._truncated = {stem: tuple(ids) for stem, ids in truncated.items()}
+
+    def _strip_prefixes(self, word: str) -> List[int]:
+        """Posiciones a las que se llega quitando prefijos del inicio (incluida la 0)"""
+        starts = [0]
+        limit = len(word) - MIN_STEM
+        for start in starts:
+            node = self._prefixes
+            for position in range(start, limit):
+                node = node.get(word[position])
+                if node is None:
+                    break
+                if None in node and position + 1 not in starts:
+                    starts.append(position + 1)
+        return starts
+
+    def _strip_suffixes(self, word: str) -> Dict[int, bool]:
+        """Posiciones a las que se llega quitando sufijos del final.
+
+        El valor indica si lo que sigue a esa posición empieza por vocal
+        (solo entonces vale la base truncada). La posición final, sin
+        sufijos, va con False.
+        """
+        ends = {len(word): False}
+        pending = [len(word)]
+        while pending:
+            node = self._suffixes
+            for position in range(pending.pop() - 1, MIN_STEM - 1, -1):
+                node = node.get(word[position])
+                if node is None:
+                    break
+                if None in node:
+                    if position not in ends:
+                        pending.append(position)
+                        ends[position] = node[None]
+                    elif node[None]:
+                        ends[position] = True
+        return ends
+
+    def _scan_derived(self, word: str) -> Tuple[int, Dict[int, int]]:
+        """Bits de las bases que, con prefijos y sufijos, forman la palabra y el id por bit"""
+        if not self._suffixes and not self._prefixes:
+            return 0, {}
+
+        masks = self._masks
+        mask = 0
+        found: Dict[int, int] = {}
+        ends = self._strip_suffixes(word)
+
+        for start in self._strip_prefixes(word):
+            for end, before_vowel in ends.items():
+                if end - start < MIN_STEM or (start == 0 and end == len(word)):
+                    continue
+                stem = word[start:end]
+                ids = self._stems.get(stem, ())
+                if before_vowel:
+                    ids += self._truncated.get(stem, ())
+                for entry_id in ids:
+                    bits = masks[entry_id]
+                    mask |= bits
+                    while bits:
+                        bit = bits & -bits
+                        bits ^= bit
+                        if found.get(bit, entry_id) >= entry_id:
+                            found[bit] = entry_id
+
+        return mask, found
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def match(self, word: str) -> Optional[Tuple[str, str, bool]]:
+        """Busca una palabra normalizada: (categoría, término, es_frase) o None"""
+        if not word:
+            return None
+
+        # La palabra exacta también está contenida en sí misma: sin bits de
+        # contenedor no hace falta recorrer el autómata con centinelas
+        container, container_rep = self._scan_container(word)
+        exact, exact_id = self._scan_exact(word) if container else (0, -1)
+        contained, found = self._scan_contained(word)
+        derived, derived_ids = self._scan_derived(word)
+
+        mask = exact | contained | container | derived
+        if not mask:
+            return None
+
+        bit = mask & -mask
+        if exact & bit:
+            entry_id = exact_id
+        elif contained & bit:
+            entry_id = found[bit][1]
+        elif container & bit:
+            entry_id = container_rep
+        else:
+            entry_id = derived_ids[bit]
+
+        return self._result(entry_id, bit)
+
+    def match_fuzzy(self, word: str, max_distance: int = 2) -> Optional[Tuple[str, str, bool]]:
+        """Entrada más cercana a la palabra con erratas (pendjo, retrazado) o None.
+
+        La distancia admitida depende de la longitud de la palabra (ver
+        fuzzy_index.DISTANCE_BY_LENGTH); a igual distancia decide la prioridad
+        habitual de categorías.
+        """
+        best = None
+        for distance, entry_id in self.fuzzy.lookup(word, max_distance):
+            if best is not None and distance > best[0]:
+                break
+            mask = self._masks[entry_id]
+            candidate = (distance, mask & -mask, entry_id)
+            if best is None or candidate < best:
+                best = candidate
+
+        if best is None:
+            return None
+        return self._result(best[2], best[1])
+
+    def _result(self, entry_id: int, bit: int) -> Tuple[str, str, bool]:
+        """(categoría, término original, es_frase) de una entrada para uno de sus bits"""
+        index = bit.bit_length() - 1
+        return (
+            self.categories[index // 2],
+            self.original(entry_id, bit),
+            bool(index % 2),
+        )
+
+    def find_spans(self, text: str) -> List[Tuple[int, int]]:
+        """Tramos (inicio, fin) de los términos del léxico dentro de un texto normalizado.
+
+        Una sola pasada del Aho-Corasick; de los tramos solapados se queda
+        con el que empieza antes y, a igual inicio, con el más largo.
+        """
+        goto, fail, outputs = self._ac_goto, self._ac_fail, self._ac_outputs
+        found: List[Tuple[int, int]] = []
+        node = 0
+
+        for end, ch in enumerate(text, 1):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for _, (_, length, _) in outputs[node]:
+                found.append((end - length, -end))
+
+        spans = []
+        last_end = 0
+        for start, negative_end in sorted(found):
+            if start >= last_end:
+                spans.append((start, -negative_end))
+                last_end = -negative_end
+        return spans
+
+    def contains_entry(self, word: str) -> bool:
+        """¿Contiene la palabra normalizada algún término completo del léxico?"""
+        return bool(word) and (
+            self._scan_exact(word)[0] != 0
+            or self._scan_contained(word)[0] != 0
+            or self._scan_derived(word)[0] != 0
+        )
+
+    def is_entry(self, word: str) -> bool:
+        """¿Es la palabra normalizada un término del léxico o una forma derivada suya (pendejito)?
+
+        Más estricto que contains_entry: una palabra que solo contiene un
+        término ("cojones" contiene "ojon") o está dentro de uno no cuenta.
+        """
+        return bool(word) and (self._scan_exact(word)[0] != 0 or self._scan_derived(word)[0] != 0)
+
+    def memory_report(self) -> Dict[str, int]:
+        """Bytes aproximados de cada estructura del matcher (y el total)"""
+        report = {
+            'entries': len(self._masks),
+            'pool_bytes': sys.getsizeof(self._pool) + sys.getsizeof(self._offsets)
+            + sys.getsizeof(self._masks),
+            'originals_bytes': sys.getsizeof(self._original_pool)
+            + sys.getsizeof(self._original_offsets) + sys.getsizeof(self._original_first),
+            'container_states': len(self._sam_marks),
+            'container_bytes': sum(sys.getsizeof(part) for part in (
+                self._sam_labels, self._sam_targets, self._sam_starts, self._sam_marks, self._sam_reps
+            )),
+            'contained_nodes': len(self._ac_goto),
+            'contained_bytes': _deep_size((self._ac_goto, self._ac_fail, self._ac_outputs)),
+            'morphology_bytes': _deep_size((self._prefixes, self._suffixes, self._stems, self._truncated)),
+            'fuzzy_bytes': self.fuzzy.memory_bytes(),
+        }
+        report['total_bytes'] = (report['pool_bytes'] + report['originals_bytes'] + report['container_bytes']
+                                 + report['contained_bytes'] + report['morphology_bytes'] + report['fuzzy_bytes'])
+        return report
+
+
+def _deep_size(obj, seen: Optional[Set[int]] = None) -> int:
+    """sys.getsizeof recursivo para listas, tuplas y dicts (sin contar objetos compartidos dos veces)"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(key, seen) + _deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_size(item, seen) for item in obj)
+    return size
@@ -0,0 +1,60 @@
+# tests/test_analyze_events.py - POST /api/analyze/events: segmentación en oraciones y caché compartida
+
+import json
+import uuid
+
+import pytest
+
+import app as server
+from services.segmentation import split_sentences
+
+SPACED = 'Hola a todos. Eres un p. e. n. d. e. j. o. Nos vemos mañana.'
+
+
+@pytest.fixture
+def client():
+    return server.app.test_client()
+
+
+def unique(text):
+    """Texto que no está en la caché de resultados de otras pruebas"""
+    return f'{text} Ref {uuid.uuid4().hex}.'
+
+
+def stream_events(client, text):
+    response = client.post('/api/analyze/events', json={'text': text})
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+
+
+def test_sentences_keep_spaced_letter_runs_together():
+    sentences = [SPACED[start:end] for start, end in split_sentences(SPACED)]
+    assert ''.join(sentences) == SPACED
+    assert sentences[0] == 'Hola a todos. '
+    assert 'p. e. n. d. e. j. o. ' in sentences[1]
+    other = 'Hola. Adiós. Vitamina A. Fin.'
+    assert [other[start:end] for start, end in split_sentences(other)] == ['Hola. ', 'Adiós. ', 'Vitamina A. Fin.']
+
+
+def test_stream_reports_spaced_runs_like_analyze(client):
+    text = unique(SPACED)
+    events = stream_events(client, text)
+    streamed = [event['issue'] for event in events if event['event'] == 'issue']
+    expected = server.basic_analyzer.analyze(text)['issues']
+    assert any(issue['original_text'].startswith('p. e. n') for issue in expected)
+    assert streamed == expected
+    for issue in streamed:
+        assert text[issue['start']:issue['end']] == issue['original_text']
+
+
+def test_stream_does_not_fill_the_analyze_cache_entry(client):
+    text = unique(SPACED)
+    stream_events(client, text)
+    assert server.result_cache.get(server._cache_key(text, 'basic', server.basic_analyzer)) is None
+
+    result = client.post('/api/analyze', json={'text': text, 'mode': 'basic'}).get_json()
+    assert result['issues'] == server.basic_analyzer.analyze(text)['issues']
+
+    # La segunda llamada reutiliza lo ya calculado (la entrada de analyze() o la propia del streaming)
+    again = [event['issue'] for event in stream_events(client, text) if event['event'] == 'issue']
+    assert again == result['issues']
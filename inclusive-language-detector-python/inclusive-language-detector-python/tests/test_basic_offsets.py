@@ -0,0 +1,78 @@
+# tests/test_basic_offsets.py - Posiciones de los issues: análisis completo, streaming e incremental
+
+import pytest
+
+from benchmarks.corpus import generate
+from services.basic_analyzer import BasicAnalyzer
+from services.incremental_analyzer import IncrementalAnalyzer
+from services.segmentation import SentenceIndex
+
+REPEATED = 'Eres un pendejo. Tu primo también es un pendejo, pendejo y medio.'
+MULTI_SENTENCE = (
+    'Hola a todos.\tHoy  hablamos del   proyecto.\n\n'
+    '¡Qué   idiota eres! ¿Otra vez tarde, pendejo?\r\n'
+    'Eres un p e n d e j o,  y una  l.o.c.a 🙃 también.\n'
+    'Nos vemos mañana, cabrón.'
+)
+
+
+@pytest.fixture(scope='module')
+def basic():
+    return BasicAnalyzer()
+
+
+def assert_offsets(text, issues):
+    for issue in issues:
+        assert text[issue['start']:issue['end']] == issue['original_text']
+
+
+def corpus():
+    return [generate(kind, 1200, seed=seed) for kind in ('dense', 'evasion', 'mixed') for seed in range(3)]
+
+
+def test_repeated_terms_get_their_own_offsets(basic):
+    issues = basic.analyze(REPEATED)['issues']
+    assert_offsets(REPEATED, issues)
+    starts = [issue['start'] for issue in issues if 'pendejo' in issue['original_text']]
+    assert starts == [REPEATED.find('pendejo'), REPEATED.find('pendejo,'), REPEATED.rfind('pendejo')]
+
+
+def test_offsets_survive_irregular_whitespace_and_sentences(basic):
+    issues = basic.analyze(MULTI_SENTENCE)['issues']
+    assert_offsets(MULTI_SENTENCE, issues)
+    texts = [issue['original_text'] for issue in issues]
+    assert 'idiota' in texts and 'pendejo?' in texts and 'cabrón.' in texts
+    assert any(text.startswith('p e n d e j o') for text in texts)
+
+
+def test_sentence_index_bounds_stay_in_their_sentence():
+    index = SentenceIndex(MULTI_SENTENCE)
+    position = MULTI_SENTENCE.find('idiota')
+    assert index.sentence(position, len('idiota')) == '¡Qué   idiota eres!'
+    position = MULTI_SENTENCE.find('cabrón.')
+    assert index.sentence(position, len('cabrón.')) == 'Nos vemos mañana, cabrón.'
+
+
+@pytest.mark.parametrize('text', [REPEATED, MULTI_SENTENCE] + corpus())
+@pytest.mark.parametrize('size', [1, 7, 64])
+def test_stream_matches_analyze(basic, text, size):
+    expected = basic.analyze(text)['issues']
+    chunks = (text[index:index + size] for index in range(0, len(text), size))
+    streamed = [event['issue'] for event in basic.analyze_stream(chunks) if event['event'] == 'issue']
+    assert streamed == expected
+    assert_offsets(text, streamed)
+
+
+@pytest.mark.parametrize('text', [REPEATED, MULTI_SENTENCE] + corpus())
+def test_incremental_matches_analyze(basic, text):
+    incremental = IncrementalAnalyzer(basic)
+    result = incremental.analyze('doc', text=text)
+    assert result['issues'] == basic.analyze(text)['issues']
+    assert_offsets(text, result['issues'])
+
+    # Editar la segunda oración desplaza las posiciones de las siguientes
+    edited = text.replace('.', '. Eres un pendejo.', 1) if '.' in text else text + ' Eres un pendejo.'
+    result = incremental.analyze('doc', text=edited)
+    assert result['issues'] == basic.analyze(edited)['issues']
+    assert_offsets(edited, result['issues'])
+    assert result['incremental']['reused'] > 0
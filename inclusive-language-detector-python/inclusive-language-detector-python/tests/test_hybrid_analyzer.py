@@ -0,0 +1,74 @@
+# tests/test_hybrid_analyzer.py - Qué textos escala el modo híbrido a la IA
+
+import pytest
+
+from benchmarks.corpus import generate
+from services.basic_analyzer import BasicAnalyzer
+from services.hybrid_analyzer import HybridAnalyzer
+
+
+@pytest.fixture(scope='module')
+def basic():
+    return BasicAnalyzer()
+
+
+@pytest.fixture
+def hybrid(basic):
+    calls = []
+    analyzer = HybridAnalyzer(basic, lambda text: calls.append(text) or {'issues': []})
+    analyzer.calls = calls
+    return analyzer
+
+
+def test_clean_text_stays_on_basic_tier(hybrid):
+    # "con", "los", "del" y "para" solo aparecen dentro de términos más largos del léxico
+    result = hybrid.analyze('La profesora habló con los alumnos del barrio para preparar la reunión.')
+    assert result['tier'] == 'basic'
+    assert result['escalation']['sentences'] == 0
+    assert hybrid.calls == []
+    assert hybrid.stats()['llm_calls_avoided'] == 1
+
+
+def test_clean_corpus_mostly_avoids_llm(hybrid):
+    for seed in range(20):
+        hybrid.analyze(generate('clean', 300, seed=seed))
+    # Los que escalan llevan "trabajo", que contiene un término completo ("traba")
+    assert all('trabaj' in text for text in hybrid.calls)
+    assert hybrid.stats()['answered_by']['basic'] >= 10
+
+
+def test_offensive_sentence_is_escalated_alone(hybrid):
+    result = hybrid.analyze('Eres un pendejo. Hoy llueve en el barrio.')
+    assert result['tier'] == 'pro'
+    assert result['escalation']['signals'] == {'candidate': 1}
+    assert hybrid.calls == ['Eres un pendejo.']
+
+
+def test_spaced_letters_are_escalated(hybrid):
+    result = hybrid.analyze('Qué p e n d e j o eres.')
+    assert result['tier'] == 'pro'
+    assert result['escalation']['signals'] == {'evasion': 1}
+    assert hybrid.calls == ['Qué p e n d e j o eres.']
+
+
+@pytest.mark.parametrize('text', ['Eres un p. e. n. d. e. j. o. Adiós.', 'Qué p e n d e j o s son.'])
+def test_spaced_runs_from_scan_are_escalated(hybrid, text):
+    result = hybrid.analyze(text)
+    assert result['escalation']['signals'] == {'evasion': 1}
+    assert 'p' in hybrid.calls[0] and 'Adiós' not in hybrid.calls[0]
+
+
+@pytest.mark.parametrize('text', ['Habló c o n los alumnos.', 'Mira a b c d hoy.'])
+def test_spaced_letters_without_a_complete_term_stay_on_basic_tier(hybrid, text):
+    # "c o n" solo forma parte de un término más largo ("maricón"): no es una evasión
+    result = hybrid.analyze(text)
+    assert result['tier'] == 'basic'
+    assert hybrid.calls == []
+
+
+def test_llm_error_keeps_basic_result(basic):
+    hybrid = HybridAnalyzer(basic, lambda text: {'error': 'caído'})
+    result = hybrid.analyze('Eres un pendejo.')
+    assert result['tier'] == 'basic'
+    assert result['escalation']['error'] == 'caído'
+    assert len(result['issues']) >= 1
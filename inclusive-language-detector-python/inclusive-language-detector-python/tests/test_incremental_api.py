@@ -0,0 +1,112 @@
+# tests/test_incremental_api.py - POST /api/analyze/incremental: texto, hashes, diffs y errores
+
+import uuid
+
+import pytest
+
+from app import app, basic_analyzer
+
+SENTENCES = ['Hola a todos. ', 'Eres un pendejo. ', 'Nos vemos mañana.']
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+@pytest.fixture
+def document(client):
+    """Documento ya analizado una vez: (id, hashes de sus oraciones)"""
+    document_id = f'doc-{uuid.uuid4().hex}'
+    response = client.post('/api/analyze/incremental', json={'document_id': document_id, 'text': ''.join(SENTENCES)})
+    assert response.status_code == 200
+    return document_id, response.get_json()['sentences']
+
+
+def post(client, **payload):
+    return client.post('/api/analyze/incremental', json=payload)
+
+
+def assert_issues_match_text(result, text):
+    for issue in result['issues']:
+        assert text[issue['start']:issue['end']] == issue['original_text']
+
+
+def test_full_text_is_split_and_analyzed(client, document):
+    document_id, hashes = document
+    assert len(hashes) == 3
+    result = post(client, document_id=document_id, text=''.join(SENTENCES)).get_json()
+    assert result['incremental'] == {'sentences': 3, 'reanalyzed': 0, 'reused': 3}
+    expected = basic_analyzer.analyze(''.join(SENTENCES))
+    assert result['issues'] == expected['issues']
+    assert_issues_match_text(result, ''.join(SENTENCES))
+
+
+def test_known_sentences_can_be_sent_by_hash(client, document):
+    document_id, hashes = document
+    new_last = 'Qué idiota.'
+    response = post(client, document_id=document_id,
+                    sentences=[{'hash': hashes[0]}, {'hash': hashes[1]}, {'text': new_last}])
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['incremental']['reused'] == 2
+    text = SENTENCES[0] + SENTENCES[1] + new_last
+    assert result['issues'] == basic_analyzer.analyze(text)['issues']
+    assert_issues_match_text(result, text)
+
+
+def test_diff_replaces_sentences_of_last_version(client, document):
+    document_id, hashes = document
+    response = post(client, document_id=document_id,
+                    diff={'start': 1, 'delete': 1, 'insert': [{'text': 'Eres una idiota. '}]})
+    assert response.status_code == 200
+    result = response.get_json()
+    assert result['incremental'] == {'sentences': 3, 'reanalyzed': 1, 'reused': 2}
+    text = SENTENCES[0] + 'Eres una idiota. ' + SENTENCES[2]
+    assert result['original_text'] == text
+    assert result['issues'] == basic_analyzer.analyze(text)['issues']
+    assert result['sentences'][0] == hashes[0] and result['sentences'][2] == hashes[2]
+
+
+@pytest.mark.parametrize('diff', [
+    {'start': 'a'},
+    {'start': 0, 'delete': '1'},
+    {'start': -1},
+    {'start': 0, 'delete': -2},
+    {'start': True},
+    {'start': 1.5},
+    {'start': 4},
+    {'start': 2, 'delete': 5},
+    {'start': 0, 'insert': 'Hola.'},
+    {'start': 0, 'insert': ['Hola.']},
+])
+def test_invalid_diff_is_a_bad_request(client, document, diff):
+    document_id, _ = document
+    response = post(client, document_id=document_id, diff=diff)
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_diff_on_unknown_document_asks_for_full_text(client):
+    response = post(client, document_id='never-seen', diff={'start': 0, 'delete': 0, 'insert': []})
+    assert response.status_code == 409
+    assert response.get_json()['missing_document'] is True
+
+
+def test_unknown_hash_is_reported_as_missing(client, document):
+    document_id, hashes = document
+    response = post(client, document_id=document_id, sentences=[{'hash': hashes[0]}, {'hash': 'f' * 64}])
+    assert response.status_code == 409
+    assert response.get_json()['missing'] == ['f' * 64]
+
+
+@pytest.mark.parametrize('payload', [
+    {'text': 'Hola.'},
+    {'document_id': 'x', 'text': 'Hola.', 'mode': 'pro'},
+    {'document_id': 'x', 'text': 3},
+    {'document_id': 'x', 'sentences': 'Hola.'},
+    {'document_id': 'x', 'diff': [1]},
+    {'document_id': 'x'},
+])
+def test_malformed_requests_are_bad_requests(client, payload):
+    assert client.post('/api/analyze/incremental', json=payload).status_code == 400
@@ -0,0 +1,81 @@
+# tests/test_lexicon_cache.py - Artefacto del léxico: dónde se lee y se escribe
+
+import os
+import pickle
+
+import pytest
+
+from services import lexicon_cache
+from services.lexicon_cache import LexiconCache
+
+KEY = 'ab' * 32
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LexiconCache(str(tmp_path / 'primary'))
+    cache.fallback = str(tmp_path / 'fallback')
+    return cache
+
+
+def plant(cache, directory, mode=0o700, file_mode=0o644):
+    """Deja en `directory` un artefacto válido para KEY, como haría otro proceso"""
+    os.makedirs(directory, exist_ok=True)
+    os.chmod(directory, mode)
+    path = cache.path(KEY, directory)
+    with open(path, 'wb') as handle:
+        pickle.dump({'format': LexiconCache.FORMAT_VERSION, 'key': KEY,
+                     'database': {'planted': True}, 'matcher': None}, handle)
+    os.chmod(path, file_mode)
+    return path
+
+
+def test_round_trip_in_primary_directory(cache):
+    assert cache.save(KEY, {'sexist': {}}, None) == cache.path(KEY, cache.primary)
+    assert cache.load(KEY) == ({'sexist': {}}, None)
+    assert not os.path.exists(cache.fallback)
+
+
+def test_fallback_is_ignored_while_primary_is_writable(cache):
+    plant(cache, cache.fallback)
+    assert cache.directories == [cache.primary]
+    assert cache.load(KEY) is None
+
+
+@pytest.fixture
+def read_only_primary(cache, monkeypatch):
+    monkeypatch.setattr(lexicon_cache, '_writable', lambda directory: False)
+    return cache
+
+
+def test_fallback_is_private_when_primary_is_read_only(read_only_primary):
+    cache = read_only_primary
+    assert cache.save(KEY, {'sexist': {}}, None) == cache.path(KEY, cache.fallback)
+    assert os.stat(cache.fallback).st_mode & 0o777 == 0o700
+    assert cache.load(KEY) == ({'sexist': {}}, None)
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='sin permisos POSIX')
+def test_shared_fallback_directory_is_not_trusted(read_only_primary):
+    cache = read_only_primary
+    plant(cache, cache.fallback, mode=0o777)
+    assert cache.load(KEY) is None
+    assert cache.save(KEY, {'sexist': {}}, None) is None
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid'), reason='sin permisos POSIX')
+def test_writable_by_others_artifact_is_not_loaded(read_only_primary):
+    cache = read_only_primary
+    plant(cache, cache.fallback, file_mode=0o666)
+    assert cache.load(KEY) is None
+
+
+@pytest.mark.skipif(not hasattr(os, 'getuid') or os.getuid() != 0, reason='hace falta root para chown')
+def test_artifact_of_another_user_is_not_loaded(read_only_primary):
+    cache = read_only_primary
+    path = plant(cache, cache.fallback)
+    os.chown(path, 1, 1)
+    assert cache.load(KEY) is None
+    os.chown(cache.fallback, 1, 1)
+    os.chown(path, 0, 0)
+    assert cache.load(KEY) is None
@@ -0,0 +1,225 @@
+# tests/test_llm_gateway.py - Circuit breaker, limitador de ritmo y hedging del gateway del LLM
+
+import asyncio
+import time
+
+import pytest
+
+from services.llm_gateway import CircuitBreaker, LatencyTracker, LLMCallError, LLMGateway, TokenBucket
+
+
+class FakeBackend:
+    """Backend en memoria: `delays` y `errors` se consumen llamada a llamada"""
+
+    name = 'fake'
+
+    def __init__(self, delays=(), errors=()):
+        self.delays = list(delays)
+        self.errors = list(errors)
+        self.calls = 0
+        self.in_flight = 0
+        self.cancelled = 0
+
+    def _next(self):
+        self.calls += 1
+        delay = self.delays.pop(0) if self.delays else 0.0
+        error = self.errors.pop(0) if self.errors else None
+        return delay, error
+
+    async def complete_async(self, kwargs, timeout, max_retries, headers):
+        delay, error = self._next()
+        self.in_flight += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        if error is not None:
+            raise error
+        return {'call': self.calls}
+
+    def complete(self, kwargs, timeout, max_retries, headers):
+        delay, error = self._next()
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return {'call': self.calls}
+
+
+def half_open_gateway(backend, limiter=None):
+    """Gateway con el circuito abierto y el enfriamiento ya cumplido: la siguiente llamada es la prueba"""
+    breaker = CircuitBreaker(cooldown=0.01)
+    breaker.state = 'open'
+    breaker._opened_at = time.monotonic() - 1
+    return LLMGateway(backend, limiter=limiter or TokenBucket(rate=100.0, capacity=100.0),
+                      breaker=breaker, max_attempts=1, hedge_percentile=0)
+
+
+def starved_limiter() -> TokenBucket:
+    """Limitador sin tokens que tarda ~10 s en dar el siguiente"""
+    limiter = TokenBucket(rate=0.1, capacity=1.0)
+    limiter.tokens = 0.0
+    return limiter
+
+
+def test_breaker_opens_on_failures_and_closes_after_probe():
+    breaker = CircuitBreaker(failure_ratio=0.5, window=4, min_calls=4, cooldown=0.05)
+    for success in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record(success)
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()  # una sola llamada de prueba
+    breaker.record(True)
+    assert breaker.state == 'closed'
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens_breaker():
+    breaker = CircuitBreaker(cooldown=0.01)
+    breaker.state = 'open'
+    breaker._opened_at = time.monotonic() - 1
+    assert breaker.admit() is True
+    breaker.record(False)
+    assert breaker.state == 'open'
+    assert breaker.opened == 1
+
+
+def test_limiter_deadline_releases_probe_async():
+    gateway = half_open_gateway(FakeBackend(), starved_limiter())
+    with pytest.raises(LLMCallError) as info:
+        asyncio.run(gateway.complete_async({}, time.monotonic() + 0.5))
+    assert info.value.kind == 'deadline'
+    assert gateway.breaker.state == 'half_open' and not gateway.breaker._probing
+
+    gateway.limiter = TokenBucket(rate=100.0, capacity=100.0)
+    assert asyncio.run(gateway.complete_async({}, time.monotonic() + 5)) == {'call': 1}
+    assert gateway.breaker.state == 'closed'
+
+
+def test_limiter_deadline_releases_probe_sync():
+    gateway = half_open_gateway(FakeBackend(), starved_limiter())
+    with pytest.raises(LLMCallError) as info:
+        gateway.complete({}, time.monotonic() + 0.5)
+    assert info.value.kind == 'deadline'
+    assert not gateway.breaker._probing
+
+    gateway.limiter = TokenBucket(rate=100.0, capacity=100.0)
+    assert gateway.complete({}, time.monotonic() + 5) == {'call': 1}
+    assert gateway.breaker.state == 'closed'
+
+
+def test_cancelled_while_waiting_on_limiter_releases_probe():
+    limiter = TokenBucket(rate=2.0, capacity=1.0)
+    limiter.tokens = 0.0  # el siguiente token llega en 0.5 s, dentro del plazo
+    backend = FakeBackend()
+    gateway = half_open_gateway(backend, limiter)
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(gateway.complete_async({}, time.monotonic() + 5), timeout=0.05)
+
+    asyncio.run(scenario())
+    assert backend.calls == 0
+    assert gateway.breaker.state == 'half_open' and not gateway.breaker._probing
+
+    gateway.limiter = TokenBucket(rate=100.0, capacity=100.0)
+    asyncio.run(gateway.complete_async({}, time.monotonic() + 5))
+    assert gateway.breaker.state == 'closed'
+
+
+def test_cancelled_attempt_releases_probe():
+    backend = FakeBackend(delays=[5.0])
+    gateway = half_open_gateway(backend)
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(gateway.complete_async({}, time.monotonic() + 10), timeout=0.05)
+
+    asyncio.run(scenario())
+    assert backend.cancelled == 1
+    assert not gateway.breaker._probing
+
+
+def test_retries_provider_failures_within_deadline():
+    backend = FakeBackend(errors=[LLMCallError('server', status=503)])
+    gateway = LLMGateway(backend, backoff=0.01, hedge_percentile=0)
+    assert asyncio.run(gateway.complete_async({}, time.monotonic() + 5)) == {'call': 2}
+    assert gateway.counters['retries'] == 1
+    assert gateway.counters['attempts'] == 2
+
+
+def test_request_errors_are_not_retried():
+    backend = FakeBackend(errors=[LLMCallError('bad_request', status=400)])
+    gateway = LLMGateway(backend, backoff=0.01, hedge_percentile=0)
+    with pytest.raises(LLMCallError) as info:
+        gateway.complete({}, time.monotonic() + 5)
+    assert info.value.kind == 'bad_request'
+    assert backend.calls == 1
+    assert gateway.counters['failures'] == 0
+
+
+def test_circuit_open_rejects_without_calling_backend():
+    backend = FakeBackend()
+    breaker = CircuitBreaker(cooldown=60)
+    breaker.state = 'open'
+    breaker._opened_at = time.monotonic()
+    gateway = LLMGateway(backend, breaker=breaker)
+    with pytest.raises(LLMCallError) as info:
+        gateway.complete({}, time.monotonic() + 5)
+    assert info.value.kind == 'circuit_open'
+    assert backend.calls == 0
+    assert gateway.counters['rejected_open'] == 1
+
+
+def warm_latency(seconds: float) -> LatencyTracker:
+    latency = LatencyTracker(min_samples=1)
+    latency.add(seconds)
+    return latency
+
+
+def test_slow_attempt_is_hedged_and_loser_cancelled():
+    backend = FakeBackend(delays=[2.0, 0.0])
+    gateway = LLMGateway(backend, max_hedge_ratio=1.0, latency=warm_latency(0.02))
+
+    async def scenario():
+        result = await gateway.complete_async({}, time.monotonic() + 5)
+        return result, backend.in_flight
+
+    result, in_flight = asyncio.run(scenario())
+    assert result == {'call': 2}
+    assert gateway.counters['hedges'] == 1 and gateway.counters['hedge_wins'] == 1
+    assert in_flight == 0 and backend.cancelled == 1
+    assert gateway.breaker.state == 'closed'
+
+
+def test_cancelling_caller_cancels_primary_while_waiting_to_hedge():
+    backend = FakeBackend(delays=[5.0])
+    gateway = LLMGateway(backend, max_hedge_ratio=1.0, latency=warm_latency(1.0))
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(gateway.complete_async({}, time.monotonic() + 10), timeout=0.05)
+        return backend.in_flight
+
+    assert asyncio.run(scenario()) == 0
+    assert backend.cancelled == 1
+    assert gateway.counters['hedges'] == 0
+
+
+def test_token_bucket_respects_deadline_and_rate_limit_pause():
+    limiter = TokenBucket(rate=1.0, capacity=1.0)
+    now = time.monotonic()
+    assert limiter.reserve(now + 1) == 0.0
+    assert limiter.reserve(now + 0.1) is None  # el siguiente token llega tarde: no se consume
+    assert limiter.tokens == pytest.approx(0.0, abs=0.01)
+
+    limiter.observe({}, rate_limited=True, retry_after=2.0)
+    assert not limiter.try_acquire()
+    assert limiter.stats()['paused_for_seconds'] > 1.5
@@ -0,0 +1,104 @@
+# tests/test_llm_schema.py - Decodificación, reparación y lectura incremental de respuestas del LLM
+
+import json
+
+import pytest
+
+from services.llm_schema import IssueStream, SchemaError, decode_analysis, decode_batch
+
+ISSUES = [
+    {'type': 'offensive', 'original_text': 'pendejo', 'suggestion': 'persona distraída',
+     'severity': 'high', 'explanation': 'Insulto {directo}', 'confidence': 0.95},
+    {'type': 'ableist', 'original_text': 'loco', 'suggestion': 'sorprendente',
+     'severity': 'low', 'explanation': 'Estigmatiza', 'confidence': 0.7},
+]
+RESPONSE = json.dumps({'issues': ISSUES, 'overall_feedback': 'Revisa el tono.',
+                       'stats': {'inclusive_score': 60}}, ensure_ascii=False)
+
+
+def test_valid_response_decodes_without_repair():
+    analysis = decode_analysis(RESPONSE)
+    assert [issue.to_dict() for issue in analysis.issues] == ISSUES
+    assert analysis.overall_feedback == 'Revisa el tono.'
+    assert analysis.inclusive_score == 60
+    assert not analysis.repaired and analysis.problems == []
+
+
+def test_compact_schema_is_expanded():
+    raw = json.dumps({'issues': [{'type': 'sexist', 'text': 'marimacho', 'fix': 'mujer', 'sev': 'h', 'why': 'x'}]})
+    issue = decode_analysis(raw).issues[0]
+    assert (issue.type, issue.original_text, issue.suggestion, issue.severity) == ('sexist', 'marimacho', 'mujer', 'high')
+
+
+def test_fences_surrounding_text_and_trailing_commas_are_repaired():
+    raw = 'Aquí va:\n```json\n' + RESPONSE[:-1] + ',}\n```\nSaludos'
+    analysis = decode_analysis(raw)
+    assert analysis.repaired
+    assert len(analysis.issues) == 2
+
+
+def test_truncated_response_keeps_complete_issues():
+    cut = RESPONSE.index('"loco"')
+    analysis = decode_analysis(RESPONSE[:cut])
+    assert analysis.repaired
+    assert [issue.original_text for issue in analysis.issues] == ['pendejo']
+
+
+def test_invalid_fields_are_coerced_and_reported():
+    raw = json.dumps({'issues': [
+        {'type': 'Racista', 'original_text': ' indio ', 'severity': 'ALTA', 'confidence': 7},
+        {'type': 'offensive', 'original_text': ''},
+        'no es un objeto',
+    ], 'stats': {'inclusive_score': 400}})
+    analysis = decode_analysis(raw)
+    assert len(analysis.issues) == 1
+    issue = analysis.issues[0]
+    assert (issue.type, issue.original_text, issue.severity, issue.confidence) == ('offensive', 'indio', 'medium', 1.0)
+    assert analysis.inclusive_score is None
+    assert len(analysis.problems) == 3
+
+
+@pytest.mark.parametrize('raw', ['', 'lo siento, no puedo', '[1, 2]', '{"issues": [{"type": "sexist"'])
+def test_unusable_responses_raise_schema_error(raw):
+    with pytest.raises(SchemaError):
+        decode_analysis(raw)
+
+
+def test_issue_stream_emits_each_issue_once_whatever_the_chunking():
+    for size in (1, 3, 7, 40, len(RESPONSE)):
+        stream = IssueStream()
+        emitted = []
+        for start in range(0, len(RESPONSE), size):
+            emitted.extend(stream.feed(RESPONSE[start:start + size]))
+        assert [issue.to_dict() for issue in emitted] == ISSUES, size
+        assert stream.count == 2
+        assert stream.buffer == RESPONSE
+        assert [issue.to_dict() for issue in decode_analysis(stream.buffer).issues] == ISSUES
+
+
+def test_issue_stream_waits_for_complete_issue():
+    stream = IssueStream()
+    cut = RESPONSE.index('Insulto') + 4  # dentro de un texto con '}' más adelante
+    assert stream.feed(RESPONSE[:cut]) == []
+    assert [issue.original_text for issue in stream.feed(RESPONSE[cut:])] == ['pendejo', 'loco']
+    assert stream.feed(' ') == []
+
+
+def test_issue_stream_reports_invalid_issues():
+    stream = IssueStream()
+    found = stream.feed('{"issues": [{"type": "offensive"}, {"original_text": "cabrón"}]}')
+    assert [issue.original_text for issue in found] == ['cabrón']
+    assert stream.problems == ['issue sin original_text', "tipo desconocido '': se usa offensive"]
+
+
+def test_batch_keeps_valid_items_and_salvages_truncated_results():
+    item = {'issues': ISSUES[:1]}
+    raw = json.dumps({'results': {'0': item, '1': {'issues': 'x'}, '2': item}})
+    analyses, problems = decode_batch(raw)
+    assert sorted(analyses) == ['0', '2']
+    assert problems == ['elemento 1 sin issues válidos']
+
+    truncated = raw[:raw.index('"2"') + 10]
+    analyses, problems = decode_batch(truncated)
+    assert sorted(analyses) == ['0']
+    assert analyses['0'].repaired
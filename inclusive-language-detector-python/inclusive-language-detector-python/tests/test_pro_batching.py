@@ -0,0 +1,73 @@
+# tests/test_pro_batching.py - Micro-lotes pro: prompt y esquema según PRO_PROMPT_MODE
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from services.basic_analyzer import BasicAnalyzer
+from services.llm_backends import ReplayBackend
+from services.pro_analyzer import ProAnalyzer
+
+TEXTS = [
+    'El informe trimestral está listo para revisión y recoge las cifras de ventas de todas las regiones. '
+    'Las conclusiones se presentarán en la reunión del lunes con el equipo directivo. '
+    'Eres un pendejo por no leerlo antes. '
+    'Después de la reunión se enviará el acta a todos los asistentes y se abrirá un plazo de comentarios.',
+    'Nos vemos mañana en la oficina central.',
+]
+
+
+class CapturingBackend(ReplayBackend):
+    """Respuestas sintéticas (un issue por texto) y registro de cada petición"""
+
+    def __init__(self):
+        super().__init__(issues=1)
+        self.requests = []
+
+    async def complete_async(self, kwargs, timeout, max_retries=2, headers=None):
+        self.requests.append(kwargs)
+        return await super().complete_async(kwargs, timeout, max_retries, headers)
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    monkeypatch.setenv('PRO_STRUCTURED_OUTPUTS', '1')
+    basic = BasicAnalyzer()
+    return ProAnalyzer(candidate_finder=basic.candidate_spans, backend=CapturingBackend())
+
+
+def analyze_many(analyzer, texts):
+    return asyncio.run(analyzer.analyze_many_async(texts, time.monotonic() + 5))
+
+
+def test_compact_mode_batches_with_compact_prompt_and_schema(analyzer):
+    analyzer.prompt_mode = 'compact'
+    results = analyze_many(analyzer, TEXTS)
+
+    assert len(analyzer.backend.requests) == 1
+    kwargs = analyzer.backend.requests[0]
+    prompt = kwargs['messages'][-1]['content']
+    assert 'NORMALIZADO' not in prompt and 'informe trimestral' not in prompt
+    assert 'pendejo' in prompt
+    assert kwargs['max_tokens'] == min(4000, analyzer.compact_max_tokens * len(TEXTS))
+
+    schema = kwargs['response_format']['json_schema']
+    assert schema['name'] == 'inclusive_compact_batch'
+    item = schema['schema']['properties']['results']['properties']['0']
+    assert set(item['properties']['issues']['items']['properties']) == {'type', 'text', 'fix', 'sev', 'why'}
+
+    assert all('error' not in result for result in results)
+    assert [len(result['issues']) for result in results] == [1, 1]
+    assert analyzer.usage.totals.get('compact_batch', {}).get('calls') == 1
+
+
+def test_full_mode_keeps_full_batch_prompt(analyzer):
+    results = analyze_many(analyzer, TEXTS)
+
+    kwargs = analyzer.backend.requests[0]
+    assert len(analyzer.backend.requests) == 1
+    assert 'NORMALIZADO' in kwargs['messages'][-1]['content']
+    assert kwargs['response_format']['json_schema']['name'] == 'inclusive_batch'
+    assert [len(result['issues']) for result in results] == [1, 1]
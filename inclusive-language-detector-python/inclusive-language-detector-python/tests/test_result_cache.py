@@ -0,0 +1,141 @@
+# tests/test_result_cache.py - LRU, caducidad y almacenes compartidos de la caché de resultados
+
+import os
+import time
+
+import pytest
+
+from services.result_cache import FileCacheBackend, ResultCache, SqliteCacheBackend
+
+
+def test_key_depends_on_every_part():
+    base = ResultCache.key('texto', 'basic', 'v1', 'gpt')
+    assert base == ResultCache.key('texto', 'basic', 'v1', 'gpt')
+    assert len({base, ResultCache.key('texto ', 'basic', 'v1', 'gpt'),
+                ResultCache.key('texto', 'pro', 'v1', 'gpt'),
+                ResultCache.key('texto', 'basic', 'v2', 'gpt'),
+                ResultCache.key('texto', 'basic', 'v1', 'otro')}) == 5
+
+
+def test_hits_return_independent_copies():
+    cache = ResultCache(max_entries=4, ttl=60)
+    cache.set('k', {'issues': [1]})
+    first = cache.get('k')
+    first['issues'].append(2)
+    assert cache.get('k') == {'issues': [1]}
+    assert cache.stats()['hits'] == 2
+
+
+def test_errors_and_fallbacks_are_not_cached():
+    cache = ResultCache(max_entries=4, ttl=60)
+    cache.set('error', {'error': 'x'})
+    cache.set('fallback', {'issues': [], 'fallback': {'reason': 'timeout'}})
+    assert cache.get('error') is None and cache.get('fallback') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2, ttl=60)
+    cache.set('a', {'v': 'a'})
+    cache.set('b', {'v': 'b'})
+    cache.get('a')
+    cache.set('c', {'v': 'c'})
+    assert cache.get('b') is None
+    assert cache.get('a') == {'v': 'a'} and cache.get('c') == {'v': 'c'}
+    assert cache.stats()['size'] == 2
+
+
+def test_entries_expire_after_ttl():
+    cache = ResultCache(max_entries=4, ttl=0.05)
+    cache.set('k', {'v': 1})
+    assert cache.get('k') == {'v': 1}
+    time.sleep(0.06)
+    assert cache.get('k') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ResultCache(max_entries=0, ttl=60)
+    cache.set('k', {'v': 1})
+    assert cache.get('k') is None
+    assert cache.stats()['misses'] == 0
+
+
+@pytest.fixture(params=['sqlite', 'file'])
+def backend(request, tmp_path):
+    if request.param == 'sqlite':
+        return SqliteCacheBackend(str(tmp_path / 'results.sqlite3'), purge_every=4)
+    return FileCacheBackend(str(tmp_path / 'results'), purge_every=4)
+
+
+def stored_keys(backend):
+    if isinstance(backend, SqliteCacheBackend):
+        with backend._lock:
+            return {row[0] for row in backend._connection().execute('SELECT key FROM results')}
+    return {name[:-len('.json')] for name in os.listdir(backend.directory) if name.endswith('.json')}
+
+
+def test_shared_hit_keeps_original_expiry(backend):
+    writer = ResultCache(max_entries=4, ttl=0.3, backend=backend)
+    writer.set('k', {'v': 1})
+    time.sleep(0.2)
+
+    reader = ResultCache(max_entries=4, ttl=0.3, backend=backend)
+    assert reader.get('k') == {'v': 1}
+    assert reader.stats()['shared_hits'] == 1
+    time.sleep(0.15)
+    # Con la caducidad reiniciada en el acierto seguiría viva hasta 0.5 s
+    assert reader.get('k') is None
+
+
+def test_expired_entries_are_purged_on_write(backend):
+    for index in range(3):
+        backend.set(f'old{index}', '{}', 0.01)
+    time.sleep(0.02)
+    assert stored_keys(backend) == {'old0', 'old1', 'old2'}
+
+    backend.set('new', '{}', 60)  # cuarta escritura: toca purgar
+    assert stored_keys(backend) == {'new'}
+
+
+def test_expired_entry_is_removed_on_read(backend):
+    backend.set('gone', '{}', 0.01)
+    backend.set('kept', '{}', 60)
+    time.sleep(0.02)
+    assert backend.get('gone') is None
+    assert stored_keys(backend) == {'kept'}
+    assert backend.get('kept')[0] == '{}'
+
+
+def test_sqlite_connection_is_opened_once_per_process(tmp_path, monkeypatch):
+    backend = SqliteCacheBackend(str(tmp_path / 'results.sqlite3'))
+    # Con preload_app el master solo construye el backend: no abre nada
+    assert backend._conn is None
+
+    backend.set('k', '{}', 60)
+    parent = backend._conn
+    assert backend.get('k')[0] == '{}' and backend._conn is parent
+
+    # Tras un fork el worker abre su propia conexión y no cierra la heredada
+    monkeypatch.setattr(os, 'getpid', lambda: -1)
+    assert backend.get('k')[0] == '{}'
+    assert backend._conn is not parent and backend._inherited == [parent]
+    parent.execute('SELECT 1')
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requiere fork')
+def test_sqlite_backend_works_in_forked_worker(tmp_path):
+    backend = SqliteCacheBackend(str(tmp_path / 'results.sqlite3'))
+    backend.set('master', '{}', 60)
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            backend.set('worker', '{}', 60)
+            ok = backend.get('master') is not None
+        except Exception:
+            ok = False
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert backend.get('worker')[0] == '{}'
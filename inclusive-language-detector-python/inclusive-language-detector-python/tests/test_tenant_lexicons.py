@@ -0,0 +1,111 @@
+# tests/test_tenant_lexicons.py - Capas de léxico por tenant: validación, exclusiones y recarga
+
+import json
+
+import pytest
+
+from services.basic_analyzer import BasicAnalyzer
+from services.tenant_lexicons import FileOverlaySource, TenantLexicons, compile_overlay, overlay_fingerprint
+
+CLEAN = 'La profesora explicó el calendario a sus colegas en la biblioteca.'
+
+
+@pytest.fixture(scope='module')
+def base():
+    return BasicAnalyzer()
+
+
+def compile_(base, overlay):
+    return compile_overlay(base, overlay, overlay_fingerprint(overlay))
+
+
+def flagged(analyzer, text):
+    return [issue['original_text'] for issue in analyzer.analyze(text)['issues']]
+
+
+def test_additions_exclusions_and_suggestions(base):
+    analyzer, problems = compile_(base, {
+        'add': {'offensive': {'terms': ['mamerto'], 'phrases': []}},
+        'exclude': ['pendejo'],
+        'suggestions': {'mamerto': 'persona'},
+    })
+    assert problems == []
+    issues = {issue['original_text']: issue for issue in analyzer.analyze('Qué mamerto, pendejo.')['issues']}
+    assert issues['mamerto,']['suggestion'] == 'persona'
+    assert 'pendejo.' not in issues
+    assert 'mamerto,' not in flagged(base, 'Qué mamerto, pendejo.')
+    assert analyzer.lexicon_version != base.lexicon_version
+
+
+def test_exclusion_covers_derived_forms(base):
+    analyzer, _ = compile_(base, {'exclude': ['pendejo']})
+    assert 'pendejito.' in flagged(base, 'Eres un pendejito.')
+    assert 'pendejito.' not in flagged(analyzer, 'Eres un pendejito.')
+
+
+@pytest.mark.parametrize('exclude, text, kept, dropped', [
+    # "cojones" contiene "ojon"; "puta" está dentro de "hijodeputa"
+    ('ojón', 'Qué cojones dices, ojón.', 'cojones', 'ojón.'),
+    ('hijodeputa', 'Eres una puta. Hijodeputa.', 'puta.', 'Hijodeputa.'),
+])
+def test_exclusion_does_not_suppress_neighbouring_terms(base, exclude, text, kept, dropped):
+    analyzer, _ = compile_(base, {'exclude': [exclude]})
+    assert {kept, dropped} <= set(flagged(base, text))
+    assert kept in flagged(analyzer, text)
+    assert dropped not in flagged(analyzer, text)
+
+
+@pytest.mark.parametrize('overlay', [
+    {'add': {'offensive': {'terms': 'abc'}}},
+    {'add': {'offensive': {'phrases': 'abc'}}},
+    {'exclude': 'abc'},
+    {'add': ['abc']},
+    {'suggestions': ['abc']},
+])
+def test_non_list_values_are_rejected(base, overlay):
+    analyzer, problems = compile_(base, overlay)
+    assert len(problems) == 1
+    # Ni "a", "b" y "c" como términos ni exclusiones que apaguen el léxico base
+    assert flagged(analyzer, CLEAN) == []
+    assert flagged(analyzer, 'Eres un pendejo.') == flagged(base, 'Eres un pendejo.')
+
+
+def test_short_terms_are_rejected(base):
+    analyzer, problems = compile_(base, {
+        'add': {'offensive': {'terms': ['la', 'e', '¡¡la!!', 'mamerto']}},
+        'exclude': ['en', 'pe'],
+    })
+    assert len(problems) == 5
+    assert all('demasiado corto' in problem for problem in problems)
+    assert flagged(analyzer, CLEAN) == []
+    assert set(flagged(analyzer, 'Qué mamerto, pendejo.')) >= {'mamerto,', 'pendejo.'}
+
+
+def test_invalid_tenant_id_is_rejected(base, tmp_path):
+    lexicons = TenantLexicons(base, FileOverlaySource(str(tmp_path)), reload_interval=0)
+    with pytest.raises(ValueError):
+        lexicons.get('../etc/passwd')
+    assert lexicons.get(None) is base
+    assert lexicons.get('sin-capa') is base
+
+
+def test_reload_swaps_view_and_keeps_last_good_version(base, tmp_path):
+    path = tmp_path / 'mx.json'
+    path.write_text(json.dumps({'add': {'offensive': {'terms': ['mamerto']}}}), encoding='utf-8')
+    lexicons = TenantLexicons(base, FileOverlaySource(str(tmp_path)), reload_interval=0)
+
+    first = lexicons.get('mx')
+    assert flagged(first, 'Un mamerto.') == ['mamerto.']
+    assert lexicons.reload() == 0  # sin cambios no se recompila
+
+    path.write_text(json.dumps({'add': {'offensive': {'terms': ['gandalla']}}}), encoding='utf-8')
+    assert lexicons.reload() == 1
+    second = lexicons.get('mx')
+    assert flagged(second, 'Un mamerto gandalla.') == ['gandalla.']
+    # Quien ya tenía la versión anterior la sigue usando entera
+    assert flagged(first, 'Un mamerto gandalla.') == ['mamerto']
+
+    path.write_text('{roto', encoding='utf-8')
+    assert lexicons.reload() == 0
+    assert lexicons.get('mx') is second
+    assert lexicons.stats()['errors'] == 1
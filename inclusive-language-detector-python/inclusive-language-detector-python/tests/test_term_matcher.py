@@ -0,0 +1,142 @@
+# tests/test_term_matcher.py - El TermMatcher frente a la búsqueda lineal original de detect_term
+
+import random
+
+import pytest
+
+from benchmarks.corpus import KINDS, generate
+from services.basic_analyzer import BasicAnalyzer
+from services.term_matcher import TermMatcher
+
+
+def generate_variations(base):
+    """Expansión del léxico original (una variación por combinación, sin reglas morfológicas)"""
+    diminutives = ['ito', 'ita', 'illo', 'illa', 'ico', 'ica', 'in', 'ina',
+                   'ete', 'eta', 'uelo', 'uela', 'cito', 'cita']
+    augmentatives = ['ón', 'ona', 'azo', 'aza', 'ote', 'ota', 'arro', 'arra',
+                     'orro', 'orra', 'ucho', 'ucha', 'ejo', 'eja', 'aco', 'aca']
+    prefixes = ['super', 'hiper', 'mega', 'ultra', 'archi', 'requete',
+                're', 'contra', 'extra']
+    variations = [base] + [base + suffix for suffix in diminutives + augmentatives]
+    for prefix in prefixes:
+        variations.append(prefix + base)
+        variations.extend(prefix + base + suffix for suffix in diminutives[:5] + augmentatives[:5])
+    variations.extend([base + base, base + 's'])
+    if base.endswith('o') or base.endswith('a'):
+        variations.extend([base[:-1] + 'ísimo', base[:-1] + 'ísima'])
+    return variations
+
+
+def linear_detect(database, normalize, word):
+    """(categoría, término, es_frase) con el recorrido lineal de detect_term.
+
+    Por categoría, en orden: primero los términos (iguales, contenidos en la
+    palabra o que la contienen) y después las frases.
+    """
+    for category, data in database.items():
+        for kind, is_phrase in (('terms', False), ('phrases', True)):
+            for term in data[kind]:
+                normalized = normalize(term)
+                if normalized and (normalized in word or word in normalized):
+                    return category, term, is_phrase
+    return None
+
+
+@pytest.fixture(scope='module')
+def analyzer():
+    return BasicAnalyzer()
+
+
+@pytest.fixture(scope='module')
+def expanded(analyzer):
+    """Una parte del léxico base expandido como en el original (compilarlo entero tarda segundos)"""
+    return {
+        category: {
+            'terms': sorted({variation for term in data['core_terms'][::10] for variation in generate_variations(term)}),
+            'phrases': sorted({variation for term in data['phrases'][::3] for variation in generate_variations(term)}),
+        }
+        for category, data in analyzer._build_base_database().items()
+    }
+
+
+def sample_words(analyzer, database):
+    rng = random.Random(0)
+    words = set()
+    for data in database.values():
+        for term in rng.sample(data['terms'], min(60, len(data['terms']))) + data['phrases'][:20]:
+            normalized = analyzer.normalize(term)
+            words.add(normalized)
+            # Fragmentos (la palabra está contenida en un término) y compuestos
+            words.add(normalized[:rng.randint(3, max(3, len(normalized) - 1))])
+            words.add(normalized[rng.randint(0, max(0, len(normalized) - 4)):])
+            words.add('mi' + normalized + 'ya')
+    for kind in KINDS:
+        for seed in range(3):
+            words.update(analyzer.normalize(word) for word in generate(kind, 300, seed=seed).split())
+    return sorted(word for word in words if len(word) >= 3)
+
+
+def test_matches_linear_detect_term_on_expanded_lexicon(analyzer, expanded):
+    # Sin reglas de afijos: el matcher solo ve las entradas expandidas, como el original
+    matcher = TermMatcher(expanded, analyzer.normalize, {kind: [] for kind in analyzer.affixes})
+    exact = {analyzer.normalize(term) for data in expanded.values() for term in data['terms'] + data['phrases']}
+
+    words = sample_words(analyzer, expanded)
+    assert len(words) > 500
+    for word in words:
+        expected = linear_detect(expanded, analyzer.normalize, word)
+        found = matcher.match(word)
+        if expected is None:
+            assert found is None, word
+            continue
+        assert found is not None, word
+        assert (found[0], found[2]) == (expected[0], expected[2]), word
+        term = analyzer.normalize(found[1])
+        assert term in word or word in term, word
+        if word in exact and analyzer.normalize(expected[1]) == word:
+            # Una coincidencia exacta devuelve esa misma entrada
+            assert term == word, word
+
+
+@pytest.fixture(scope='module')
+def small(analyzer):
+    """match(palabra sin normalizar) sobre un léxico mínimo"""
+    database = {
+        'sexist': {'terms': ['zorra'], 'phrases': []},
+        'ableist': {'terms': ['loco'], 'phrases': ['estoesdelocos']},
+        'offensive': {'terms': ['zorrazo', 'idiota'], 'phrases': ['cierraelpico']},
+    }
+    matcher = TermMatcher(database, analyzer.normalize, {kind: [] for kind in analyzer.affixes})
+    return lambda method, word: getattr(matcher, method)(analyzer.normalize(word))
+
+
+def test_earlier_category_wins(small):
+    # "zorrazo" está tal cual en offensive, pero contiene "zorra" (sexist va antes)
+    assert small('match', 'zorrazo') == ('sexist', 'zorra', False)
+    assert small('match', 'idiota') == ('offensive', 'idiota', False)
+
+
+def test_terms_before_phrases_within_category(small):
+    assert small('match', 'delocos') == ('ableist', 'loco', False)
+    assert small('match', 'esdeloc') == ('ableist', 'estoesdelocos', True)
+    assert small('match', 'elpico') == ('offensive', 'cierraelpico', True)
+
+
+def test_exact_contained_and_container_matches(small):
+    assert small('match', 'loco') == ('ableist', 'loco', False)
+    assert small('match', 'superloco') == ('ableist', 'loco', False)  # el término está en la palabra
+    assert small('match', 'loc') == ('ableist', 'loco', False)  # la palabra está en el término
+    assert small('match', '') is None
+    assert small('match', 'mesa') is None
+
+
+def test_contains_entry_ignores_words_inside_terms(small):
+    assert small('contains_entry', 'superloco')
+    assert small('contains_entry', 'loco')
+    assert not small('contains_entry', 'loc')
+    assert not small('contains_entry', '')
+
+
+def test_find_spans_prefers_earliest_and_longest(small):
+    assert small('find_spans', 'unlocoyunaidiota') == [(2, 6), (10, 16)]
+    assert small('find_spans', 'zorrazo') == [(0, 7)]